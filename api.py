@@ -0,0 +1,361 @@
+"""Headless JSON API for the booking agent
+
+A plain ASGI application, so it runs under any ASGI server, e.g.:
+
+    pip install uvicorn
+    uvicorn api:app --workers 4
+
+Endpoints:
+    POST /sessions                        start a conversation; {"tenant": "..."} picks a clinic
+    GET  /sessions/{id}                   conversation state and recent history
+    POST /sessions/{id}/messages          {"message": "..."} -> assistant reply
+    POST /sessions/{id}/confirm           book the collected appointment
+    GET  /availability?date=YYYY-MM-DD    free slots on a date
+    GET  /availability?service=&after=&n= earliest free slots across the booking window
+                                          (both take &tenant= when TENANTS_FILE is set)
+    GET  /health
+    GET  /metrics                         Prometheus text format
+
+Conversation state lives in the shared session store, so any worker or
+replica can serve any request.
+"""
+import asyncio
+import json
+import os
+import re
+import uuid
+from datetime import datetime
+from urllib.parse import parse_qs
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass  # dotenv not available, using environment variables directly
+
+# Imported after .env is loaded since the shared resource registry reads its settings on import
+from resources import registry, get_async_chatbot, get_session_store, get_store, get_reservations, find_open_slots
+from booking_flow import hold_selected_slot, wants_to_confirm, confirm_booking
+from session_store import new_session, summary_text
+from tenants import get_tenants, UnknownTenantError
+from metrics import get_metrics, CONTENT_TYPE as METRICS_CONTENT_TYPE
+
+WELCOME_MESSAGE = "Welcome! I'm here to help you book an appointment. Let's get started!"
+MAX_BODY_BYTES = 64 * 1024
+MAX_MESSAGE_CHARS = 2000
+
+
+class HTTPError(Exception):
+    """Error response with a status code"""
+
+    def __init__(self, status, error, **extra):
+        super().__init__(error)
+        self.status = status
+        self.body = dict(error=error, **extra)
+
+
+class Backpressure:
+    """Limits requests in flight and sheds load once the wait queue is full
+
+    Up to max_in_flight requests run at once; up to max_queued more wait
+    for a slot for at most queue_timeout seconds. Anything beyond that is
+    rejected straight away so clients can back off (503 + Retry-After)
+    instead of piling up latency.
+    """
+
+    def __init__(self, max_in_flight=64, max_queued=256, queue_timeout=5.0):
+        self.max_in_flight = max_in_flight
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.queued = 0
+        self.rejected = 0
+        self._semaphore = None
+
+    async def acquire(self):
+        """Take a slot; returns False if the request should be rejected"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        if self._semaphore.locked() and self.queued >= self.max_queued:
+            self.rejected += 1
+            return False
+        self.queued += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            return False
+        finally:
+            self.queued -= 1
+        self.in_flight += 1
+        return True
+
+    def release(self):
+        self.in_flight -= 1
+        self._semaphore.release()
+
+
+class BookingAPI:
+    """ASGI application exposing the conversation and booking flow as JSON endpoints"""
+
+    def __init__(self, max_in_flight=None, max_queued=None, queue_timeout=None):
+        self.backpressure = Backpressure(
+            max_in_flight if max_in_flight is not None else int(os.getenv('API_MAX_IN_FLIGHT', '64')),
+            max_queued if max_queued is not None else int(os.getenv('API_MAX_QUEUED', '256')),
+            queue_timeout if queue_timeout is not None else float(os.getenv('API_QUEUE_TIMEOUT_SECONDS', '5'))
+        )
+        session = r'(?P<session_id>[0-9a-f]{32})'
+        self.routes = [
+            ('POST', re.compile(r'^/sessions$'), self.start_session),
+            ('GET', re.compile(rf'^/sessions/{session}$'), self.get_session),
+            ('POST', re.compile(rf'^/sessions/{session}/messages$'), self.send_message),
+            ('POST', re.compile(rf'^/sessions/{session}/confirm$'), self.confirm),
+            ('GET', re.compile(r'^/availability$'), self.availability),
+        ]
+        # Turns for one conversation run one at a time within a process
+        self._session_locks = {}  # session id -> [lock, requests using it]
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        path = scope['path']
+        if path == '/health':
+            await self.respond(send, 200, {
+                'status': 'ok',
+                'in_flight': self.backpressure.in_flight,
+                'queued': self.backpressure.queued,
+                'rejected': self.backpressure.rejected
+            })
+            return
+        if path == '/metrics':
+            payload = get_metrics().render().encode('utf-8')
+            await self.send_payload(send, 200, payload, METRICS_CONTENT_TYPE)
+            return
+
+        if not await self.backpressure.acquire():
+            await self.respond(send, 503, {'error': 'Server busy, please retry'}, retry_after=1)
+            return
+        try:
+            status, body = await self.dispatch(scope, receive)
+        finally:
+            self.backpressure.release()
+        await self.respond(send, status, body)
+
+    async def dispatch(self, scope, receive):
+        """Route a request and turn errors into JSON responses"""
+        try:
+            handler, params = self.route(scope['method'], scope['path'])
+            request = {
+                'query': {k: v[0] for k, v in parse_qs(scope.get('query_string', b'').decode()).items()},
+                'body': await self.read_json(receive) if scope['method'] == 'POST' else {}
+            }
+            return await handler(request, **params)
+        except HTTPError as e:
+            return e.status, e.body
+        except Exception as e:
+            print(f"API Error: {str(e)}")
+            return 500, {'error': 'Internal server error'}
+
+    def route(self, method, path):
+        allowed = False
+        for route_method, pattern, handler in self.routes:
+            match = pattern.match(path)
+            if match:
+                if route_method == method:
+                    return handler, match.groupdict()
+                allowed = True
+        if allowed:
+            raise HTTPError(405, 'Method not allowed')
+        raise HTTPError(404, 'Not found')
+
+    async def read_json(self, receive):
+        chunks = []
+        size = 0
+        more = True
+        while more:
+            event = await receive()
+            chunk = event.get('body', b'')
+            size += len(chunk)
+            if size > MAX_BODY_BYTES:
+                raise HTTPError(413, 'Request body too large')
+            chunks.append(chunk)
+            more = event.get('more_body', False)
+        raw = b''.join(chunks)
+        if not raw:
+            return {}
+        try:
+            body = json.loads(raw)
+        except ValueError:
+            raise HTTPError(400, 'Request body must be JSON')
+        if not isinstance(body, dict):
+            raise HTTPError(400, 'Request body must be a JSON object')
+        return body
+
+    async def respond(self, send, status, body, retry_after=None):
+        payload = json.dumps(body, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+        await self.send_payload(send, status, payload, 'application/json', retry_after)
+
+    async def send_payload(self, send, status, payload, content_type, retry_after=None):
+        headers = [(b'content-type', content_type.encode()), (b'content-length', str(len(payload)).encode())]
+        if retry_after:
+            headers.append((b'retry-after', str(retry_after).encode()))
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': payload})
+
+    async def lifespan(self, receive, send):
+        while True:
+            event = await receive()
+            if event['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif event['type'] == 'lifespan.shutdown':
+                # Flush buffered sheet writes and stop the email workers
+                await asyncio.to_thread(registry.close_all)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def session_lock(self, session_id):
+        """Reference-counted per-session lock; pair with release_session_lock"""
+        entry = self._session_locks.get(session_id)
+        if entry is None:
+            entry = self._session_locks[session_id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        return entry[0]
+
+    def release_session_lock(self, session_id, lock):
+        entry = self._session_locks.get(session_id)
+        if entry and entry[0] is lock:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._session_locks[session_id]
+
+    async def load_session(self, session_id):
+        session = await asyncio.to_thread(get_session_store().get, session_id)
+        if session is None:
+            raise HTTPError(404, 'Unknown or expired session')
+        return session
+
+    def tenant_id(self, value):
+        """Resolve a requested tenant id (None for the default) to a configured one"""
+        if value is not None and not isinstance(value, str):
+            raise HTTPError(400, 'tenant must be a string')
+        try:
+            tenant = get_tenants().get(value)
+        except UnknownTenantError:
+            raise HTTPError(404, 'Unknown tenant')
+        return tenant.id if tenant else None
+
+    def session_view(self, session):
+        return {
+            'state': session['conversation_state'],
+            'data': session['appointment_data'],
+            'held_slot': list(session['held_slot']) if session['held_slot'] else None,
+            'booking_ids': session['booking_ids']
+        }
+
+    async def start_session(self, request):
+        session_id = uuid.uuid4().hex
+        session = new_session(self.tenant_id(request['body'].get('tenant')))
+        session['messages'].append({'role': 'assistant', 'content': WELCOME_MESSAGE})
+        await asyncio.to_thread(get_session_store().save, session_id, session)
+        return 201, {'session_id': session_id, 'message': WELCOME_MESSAGE}
+
+    async def get_session(self, request, session_id):
+        session = await self.load_session(session_id)
+        return 200, dict(self.session_view(session), messages=session['messages'], summary=summary_text(session))
+
+    async def send_message(self, request, session_id):
+        message = request['body'].get('message')
+        if not isinstance(message, str) or not message.strip():
+            raise HTTPError(400, 'message is required')
+        if len(message) > MAX_MESSAGE_CHARS:
+            raise HTTPError(400, f'message is longer than {MAX_MESSAGE_CHARS} characters')
+
+        lock = self.session_lock(session_id)
+        try:
+            async with lock:
+                session = await self.load_session(session_id)
+                # Building a tenant's handler can read its sheet; keep that off the event loop
+                chatbot = await asyncio.to_thread(get_async_chatbot, session.get('tenant'))
+                response = await chatbot.process_message(
+                    message, session['conversation_state'], session['appointment_data'], summary_text(session)
+                )
+                chatbot.apply_turn(session, message, response)
+                followups, booking = await asyncio.to_thread(self.finish_turn, session_id, session, response, message)
+        finally:
+            self.release_session_lock(session_id, lock)
+
+        body = dict(
+            self.session_view(session),
+            message=response['message'],
+            followups=followups,
+            needs=response.get('needs', []),
+            ready_for_confirmation=response.get('ready_for_confirmation', False),
+            source=response.get('source')
+        )
+        if response.get('alternatives'):
+            body['alternatives'] = [list(slot) for slot in response['alternatives']]
+        if booking:
+            body['booking'] = booking
+        return 200, body
+
+    def finish_turn(self, session_id, session, response, message):
+        """Hold the picked slot, book if the customer confirmed, and save the session"""
+        followups = []
+        booking = None
+        slot_msg = hold_selected_slot(session, session_id)
+        if slot_msg:
+            followups.append(slot_msg)
+        elif wants_to_confirm(session, response, message):
+            booking = confirm_booking(session, session_id)
+            followups.append(booking['message'])
+        for followup in followups:
+            session['messages'].append({'role': 'assistant', 'content': followup})
+        get_session_store().save(session_id, session)
+        return followups, booking
+
+    async def confirm(self, request, session_id):
+        lock = self.session_lock(session_id)
+        try:
+            async with lock:
+                session = await self.load_session(session_id)
+                needs = [field for field in ['name', 'email', 'phone', 'service', 'date', 'time']
+                         if not session['appointment_data'].get(field)]
+                if needs:
+                    raise HTTPError(409, 'Booking details are incomplete', needs=needs)
+                booking = await asyncio.to_thread(self.finish_confirm, session_id, session)
+        finally:
+            self.release_session_lock(session_id, lock)
+        return (200 if booking['success'] else 409), dict(self.session_view(session), **booking)
+
+    def finish_confirm(self, session_id, session):
+        booking = confirm_booking(session, session_id)
+        session['messages'].append({'role': 'assistant', 'content': booking['message']})
+        get_session_store().save(session_id, session)
+        return booking
+
+    async def availability(self, request):
+        query = request['query']
+        tenant_id = self.tenant_id(query.get('tenant'))
+        try:
+            if 'date' in query:
+                date = datetime.strptime(query['date'], '%Y-%m-%d').strftime('%Y-%m-%d')
+                slots = await asyncio.to_thread(self.free_slots_on, date, tenant_id)
+                return 200, {'date': date, 'slots': slots}
+            after = query.get('after')
+            if after:
+                after = datetime.strptime(after, '%Y-%m-%d').strftime('%Y-%m-%d')
+            n = min(int(query.get('n', '5')), 50)
+        except ValueError:
+            raise HTTPError(400, 'Invalid availability query; dates must be YYYY-MM-DD')
+        slots = await asyncio.to_thread(find_open_slots, query.get('service'), after, n, tenant_id)
+        return 200, {'slots': [{'date': date, 'time': time_slot} for date, time_slot in slots]}
+
+    def free_slots_on(self, date, tenant_id=None):
+        return get_reservations(tenant_id).filter_available(date, get_store(tenant_id).get_available_slots(date))
+
+
+app = BookingAPI()
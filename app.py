@@ -1,9 +1,8 @@
 import streamlit as st
+import streamlit.components.v1 as components
 import os
+import uuid
 from datetime import datetime, timedelta
-from google_sheets_handler import GoogleSheetsHandler
-from email_handler import EmailHandler
-from chatbot_handler import ChatbotHandler
 
 # Load environment variables from .env file for local development
 try:
@@ -12,6 +11,20 @@ try:
 except ImportError:
     pass  # dotenv not available, using environment variables directly
 
+# Imported after .env is loaded since the shared resource registry reads its settings on import
+from resources import get_chatbot, get_notification_outbox, get_session_store
+from booking_flow import hold_selected_slot, wants_to_confirm, confirm_booking, reset_session
+from session_store import summary_text, session_token, session_id_from_token
+from tenants import get_tenants, UnknownTenantError
+
+# Messages drawn by the chat fragment before the whole page is rerun
+FRAGMENT_MESSAGE_LIMIT = 20
+
+# Cookie carrying the conversation's session token between connections
+SESSION_COOKIE = 'booking_session'
+SESSION_SECRET = os.getenv('SESSION_SECRET')
+SESSION_COOKIE_SECONDS = int(float(os.getenv('SESSION_TTL_SECONDS', '86400')))
+
 # Page configuration
 st.set_page_config(
     page_title="Appointment Booking Chatbot",
@@ -19,121 +32,191 @@ st.set_page_config(
     layout="wide"
 )
 
-def initialize_session_state():
-    """Initialize session state variables"""
-    if 'messages' not in st.session_state:
-        st.session_state.messages = []
-    if 'conversation_state' not in st.session_state:
-        st.session_state.conversation_state = 'greeting'
-    if 'appointment_data' not in st.session_state:
-        st.session_state.appointment_data = {}
-    if 'sheets_handler' not in st.session_state:
-        st.session_state.sheets_handler = GoogleSheetsHandler()
-    if 'email_handler' not in st.session_state:
-        st.session_state.email_handler = EmailHandler()
-    if 'chatbot' not in st.session_state:
-        st.session_state.chatbot = ChatbotHandler()
+def get_session_id():
+    """Conversation ID, carried by a session cookie so a reload, restart or another replica resumes it
+    
+    The ID never goes in the URL, where sharing a link would hand over the
+    conversation and the personal details in it. The cookie holds a token
+    signed with SESSION_SECRET; a missing or forged one starts a new
+    conversation.
+    """
+    if 'sid' in st.query_params:
+        # Links from before the ID left the URL; don't keep exposing it
+        del st.query_params['sid']
+    if 'session_id' not in st.session_state:
+        session_id = session_id_from_token(st.context.cookies.get(SESSION_COOKIE), SESSION_SECRET)
+        st.session_state.session_id = session_id or uuid.uuid4().hex
+    return st.session_state.session_id
 
-def main():
-    """Main application function"""
-    st.title("📅 Appointment Booking Assistant")
-    st.write("Welcome! I'm here to help you book an appointment. Let's get started!")
+def remember_session():
+    """Store this conversation's token in a cookie the next connection sends back
     
-    # Initialize session state
-    initialize_session_state()
+    Streamlit can only read cookies, so a zero-height component sets it from
+    the page; st.context.cookies shows it from the next connection on.
+    """
+    token = session_token(get_session_id(), SESSION_SECRET)
+    if st.context.cookies.get(SESSION_COOKIE) == token:
+        return
+    components.html(
+        f"<script>window.parent.document.cookie = '{SESSION_COOKIE}={token}; "
+        f"Max-Age={SESSION_COOKIE_SECONDS}; Path=/; SameSite=Strict';</script>",
+        height=0
+    )
+
+def get_tenant():
+    """Clinic chosen by the ?tenant= URL parameter, or the default one (None in single-tenant mode)"""
+    try:
+        return get_tenants().get(st.query_params.get('tenant'))
+    except UnknownTenantError:
+        st.error("Unknown clinic. Please check your booking link.")
+        st.stop()
+
+def load_session():
+    """Load this conversation's state from the shared session store
     
-    # Display chat messages
-    for message in st.session_state.messages:
+    The front ends, not ChatbotHandler, load and save sessions: between the
+    model's reply and the save they hold the picked slot and book it, and a
+    streamed reply is only applied once it has been read, so a save inside
+    the handler would be followed by a second one here on every turn.
+    """
+    session = get_session_store().load(get_session_id())
+    if not session.get('tenant'):
+        tenant = get_tenant()
+        session['tenant'] = tenant.id if tenant else None
+    return session
+
+def save_session(session):
+    """Write this conversation's state back to the shared session store"""
+    get_session_store().save(get_session_id(), session)
+
+def add_assistant_message(session, content):
+    """Show an extra assistant message and record it in the history"""
+    session['messages'].append({"role": "assistant", "content": content})
+    with st.chat_message("assistant"):
+        st.markdown(content)
+
+def message_total(session):
+    """Messages in the conversation so far, including ones folded into the summary"""
+    summary = session.get('summary') or {}
+    return summary.get('hidden_messages', 0) + len(session['messages'])
+
+def render_messages(messages):
+    for message in messages:
         with st.chat_message(message["role"]):
             st.markdown(message["content"])
+
+def render_history(session):
+    """Draw the kept history on a full page run; older turns are summarized in one line"""
+    summary = summary_text(session)
+    if summary:
+        st.caption(summary)
+    render_messages(session['messages'])
+    st.session_state.rendered_total = message_total(session)
+
+@st.fragment
+def chat():
+    """Chat input plus the messages added since the last full page run
+    
+    A turn reruns only this fragment, so the history drawn by the last full
+    run isn't rebuilt on every message. The whole page is rerun when the
+    sidebar needs updating or enough new messages have piled up here.
+    """
+    session = load_session()
+    new_count = message_total(session) - st.session_state.get('rendered_total', 0)
+    if new_count > 0:
+        render_messages(session['messages'][-new_count:])
     
     # Handle user input
     if prompt := st.chat_input("Type your message here..."):
-        # Add user message to chat history
-        st.session_state.messages.append({"role": "user", "content": prompt})
         with st.chat_message("user"):
             st.markdown(prompt)
+        data_before = dict(session['appointment_data'])
         
         # Process user input and get bot response
+        turn_recorded = False
         try:
-            bot_response = st.session_state.chatbot.process_message(
-                prompt, 
-                st.session_state.conversation_state,
-                st.session_state.appointment_data
-            )
+            chatbot = get_chatbot(session.get('tenant'))
+            # Stream the reply as it is generated
+            with st.chat_message("assistant"):
+                turn = chatbot.process_message_stream(
+                    prompt, 
+                    session['conversation_state'],
+                    session['appointment_data'],
+                    summary_text(session)
+                )
+                st.write_stream(turn)
+            bot_response = turn.result
             
-            # Update conversation state and appointment data
-            st.session_state.conversation_state = bot_response.get('state', st.session_state.conversation_state)
-            st.session_state.appointment_data.update(bot_response.get('data', {}))
+            # Record the turn and apply state and data once the reply is complete
+            chatbot.apply_turn(session, prompt, bot_response)
+            turn_recorded = True
             
-            # Add bot response to chat history
-            st.session_state.messages.append({"role": "assistant", "content": bot_response['message']})
-            with st.chat_message("assistant"):
-                st.markdown(bot_response['message'])
+            # Hold a newly picked slot; if someone else has it, ask for another time
+            slot_msg = hold_selected_slot(session, get_session_id())
+            if slot_msg:
+                add_assistant_message(session, slot_msg)
+                save_session(session)
+                st.rerun()
             
             # Handle appointment confirmation
-            if (st.session_state.conversation_state == 'confirmed' or 
-                (bot_response.get('ready_for_confirmation') and 
-                 any(word in prompt.lower() for word in ['yes', 'confirm', 'book', 'ok']))):
-                try:
-                    # Save to Google Sheets
-                    sheets_result = st.session_state.sheets_handler.add_appointment(
-                        st.session_state.appointment_data
-                    )
-                    
-                    if sheets_result['success']:
-                        # Send email notifications
-                        email_result = st.session_state.email_handler.send_notifications(
-                            st.session_state.appointment_data
-                        )
-                        
-                        if email_result['success']:
-                            success_msg = "✅ Perfect! Your appointment has been booked successfully. You'll receive a confirmation email shortly."
-                        else:
-                            success_msg = f"✅ Your appointment has been booked successfully, but there was an issue sending the email: {email_result['error']}"
-                        
-                        st.session_state.messages.append({"role": "assistant", "content": success_msg})
-                        with st.chat_message("assistant"):
-                            st.markdown(success_msg)
-                        
-                        # Reset for new booking
-                        st.session_state.conversation_state = 'greeting'
-                        st.session_state.appointment_data = {}
-                    else:
-                        error_msg = f"❌ Sorry, there was an error saving your appointment: {sheets_result['error']}. Please try again."
-                        st.session_state.messages.append({"role": "assistant", "content": error_msg})
-                        with st.chat_message("assistant"):
-                            st.markdown(error_msg)
-                        
-                except Exception as e:
-                    error_msg = f"❌ An unexpected error occurred: {str(e)}. Please try again."
-                    st.session_state.messages.append({"role": "assistant", "content": error_msg})
-                    with st.chat_message("assistant"):
-                        st.markdown(error_msg)
-                
+            if wants_to_confirm(session, bot_response, prompt):
+                booking = confirm_booking(session, get_session_id())
+                add_assistant_message(session, booking['message'])
+                save_session(session)
                 st.rerun()
         
         except Exception as e:
             error_msg = f"❌ Sorry, I encountered an error processing your message: {str(e)}. Please try again."
-            st.session_state.messages.append({"role": "assistant", "content": error_msg})
-            with st.chat_message("assistant"):
-                st.markdown(error_msg)
+            if not turn_recorded:
+                session['messages'].append({"role": "user", "content": prompt})
+            add_assistant_message(session, error_msg)
+        
+        save_session(session)
+        
+        # Refresh the whole page when the booking details changed or this fragment has grown
+        if (session['appointment_data'] != data_before or
+                message_total(session) - st.session_state.get('rendered_total', 0) > FRAGMENT_MESSAGE_LIMIT):
+            st.rerun()
+
+def main():
+    """Main application function"""
+    remember_session()
+    tenant = get_tenant()
+    st.title(f"📅 {tenant.name} Appointment Booking" if tenant else "📅 Appointment Booking Assistant")
+    st.write("Welcome! I'm here to help you book an appointment. Let's get started!")
+    
+    # Conversation state lives in the session store, not in this process
+    session = load_session()
+    
+    # Display chat messages
+    render_history(session)
+    chat()
     
     # Sidebar with current appointment details
     with st.sidebar:
         st.header("Current Booking Details")
-        if st.session_state.appointment_data:
-            for key, value in st.session_state.appointment_data.items():
+        if session['appointment_data']:
+            for key, value in session['appointment_data'].items():
                 if value:
                     st.write(f"**{key.replace('_', ' ').title()}:** {value}")
         else:
             st.write("No booking details yet.")
         
+        # Email delivery status for bookings made in this session
+        if session['booking_ids']:
+            st.header("Confirmation Emails")
+            outbox = get_notification_outbox()
+            for booking_id in session['booking_ids']:
+                status = outbox.get_status(booking_id)
+                if status:
+                    st.write(f"**Booking {booking_id}:** {status['status'].title()}")
+                    if status['status'] == 'failed' and status['last_error']:
+                        st.caption(status['last_error'])
+        
         # Reset conversation button
         if st.button("Start New Booking"):
-            st.session_state.messages = []
-            st.session_state.conversation_state = 'greeting'
-            st.session_state.appointment_data = {}
+            reset_session(session, get_session_id())
+            save_session(session)
             st.rerun()
 
 if __name__ == "__main__":
@@ -0,0 +1,60 @@
+from datetime import datetime
+
+# Bookable slots (9 AM to 5 PM, hourly)
+TIME_SLOTS = [
+    '09:00', '10:00', '11:00', '12:00',
+    '13:00', '14:00', '15:00', '16:00', '17:00'
+]
+
+# Column order shared by the spreadsheet and every backend's exports
+APPOINTMENT_COLUMNS = ['Timestamp', 'Name', 'Email', 'Phone', 'Date', 'Time', 'Service', 'Notes', 'Status']
+
+
+def appointment_row(appointment_data, status='Confirmed', timestamp=None):
+    """Build a spreadsheet-ordered row for an appointment"""
+    return [
+        timestamp or datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        appointment_data.get('name', ''),
+        appointment_data.get('email', ''),
+        appointment_data.get('phone', ''),
+        appointment_data.get('date', ''),
+        appointment_data.get('time', ''),
+        appointment_data.get('service', ''),
+        appointment_data.get('notes', ''),
+        status
+    ]
+
+
+class AppointmentStore:
+    """Interface every appointment storage backend implements
+
+    add_appointment returns a result dict with 'success' and either
+    'message' or 'error', like the other handlers in this app.
+    """
+
+    def add_appointment(self, appointment_data):
+        """Persist a confirmed appointment"""
+        raise NotImplementedError
+
+    def get_available_slots(self, date):
+        """Return the free time slots on a date"""
+        raise NotImplementedError
+
+    def find_next_available(self, service=None, after=None, n=3):
+        """Return up to n free (date, time) pairs on or after `after`, earliest first"""
+        raise NotImplementedError
+
+    def is_slot_available(self, date, time):
+        """Check if a specific slot is free"""
+        try:
+            return time in self.get_available_slots(date)
+        except Exception as e:
+            print(f"Error checking slot availability: {str(e)}")
+            return True  # Assume available if error occurs
+
+    def confirmed_count(self, date, time):
+        """Confirmed appointments in a slot, read from the store itself rather than any cache"""
+        raise NotImplementedError
+
+    def close(self):
+        """Release connections and flush pending work"""
@@ -0,0 +1,250 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from google.genai import types
+from chatbot_handler import ChatbotHandler
+from circuit_breaker import CircuitOpenError, OPEN
+from prompt_cache import is_stale_cache_error
+
+
+class ProcessConcurrencyLimiter:
+    """Caps in-flight model calls across every event loop and thread in the process
+
+    asyncio.Semaphore is bound to a single event loop, but Streamlit runs each
+    session's script in its own thread. This limiter keeps its count under a
+    threading lock and hands freed slots straight to the oldest waiter on
+    whichever loop it is waiting on.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._in_flight = 0
+        self._waiters = deque()  # (loop, future)
+        self._lock = threading.Lock()
+
+    async def acquire(self):
+        """Wait for a free slot"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._in_flight < self.limit and not self._waiters:
+                self._in_flight += 1
+                return
+            waiter = loop.create_future()
+            self._waiters.append((loop, waiter))
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            with self._lock:
+                if (loop, waiter) in self._waiters:
+                    self._waiters.remove((loop, waiter))
+                    raise
+            if waiter.done() and not waiter.cancelled():
+                self.release()  # the slot was granted just as we were cancelled
+            raise
+
+    def release(self):
+        """Free a slot, passing it to the next waiter if there is one"""
+        with self._lock:
+            while self._waiters:
+                loop, waiter = self._waiters.popleft()
+                try:
+                    loop.call_soon_threadsafe(self._grant, waiter)
+                    return
+                except RuntimeError:
+                    continue  # its loop was closed (e.g. the session thread ended), so nobody is waiting there
+            self._in_flight -= 1
+
+    def _grant(self, waiter):
+        """Wake a waiter on its own loop, or pass the slot on if it gave up"""
+        if waiter.done():
+            self.release()
+        else:
+            waiter.set_result(None)
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc):
+        self.release()
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_concurrency_limiter(limit):
+    """Return the process-wide limiter for outbound model calls"""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = ProcessConcurrencyLimiter(limit)
+        return _limiter
+
+
+class AsyncChatbotHandler(ChatbotHandler):
+    """asyncio version of ChatbotHandler built on the SDK's async client
+
+    Every model turn has a deadline. If a request hasn't answered by the
+    hedge_percentile of recent latencies, a second identical request is
+    fired and whichever finishes first wins. Requests that fail before the
+    deadline are retried, so the fallback response is only used once the
+    deadline has passed.
+    """
+
+    def __init__(self, client=None, deadline=None, hedge_percentile=None, max_concurrency=None,
+                 hedge_min_samples=20, slot_finder=None, tenant=None):
+        super().__init__(client, slot_finder, tenant)
+        self.deadline = deadline if deadline is not None else float(os.getenv('GEMINI_DEADLINE_SECONDS', '15'))
+        self.hedge_percentile = (hedge_percentile if hedge_percentile is not None
+                                 else float(os.getenv('GEMINI_HEDGE_PERCENTILE', '95')))
+        self.hedge_min_samples = hedge_min_samples
+        self.limiter = get_concurrency_limiter(
+            max_concurrency if max_concurrency is not None else int(os.getenv('GEMINI_MAX_CONCURRENCY', '16'))
+        )
+        self.latencies = deque(maxlen=500)
+        self.call_stats = {'hedges': 0, 'hedge_wins': 0, 'retries': 0, 'deadline_exceeded': 0}
+
+    def hedge_delay(self):
+        """Latency after which to fire a hedged request, or None if hedging is off"""
+        if not self.hedge_percentile or len(self.latencies) < self.hedge_min_samples:
+            return None
+        ordered = sorted(self.latencies)
+        index = min(int(len(ordered) * self.hedge_percentile / 100), len(ordered) - 1)
+        return ordered[index]
+
+    async def _attempt(self, context):
+        """One model request, holding a process-wide concurrency slot
+
+        The caller has been let through by breaker.allow(). The outcome and
+        latency (not counting the wait for a slot) feed the circuit breaker.
+        """
+        start = None
+        try:
+            config = await asyncio.to_thread(self.build_generate_config)
+            async with self.limiter:
+                start = time.perf_counter()
+                response = await self._generate(context, config)
+        except asyncio.CancelledError:
+            # Lost a hedge race or hit the deadline; only counts against the model if it was slow
+            if self.breaker:
+                self.breaker.record_cancelled(time.perf_counter() - start if start is not None else 0.0)
+            raise
+        except Exception:
+            if self.breaker:
+                self.breaker.record_failure()
+            raise
+        elapsed = time.perf_counter() - start
+        self.latencies.append(elapsed)
+        if self.breaker:
+            self.breaker.record_success(elapsed)
+        return response
+
+    async def _generate(self, context, config):
+        """Call Gemini with the cached instructions, resending them inline if the cache is gone"""
+        try:
+            with self.metrics.timed('gemini', 'generate_content'):
+                return await self.client.aio.models.generate_content(
+                    model=self.model, contents=context, config=config
+                )
+        except Exception as e:
+            if not config.cached_content or not is_stale_cache_error(e):
+                raise
+            # The cached instructions expired server-side; resend them directly
+            self.instruction_cache.invalidate(self.client, self.model, self.get_system_prompt())
+            with self.metrics.timed('gemini', 'generate_content'):
+                return await self.client.aio.models.generate_content(
+                    model=self.model,
+                    contents=context,
+                    config=types.GenerateContentConfig(
+                        system_instruction=self.get_system_prompt(),
+                        response_mime_type="application/json"
+                    )
+                )
+
+    async def _call_model(self, context):
+        """Run the request with hedging and retries until one attempt succeeds
+
+        The first attempt was let through by model_available(); every hedge
+        and retry asks the circuit breaker again, so in half-open state none
+        of them runs without a probe slot.
+        """
+        primary = asyncio.ensure_future(self._attempt(context))
+        attempts = {primary}
+        hedge_delay = self.hedge_delay()
+        hedged = False
+        backoff = 0.1
+        try:
+            while True:
+                timeout = hedge_delay if hedge_delay is not None and not hedged else None
+                done, _ = await asyncio.wait(attempts, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    if self.breaker and not self.breaker.allow():
+                        continue  # no probe slot to spare; keep waiting on the requests in flight
+                    self.call_stats['hedges'] += 1
+                    attempts.add(asyncio.ensure_future(self._attempt(context)))
+                    continue
+
+                for task in done:
+                    attempts.discard(task)
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.call_stats['hedge_wins'] += 1
+                        return task.result()
+                    print(f"AI Error (retrying before deadline): {str(task.exception())}")
+
+                if not attempts:
+                    if self.breaker and self.breaker.state == OPEN:
+                        raise CircuitOpenError('Gemini circuit breaker opened')
+                    await asyncio.sleep(backoff)
+                    backoff = min(backoff * 2, 2.0)
+                    if self.breaker and not self.breaker.allow():
+                        raise CircuitOpenError('Gemini circuit breaker refused a retry')
+                    self.call_stats['retries'] += 1
+                    attempts.add(asyncio.ensure_future(self._attempt(context)))
+        finally:
+            for task in attempts:
+                task.cancel()
+
+    async def process_message(self, message, current_state, appointment_data, earlier=None):
+        """Process user message using AI within the deadline and return appropriate response
+
+        Local answers, validation and slot checks can read the sheet (and wait
+        for its quota), so they run in worker threads rather than on the loop.
+        """
+        try:
+            response, cache_key = await asyncio.to_thread(
+                self.answer_without_model, message, current_state, appointment_data
+            )
+            if response:
+                return response
+            if not self.model_available():
+                return await asyncio.to_thread(self.degraded_response, message, current_state, appointment_data)
+
+            openings = await asyncio.to_thread(self.turn_openings, appointment_data)
+            if openings:
+                cache_key = None
+            context = self.build_turn_context(message, current_state, appointment_data, openings, earlier)
+
+            start = time.perf_counter()
+            response = await asyncio.wait_for(self._call_model(context), timeout=self.deadline)
+            self.record_turn('llm', time.perf_counter() - start)
+            self.record_prompt_usage(response)
+
+            return await asyncio.to_thread(
+                self.parse_model_response, response.text, cache_key, message, current_state, appointment_data
+            )
+
+        except CircuitOpenError:
+            print("AI Error: model unavailable, answering with local extraction")
+            return await asyncio.to_thread(self.degraded_response, message, current_state, appointment_data)
+        except asyncio.TimeoutError:
+            self.call_stats['deadline_exceeded'] += 1
+            print(f"AI Error: no model response within {self.deadline:.1f}s")
+            return self.create_fallback_response(message, current_state, appointment_data)
+        except Exception as e:
+            print(f"AI Error: {str(e)}")
+            return self.create_fallback_response(message, current_state, appointment_data)
@@ -0,0 +1,140 @@
+import threading
+from datetime import date as date_type, datetime, timedelta
+from appointment_store import TIME_SLOTS
+
+
+def to_date(value):
+    """Accept a date, datetime or 'YYYY-MM-DD' string"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date_type):
+        return value
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+class AvailabilityMap:
+    """Booked-slot bitmap covering every bookable day
+
+    The whole window (tomorrow through `days` days ahead, matching
+    ChatbotHandler.validate_date) is one integer with a bit per (day, slot),
+    so a range query is a handful of whole-window bitwise operations rather
+    than one lookup per date. service_slots optionally restricts services
+    to some of the slots, e.g. {'X-Ray': ['09:00', '10:00']}. With a tenant
+    calendar (see tenants.py) the slots and service restrictions are the
+    calendar's and slots outside a day's opening hours are never free.
+    """
+
+    def __init__(self, slots=TIME_SLOTS, days=180, service_slots=None, calendar=None):
+        self.calendar = calendar
+        if calendar is not None:
+            slots = calendar.slots
+            if service_slots is None:
+                service_slots = calendar.service_slots
+        self.slots = list(slots)
+        self.days = days
+        # Service names come from the conversation, so match them case-insensitively
+        self.service_slots = {service.lower(): slots for service, slots in (service_slots or {}).items()}
+        self._slot_bits = {slot: i for i, slot in enumerate(self.slots)}
+        width = len(self.slots)
+        self._day_mask = (1 << width) - 1
+        # One bit at the start of every day; multiplying a day mask by it repeats the mask across the window
+        self._repeat = sum(1 << (width * day) for day in range(days))
+        self._window_mask = self._day_mask * self._repeat
+        self._booked = 0
+        self._closed = 0  # slots outside the calendar's opening hours
+        self._day_offsets = {}  # date string -> day within the window
+        self.start = None
+        self._lock = threading.Lock()
+
+    def is_current(self):
+        """True if the window still starts tomorrow"""
+        return self.start == datetime.now().date() + timedelta(days=1)
+
+    def rebuild(self, booked_slots=()):
+        """Reset the window to start tomorrow and mark the given (date, time) pairs booked"""
+        with self._lock:
+            self.start = datetime.now().date() + timedelta(days=1)
+            self._booked = 0
+            self._day_offsets = {}
+            self._closed = self._closed_mask()
+            for date, time_slot in booked_slots:
+                bit = self._bit(date, time_slot)
+                if bit is not None:
+                    self._booked |= 1 << bit
+
+    def mark(self, date, time_slot, booked=True):
+        """Set one slot booked or free; dates outside the window are ignored"""
+        with self._lock:
+            bit = self._bit(date, time_slot)
+            if bit is None:
+                return
+            if booked:
+                self._booked |= 1 << bit
+            else:
+                self._booked &= ~(1 << bit)
+
+    def is_free(self, date, time_slot):
+        """Check a single slot"""
+        bit = self._bit(date, time_slot)
+        return bit is not None and not ((self._booked | self._closed) >> bit) & 1
+
+    def free_slots(self, date):
+        """Free times on one date"""
+        return [slot for slot in self.slots if self.is_free(date, slot)]
+
+    def find_next_available(self, service=None, after=None, n=3):
+        """Return up to n free (date, time) pairs on or after `after` (default tomorrow), earliest first"""
+        if self.start is None:
+            return []
+        width = len(self.slots)
+        offset = 0
+        if after is not None:
+            offset = max((to_date(after) - self.start).days, 0)
+        if offset >= self.days:
+            return []
+
+        free = self._window_mask & ~(self._booked | self._closed)
+        allowed = self.service_slots.get(str(service).strip().lower()) if service else None
+        if allowed:
+            day_mask = sum(1 << self._slot_bits[slot] for slot in allowed if slot in self._slot_bits)
+            free &= day_mask * self._repeat
+        free >>= offset * width
+
+        found = []
+        while free and len(found) < n:
+            lowest = free & -free
+            bit = lowest.bit_length() - 1
+            free ^= lowest
+            day, slot = divmod(bit, width)
+            found.append(((self.start + timedelta(days=offset + day)).strftime('%Y-%m-%d'), self.slots[slot]))
+        return found
+
+    def _closed_mask(self):
+        """Bits of every slot the calendar has closed, across the window starting at self.start"""
+        if self.calendar is None:
+            return 0
+        width = len(self.slots)
+        closed = 0
+        for day in range(self.days):
+            open_slots = self.calendar.slots_on(self.start + timedelta(days=day))
+            if len(open_slots) < width:
+                open_mask = sum(1 << self._slot_bits[slot] for slot in open_slots)
+                closed |= (self._day_mask & ~open_mask) << (day * width)
+        return closed
+
+    def _bit(self, date, time_slot):
+        """Bit position of a slot, or None if it isn't in the window"""
+        slot = self._slot_bits.get(time_slot)
+        if slot is None or self.start is None:
+            return None
+        day = self._day_offsets.get(date)
+        if day is None:
+            try:
+                day = (to_date(date) - self.start).days
+            except (TypeError, ValueError):
+                return None
+            if isinstance(date, str):
+                self._day_offsets[date] = day
+        if not 0 <= day < self.days:
+            return None
+        return day * len(self.slots) + slot
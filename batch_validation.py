@@ -0,0 +1,221 @@
+import re
+from datetime import date, datetime, timedelta
+from chatbot_handler import ChatbotHandler
+
+# Same rules as ChatbotHandler's per-value validators, compiled once
+EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+PHONE_SEPARATORS = re.compile(r'[\s\-\(\)]')
+# str.translate handles the ASCII separators; other Unicode whitespace falls back to the regex
+PHONE_DELETIONS = str.maketrans('', '', ' \t\n\r\f\v-()')
+
+# Fast paths for the date shapes validate_date accepts; anything else falls back to it
+ISO_DATE = re.compile(r'([0-9]{4})-([0-9]{1,2})-([0-9]{1,2})')
+US_DATE = re.compile(r'([0-9]{1,2})([/-])([0-9]{1,2})\2([0-9]{4})')
+NAMED_DATE = re.compile(r'([A-Za-z]+) ([0-9]{1,2}), ([0-9]{4})')
+MONTHS = {}
+for number, (full, short) in enumerate(zip(
+    ['january', 'february', 'march', 'april', 'may', 'june', 'july', 'august', 'september', 'october',
+     'november', 'december'],
+    ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec']
+), 1):
+    MONTHS[full] = MONTHS[short] = number
+
+# Fast path for 24-hour times ("14", "14:00", "14.00"); 12-hour forms fall back to validate_time
+CLOCK_TIME = re.compile(r'\s*([0-9]{1,2})(?:[:.]([0-9]{2}))?\s*')
+
+REQUIRED_FIELDS = ('name', 'email', 'phone', 'service', 'date', 'time')
+
+BOOKING_WINDOW_DAYS = 180
+
+
+def build_service_index(services):
+    """Map every lowercased substring of a service name to the first service containing it
+
+    This answers the "value in predefined" half of ChatbotHandler's service
+    match with one dict lookup; the other half ("predefined in value") is
+    a short scan over the names.
+    """
+    index = {}
+    for position, service in enumerate(services):
+        name = service.lower()
+        for start in range(len(name)):
+            for end in range(start + 1, len(name) + 1):
+                index.setdefault(name[start:end], position)
+    return index
+
+
+SERVICES = list(ChatbotHandler.services)
+SERVICE_NAMES = [service.lower() for service in SERVICES]
+SERVICE_INDEX = build_service_index(SERVICES)
+
+
+def memoized(values, parse):
+    """Apply parse to a column, calling it once per distinct value"""
+    seen = {}
+    results = []
+    append = results.append
+    for value in values:
+        try:
+            result = seen[value]
+        except KeyError:
+            result = seen[value] = parse(value)
+        except TypeError:
+            result = parse(value)  # unhashable
+        append(result)
+    return results
+
+
+def text(value):
+    return '' if value is None else str(value)
+
+
+def validate_emails(values):
+    """Lowercased email or None for each value"""
+    match = EMAIL_PATTERN.match
+    results = []
+    for value in values:
+        value = text(value)
+        results.append(value.lower() if value and match(value) else None)
+    return results
+
+
+def clean_phones(values):
+    """Digits-only phone number or None for each value"""
+    strip = PHONE_SEPARATORS.sub
+    results = []
+    for value in values:
+        value = text(value)
+        cleaned = value.translate(PHONE_DELETIONS)
+        if not cleaned.isdigit():
+            cleaned = strip('', value)
+        results.append(cleaned if cleaned.isdigit() and 10 <= len(cleaned) <= 15 else None)
+    return results
+
+
+def parse_date(value, earliest=None, latest=None):
+    """validate_date for one value: YYYY-MM-DD, or None outside [earliest, latest] when given"""
+    value = text(value)
+    try:
+        match = ISO_DATE.fullmatch(value)
+        if match:
+            parsed = date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+        else:
+            match = US_DATE.fullmatch(value)
+            if match:
+                parsed = date(int(match.group(4)), int(match.group(1)), int(match.group(3)))
+            else:
+                match = NAMED_DATE.fullmatch(value)
+                month = MONTHS.get(match.group(1).lower()) if match else None
+                if not month:
+                    fallback = ChatbotHandler.validate_date(value, booking_window=False)
+                    if fallback is None:
+                        return None
+                    parsed = datetime.strptime(fallback, '%Y-%m-%d').date()
+                else:
+                    parsed = date(int(match.group(3)), month, int(match.group(2)))
+    except ValueError:
+        return None  # e.g. February 30th, which no other accepted format could parse either
+    if earliest is not None and not earliest <= parsed <= latest:
+        return None
+    return parsed.strftime('%Y-%m-%d')
+
+
+def parse_dates(values, booking_window=True, today=None):
+    """Normalized date or None for each value; booking_window limits them to the next 180 days like the chatbot"""
+    earliest = latest = None
+    if booking_window:
+        today = today or datetime.now().date()
+        earliest, latest = today + timedelta(days=1), today + timedelta(days=BOOKING_WINDOW_DAYS)
+    return memoized(values, lambda value: parse_date(value, earliest, latest))
+
+
+def parse_time(value):
+    """validate_time for one value: an hourly slot HH:00 between 09 and 17, or None"""
+    value = text(value)
+    match = CLOCK_TIME.fullmatch(value)
+    if match is None:
+        return ChatbotHandler.validate_time(value)
+    hour = int(match.group(1))
+    return f"{hour:02d}:00" if 9 <= hour <= 17 else None
+
+
+def parse_times(values):
+    """Normalized slot time or None for each value"""
+    return memoized(values, parse_time)
+
+
+def match_service(value):
+    """normalize_service for one value: the first predefined service it matches, else the title-cased value"""
+    value = text(value).strip()
+    if not value:
+        return None
+    lowered = value.lower()
+    first = SERVICE_INDEX.get(lowered, len(SERVICES))
+    for position in range(first):
+        if SERVICE_NAMES[position] in lowered:
+            return SERVICES[position]
+    return SERVICES[first] if first < len(SERVICES) else value.title()
+
+
+def match_services(values):
+    """Predefined (or title-cased custom) service or None for each value"""
+    return memoized(values, match_service)
+
+
+def strip_values(values):
+    """Stripped text, or None when empty"""
+    return [(value.strip() if isinstance(value, str) else text(value).strip()) or None for value in values]
+
+
+# Field -> (column validator, error message for a present but invalid value)
+VALIDATORS = {
+    'name': (strip_values, None),
+    'notes': (strip_values, None),
+    'email': (validate_emails, 'invalid email'),
+    'phone': (clean_phones, 'invalid phone number'),
+    'service': (match_services, None),
+    'time': (parse_times, 'not an open hourly slot (09:00-17:00)'),
+}
+
+
+def validate_columns(columns, required=REQUIRED_FIELDS, booking_window=True, today=None):
+    """Validate appointment fields given as columns of equal length
+
+    columns maps field names to lists of raw values. Returns a dict with
+    'rows' (per row, the valid normalized fields; invalid ones are left
+    out like ChatbotHandler.validate_ai_response does), 'valid' (per row,
+    True when it has no invalid value and every required field) and
+    'errors' ([(row, field, message)]).
+    """
+    size = max((len(values) for values in columns.values()), default=0)
+    rows = [{} for _ in range(size)]
+    errors = []
+    invalid = set()  # (row, field)
+    for field, values in columns.items():
+        if len(values) != size:
+            raise ValueError(f"Column {field} has {len(values)} values, expected {size}")
+        if field == 'date':
+            validate, message = (lambda column: parse_dates(column, booking_window, today)), 'invalid date'
+            if booking_window:
+                message = 'invalid date or not within the next 180 days'
+        elif field in VALIDATORS:
+            validate, message = VALIDATORS[field]
+        else:
+            continue
+        for index, (raw, value) in enumerate(zip(values, validate(values))):
+            if value is not None:
+                rows[index][field] = value
+            elif message and text(raw).strip():
+                errors.append((index, field, message))
+                invalid.add((index, field))
+
+    valid = [True] * size
+    for index, _, _ in errors:
+        valid[index] = False
+    for field in required:
+        for index, row in enumerate(rows):
+            if field not in row and (index, field) not in invalid:
+                errors.append((index, field, 'missing'))
+                valid[index] = False
+    errors.sort(key=lambda error: error[0])
+    return {'rows': rows, 'valid': valid, 'errors': errors}
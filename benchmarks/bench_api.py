@@ -0,0 +1,114 @@
+"""Load test the headless JSON API in-process with the LLM and Google Sheets mocked
+
+Each simulated client runs a full conversation against api.app through
+httpx's ASGI transport: start a session, ask for availability, send the
+details one message at a time and confirm. Reports requests per second,
+requests per CPU-second (requests/sec per core) and the status code mix,
+including 503s shed by backpressure.
+
+Usage: python benchmarks/bench_api.py [--clients N] [--concurrency N] [--llm-latency SECONDS]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('SESSION_BACKEND', 'memory')
+os.environ.setdefault('STORAGE_BACKEND', 'sheets')
+
+import httpx
+
+import api
+from async_chatbot_handler import AsyncChatbotHandler
+from benchmarks.conversation import script, scripted_reply
+from benchmarks.fakes import FakeGenaiClient, FakeWorksheet
+from google_sheets_handler import GoogleSheetsHandler
+from notification_outbox import NotificationOutbox
+from resources import registry, find_open_slots
+
+
+async def run_client(client, i, statuses, latencies):
+    async def call(method, url, **kwargs):
+        start = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        latencies.append(time.perf_counter() - start)
+        statuses[response.status_code] += 1
+        return response
+
+    response = await call('POST', '/sessions')
+    if response.status_code != 201:
+        return False
+    session_id = response.json()['session_id']
+    await call('GET', '/availability', params={'service': 'Dental Cleaning', 'n': 5})
+    body = {}
+    for message in script(i):
+        response = await call('POST', f'/sessions/{session_id}/messages', json={'message': message})
+        if response.status_code != 200:
+            return False
+        body = response.json()
+    return bool(body.get('booking', {}).get('success'))
+
+
+async def run(args):
+    app = api.BookingAPI(max_in_flight=args.max_in_flight, max_queued=args.max_queued, queue_timeout=5)
+    transport = httpx.ASGITransport(app=app)
+    statuses, latencies = Counter(), []
+    gate = asyncio.Semaphore(args.concurrency)
+
+    async with httpx.AsyncClient(transport=transport, base_url='http://api', timeout=30) as client:
+        async def one(i):
+            async with gate:
+                return await run_client(client, i, statuses, latencies)
+
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        booked = await asyncio.gather(*(one(i) for i in range(args.clients)))
+        wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+    return booked, statuses, latencies, wall, cpu, app.backpressure
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--clients', type=int, default=300)
+    parser.add_argument('--concurrency', type=int, default=100, help='clients in flight at once')
+    parser.add_argument('--llm-latency', type=float, default=0.2)
+    parser.add_argument('--sheets-latency', type=float, default=0.05)
+    parser.add_argument('--max-in-flight', type=int, default=64)
+    parser.add_argument('--max-queued', type=int, default=256)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sheet = FakeWorksheet([], call_latency=args.sheets_latency)
+        registry.register('sheets', lambda: GoogleSheetsHandler(sheet=sheet), close=GoogleSheetsHandler.close)
+        registry.register('async_chatbot', lambda: AsyncChatbotHandler(
+            client=FakeGenaiClient(responder=scripted_reply, latency=args.llm_latency),
+            slot_finder=find_open_slots
+        ))
+        # Emails are queued but not sent; delivery is measured by bench_smtp_pool.py
+        registry.register('notification_outbox', lambda: NotificationOutbox(
+            None, db_path=os.path.join(tmp, 'outbox.db')
+        ))
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            booked, statuses, latencies, wall, cpu, backpressure = asyncio.run(run(args))
+        registry.close_all()
+
+    requests = sum(statuses.values())
+    latencies.sort()
+    print(f"{args.clients} conversations, {args.concurrency} concurrent, "
+          f"LLM {args.llm_latency * 1000:.0f}ms, Sheets {args.sheets_latency * 1000:.0f}ms")
+    print(f"requests: {requests} in {wall:.2f}s = {requests / wall:.0f} req/s; "
+          f"CPU {cpu:.2f}s = {requests / cpu:.0f} req/s per core")
+    print(f"latency p50 {latencies[len(latencies) // 2] * 1000:.0f}ms "
+          f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.0f}ms")
+    print(f"status codes: {dict(statuses)}; rejected by backpressure: {backpressure.rejected}")
+    print(f"bookings: {sum(booked)}/{args.clients}; sheet rows: {len(sheet.rows) - 1}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Load test AsyncChatbotHandler against a fake model with a heavy latency tail
+
+Reports p50/p95/p99 turn latency with and without hedged requests.
+
+Usage: python benchmarks/bench_async_chatbot.py [--requests N] [--concurrency N] [--deadline SECONDS]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ['LOCAL_EXTRACTION'] = 'false'
+os.environ['RESPONSE_CACHE'] = 'false'
+
+from async_chatbot_handler import AsyncChatbotHandler
+from benchmarks.fakes import FakeGenaiClient
+
+
+def tail_latency(rng):
+    """Mostly fast replies with a 5% slow tail, like a loaded model endpoint"""
+    if rng.random() < 0.05:
+        return rng.uniform(1.0, 3.0)
+    return rng.lognormvariate(-1.6, 0.3)  # median ~0.2s
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+
+async def run(chatbot, requests, concurrency):
+    """Fire requests with at most `concurrency` outstanding; return latencies and sources"""
+    gate = asyncio.Semaphore(concurrency)
+    latencies, sources = [], []
+
+    async def one(i):
+        async with gate:
+            start = time.perf_counter()
+            response = await chatbot.process_message(f"I need an appointment ({i})", 'collecting', {})
+            latencies.append(time.perf_counter() - start)
+            sources.append(response['source'])
+
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return latencies, sources
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--deadline', type=float, default=2.0)
+    parser.add_argument('--failure-rate', type=float, default=0.02)
+    args = parser.parse_args()
+
+    print(f"{'mode':<10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'fallbacks':>10} {'hedges':>7} {'req/s':>7}")
+    for label, hedge_percentile in (('no hedge', 0), ('hedge p90', 90)):
+        client = FakeGenaiClient(latency_sampler=tail_latency, failure_rate=args.failure_rate, seed=7)
+        chatbot = AsyncChatbotHandler(client=client, deadline=args.deadline, hedge_percentile=hedge_percentile,
+                                      max_concurrency=args.concurrency * 2)
+        # Warm up the latency window used to pick the hedge threshold
+        with contextlib.redirect_stdout(io.StringIO()):
+            await run(chatbot, 50, args.concurrency)
+
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):  # silence per-request error logging
+            latencies, sources = await run(chatbot, args.requests, args.concurrency)
+        elapsed = time.perf_counter() - start
+        print(f"{label:<10} {percentile(latencies, 50) * 1000:>8.0f} {percentile(latencies, 95) * 1000:>8.0f} "
+              f"{percentile(latencies, 99) * 1000:>8.0f} {sources.count('fallback'):>10} "
+              f"{chatbot.call_stats['hedges']:>7} {args.requests / elapsed:>7.0f}")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,84 @@
+"""Compare multi-day "earliest opening" searches: per-date checks vs the availability bitmap
+
+Answers find_next_available(after, n) three ways over a mostly booked
+calendar: a full sheet scan per date (the original get_available_slots),
+per-date lookups in the slot index, and one bitmap query.
+
+Usage: python benchmarks/bench_availability.py [--rows N] [--n N] [--booked-days N]
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from appointment_store import TIME_SLOTS
+from benchmarks.fakes import FakeWorksheet, make_appointment_rows
+from google_sheets_handler import GoogleSheetsHandler
+
+
+def scan_search(sheet, after, n):
+    """One get_all_records scan per date until n openings are found"""
+    found = []
+    day = after
+    while len(found) < n and day <= after + timedelta(days=180):
+        date = day.strftime('%Y-%m-%d')
+        booked = {r.get('Time') for r in sheet.get_all_records()
+                  if r.get('Date') == date and r.get('Status') == 'Confirmed'}
+        found.extend((date, slot) for slot in TIME_SLOTS if slot not in booked)
+        day += timedelta(days=1)
+    return found[:n]
+
+
+def per_date_search(handler, after, n):
+    """One get_available_slots call per date until n openings are found"""
+    found = []
+    day = after
+    while len(found) < n and day <= after + timedelta(days=180):
+        date = day.strftime('%Y-%m-%d')
+        found.extend((date, slot) for slot in handler.get_available_slots(date))
+        day += timedelta(days=1)
+    return found[:n]
+
+
+def mean_ms(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) * 1000 / repeat, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=20_000)
+    parser.add_argument('--n', type=int, default=5, help='openings to find')
+    parser.add_argument('--booked-days', type=int, default=60, help='fully booked days at the start of the window')
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    tomorrow = datetime.now().date() + timedelta(days=1)
+    # Every slot is booked for the first --booked-days days; after that every 10th row is cancelled
+    rows = make_appointment_rows(args.rows, start_date=tomorrow.strftime('%Y-%m-%d'))
+    for row in rows[:args.booked_days * len(TIME_SLOTS)]:
+        row[8] = 'Confirmed'
+    sheet = FakeWorksheet(rows)
+    handler = GoogleSheetsHandler(sheet=sheet)
+    handler.get_available_slots(tomorrow.strftime('%Y-%m-%d'))  # initial index load
+
+    scan_ms, expected = mean_ms(lambda: scan_search(sheet, tomorrow, args.n), 1)
+    per_date_ms, per_date = mean_ms(lambda: per_date_search(handler, tomorrow, args.n), args.repeat)
+    bitmap_ms, bitmap = mean_ms(lambda: handler.find_next_available(None, tomorrow, args.n), args.repeat)
+    assert expected == per_date == bitmap, (expected, per_date, bitmap)
+
+    days_scanned = (datetime.strptime(bitmap[-1][0], '%Y-%m-%d').date() - tomorrow).days + 1
+    print(f"{args.rows} rows, first {args.n} openings span {days_scanned} days: {bitmap[:3]}...")
+    print(f"{'method':<22} {'ms/query':>10}")
+    print(f"{'sheet scan per date':<22} {scan_ms:>10.2f}")
+    print(f"{'index per date':<22} {per_date_ms:>10.4f}")
+    print(f"{'bitmap':<22} {bitmap_ms:>10.4f}")
+
+
+if __name__ == '__main__':
+    main()
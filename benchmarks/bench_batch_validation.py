@@ -0,0 +1,95 @@
+"""Column-at-a-time validation (batch_validation.py) vs ChatbotHandler's per-value validators
+
+Builds --records synthetic appointments as columns, in the mix of formats
+a bulk import or a replay of model outputs sees (ISO, US and named
+dates, 24- and 12-hour times, service synonyms, about 2% invalid
+values). The baseline validates each value with the per-call methods
+the way validate_ai_response does. Results are checked to be
+identical, then the time per field and in total is reported.
+
+Usage: python benchmarks/bench_batch_validation.py [--records N]
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import batch_validation
+from chatbot_handler import ChatbotHandler
+
+SERVICES = ['Consultation', 'dental cleaning', 'X-Ray', 'blood test', 'Vaccination', 'check-up', 'Massage']
+TIMES = ['09:00', '10', '11:00 AM', '12:00', '1:00 PM', '14:00', '3:00 PM', '16.00', '17:00', '8:00 PM']
+DATE_FORMATS = ['%Y-%m-%d', '%Y-%m-%d', '%m/%d/%Y', '%B %d, %Y', '%b %d, %Y']
+
+
+def make_columns(count):
+    today = date.today()
+    columns = {'name': [], 'email': [], 'phone': [], 'service': [], 'date': [], 'time': []}
+    for i in range(count):
+        day = today + timedelta(days=i % 200 - 10)  # some past or too far out
+        columns['name'].append(f' Customer {i} ')
+        columns['email'].append(f'Customer{i}@Example.com' if i % 50 else f'customer{i}@example')
+        columns['phone'].append(f'(555) {i % 1000:03d}-{i % 10000:04d}' if i % 60 else '12345')
+        columns['service'].append(SERVICES[i % len(SERVICES)])
+        columns['date'].append(day.strftime(DATE_FORMATS[i % len(DATE_FORMATS)]))
+        columns['time'].append(TIMES[i % len(TIMES)])
+    return columns
+
+
+def per_value(field, values):
+    """Baseline: one validator call per value"""
+    if field == 'email':
+        return [str(value).lower() if ChatbotHandler.validate_email(str(value)) else None for value in values]
+    if field == 'phone':
+        return [ChatbotHandler.clean_phone(str(value)) for value in values]
+    if field == 'date':
+        return [ChatbotHandler.validate_date(str(value)) for value in values]
+    if field == 'time':
+        return [ChatbotHandler.validate_time(str(value)) for value in values]
+    if field == 'service':
+        return [ChatbotHandler.normalize_service(str(value)) for value in values]
+    return [str(value).strip() or None for value in values]
+
+
+def batched(field, values):
+    if field == 'date':
+        return batch_validation.parse_dates(values)
+    return batch_validation.VALIDATORS[field][0](values)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--records', type=int, default=1000000)
+    args = parser.parse_args()
+
+    columns = make_columns(args.records)
+    print(f"{args.records:,} records")
+    print(f"{'field':<8} {'per value':>11} {'batch':>9} {'speedup':>8}")
+    total_single = total_batch = 0.0
+    for field, values in columns.items():
+        start = time.perf_counter()
+        expected = per_value(field, values)
+        single = time.perf_counter() - start
+        start = time.perf_counter()
+        got = batched(field, values)
+        batch = time.perf_counter() - start
+        if got != expected:
+            mismatches = sum(1 for a, b in zip(got, expected) if a != b)
+            raise SystemExit(f"{field}: {mismatches} results differ from the per-value validators")
+        total_single += single
+        total_batch += batch
+        print(f"{field:<8} {single:>10.2f}s {batch:>8.2f}s {single / batch:>7.1f}x")
+    print(f"{'total':<8} {total_single:>10.2f}s {total_batch:>8.2f}s {total_single / total_batch:>7.1f}x")
+
+    start = time.perf_counter()
+    result = batch_validation.validate_columns(columns)
+    seconds = time.perf_counter() - start
+    print(f"validate_columns: {args.records / seconds:,.0f} records/s, "
+          f"{sum(result['valid']):,} valid, {len(result['errors']):,} errors")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""Rows per second and peak memory of bulk_io's streaming import and export
+
+Writes a synthetic CSV (or JSONL) file of --rows appointments, about 2%
+of them invalid, and imports it into a fake worksheet that only counts
+the rows it receives. The import runs once at full speed for rows/sec,
+then again under tracemalloc at a tenth of the size and at full size:
+with chunked streaming the peak stays about the same as the file grows.
+Export pages through a fake sheet of --export-rows rows.
+
+Pacing is disabled here; at the default 50 writes per minute a real
+import of N rows takes about N / chunk size / 50 minutes, which is
+printed for reference.
+
+Usage: python benchmarks/bench_bulk_io.py [--rows N] [--format csv|jsonl] [--chunk-size N] [--no-trace]
+"""
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes import FakeWorksheet, make_appointment_rows
+from bulk_io import RequestPacer, export_rows, import_records, iter_sheet_rows, read_records
+
+SERVICES = ['Consultation', 'dental cleaning', 'X-Ray', 'blood test', 'Vaccination']
+TIMES = ['09:00', '10am', '11:00 AM', '12:00', '1 PM', '14:00', '3pm', '16:00', '5:00 PM']
+
+
+def synthetic_records(count):
+    """Historical appointments in mixed input formats; every 50th record is invalid"""
+    base = datetime(2023, 1, 1)
+    for i in range(count):
+        day = base + timedelta(days=i // 40)
+        record = {
+            'Name': f'Customer {i}',
+            'Email': f'customer{i}@example.com',
+            'Phone': f'(555) {i % 1000:03d}-{i % 10000:04d}',
+            'Service': SERVICES[i % len(SERVICES)],
+            'Date': day.strftime('%Y-%m-%d' if i % 3 else '%m/%d/%Y'),
+            'Time': TIMES[i % len(TIMES)],
+            'Notes': '' if i % 7 else 'Imported from the old system',
+            'Status': 'Confirmed' if i % 10 else 'Cancelled'
+        }
+        if i % 50 == 49:
+            record['Email'] = 'not-an-email'
+        yield record
+
+
+def write_file(path, fmt, count):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        if fmt == 'csv':
+            writer = None
+            for record in synthetic_records(count):
+                if writer is None:
+                    writer = csv.DictWriter(f, fieldnames=list(record))
+                    writer.writeheader()
+                writer.writerow(record)
+        else:
+            for record in synthetic_records(count):
+                f.write(json.dumps(record) + '\n')
+
+
+def run_import(path, fmt, chunk_size, trace=False):
+    """Import the file; returns (stats, seconds, peak traced bytes)"""
+    sheet = FakeWorksheet(keep_rows=False)
+    if trace:
+        tracemalloc.start()
+    start = time.perf_counter()
+    with open(path, newline='', encoding='utf-8') as f:
+        stats = import_records(sheet, read_records(f, fmt), chunk_size=chunk_size, pacer=RequestPacer(0))
+    seconds = time.perf_counter() - start
+    peak = 0
+    if trace:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    assert sheet.rows_written == stats['written']
+    return stats, seconds, peak
+
+
+def run_export(count, page_size):
+    sheet = FakeWorksheet(make_appointment_rows(count))
+    tracemalloc.start()
+    start = time.perf_counter()
+    with open(os.devnull, 'w', newline='') as out:
+        exported = export_rows(iter_sheet_rows(sheet, page_size, RequestPacer(0)), out, 'csv')
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return exported, seconds, peak, sheet.calls.get('get_values', 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--format', choices=['csv', 'jsonl'], default='csv')
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    parser.add_argument('--export-rows', type=int, default=100000)
+    parser.add_argument('--page-size', type=int, default=5000)
+    parser.add_argument('--no-trace', action='store_true', help='skip the tracemalloc passes')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        small, large = os.path.join(directory, 'small'), os.path.join(directory, 'large')
+        start = time.perf_counter()
+        write_file(large, args.format, args.rows)
+        write_file(small, args.format, max(args.rows // 10, 1))
+        print(f"wrote {args.rows:,} {args.format} records ({os.path.getsize(large) / 1e6:.0f}MB) "
+              f"in {time.perf_counter() - start:.1f}s")
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            stats, seconds, _ = run_import(large, args.format, args.chunk_size)
+        print(f"import: {stats['written']:,} rows written, {stats['rejected']:,} rejected, "
+              f"{stats['requests']:,} append_rows calls in {seconds:.1f}s = {stats['read'] / seconds:,.0f} rows/s")
+        print(f"        at 50 writes/min a real sheet needs about {stats['requests'] / 50:.0f} minutes")
+
+        if not args.no_trace:
+            for label, path in (('1/10 size', small), ('full size', large)):
+                with contextlib.redirect_stdout(io.StringIO()):
+                    stats, _, peak = run_import(path, args.format, args.chunk_size, trace=True)
+                print(f"import peak memory, {label} ({stats['read']:>9,} records): {peak / 1e6:6.2f}MB")
+
+    exported, seconds, peak, reads = run_export(args.export_rows, args.page_size)
+    print(f"export: {exported:,} rows in {reads} ranged reads, {seconds:.2f}s = {exported / seconds:,.0f} rows/s, "
+          f"peak {peak / 1e6:.2f}MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""Measure Streamlit rerun time and session size as a conversation grows
+
+Runs app.py headlessly with streamlit's AppTest against a session that
+already holds 10, 100 or 1000 turns, with the history capped at
+HISTORY_MAX_MESSAGES (as shipped) and effectively uncapped (the previous
+behaviour). Reports the time of a full page run, the time of a run that
+also handles one chat message, the peak Python memory allocated during a
+full run and the stored session size. AppTest always reruns the whole
+script, so the chat turn figure is an upper bound for the browser, where a
+turn reruns only the chat fragment. Streamlit's "missing ScriptRunContext"
+warnings on stderr are expected under AppTest.
+
+Usage: python benchmarks/bench_chat_history.py [--turns 10 100 1000] [--max-messages N] [--repeat N]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('GENAI_API_KEY', 'benchmark')
+
+from streamlit.testing.v1 import AppTest
+
+from benchmarks.bench_session_store import make_session
+from benchmarks.fakes import FakeGenaiClient
+from chatbot_handler import ChatbotHandler
+from resources import registry, get_session_store
+from session_store import InMemorySessionStore
+
+SESSION_ID = 'b' * 32
+
+
+def responder(prompt):
+    return json.dumps({
+        'message': 'Thanks! Which date works best for you?',
+        'state': 'collecting',
+        'data': {},
+        'needs': ['date'],
+        'ready_for_confirmation': False
+    })
+
+
+def setup(turns, max_messages):
+    """Register fakes and store a session with the given history"""
+    registry.register('sessions', lambda: InMemorySessionStore(max_messages=max_messages))
+    registry.register('chatbot', lambda: ChatbotHandler(client=FakeGenaiClient(responder=responder)))
+    registry.reset('sessions')
+    registry.reset('chatbot')
+    store = get_session_store()
+    store.save(SESSION_ID, make_session(turns))
+    return store
+
+
+def new_app():
+    app = AppTest.from_file(os.path.join(ROOT, 'app.py'), default_timeout=60)
+    app.session_state['session_id'] = SESSION_ID
+    return app
+
+
+def measure(turns, max_messages, repeat):
+    store = setup(turns, max_messages)
+    full_runs, chat_turns, peaks = [], [], []
+    for _ in range(repeat):
+        app = new_app()
+        tracemalloc.start()
+        start = time.perf_counter()
+        app.run()
+        full_runs.append(time.perf_counter() - start)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        if app.exception:
+            raise RuntimeError(app.exception[0].message)
+        shown = len(app.chat_message)
+
+        start = time.perf_counter()
+        app.chat_input[0].set_value('Tomorrow please').run()
+        chat_turns.append(time.perf_counter() - start)
+        # Put the history back so every repeat starts from the same size
+        store.save(SESSION_ID, make_session(turns))
+
+    size = len(store.get_blob(SESSION_ID))
+    return min(full_runs), min(chat_turns), min(peaks), size, shown
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--turns', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--max-messages', type=int, default=int(os.getenv('HISTORY_MAX_MESSAGES', '50')))
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'turns':>6} {'history':>9} {'full run':>10} {'chat turn':>10} {'peak mem':>10} {'stored':>9} {'shown':>6}")
+    for turns in args.turns:
+        for label, max_messages in (('capped', args.max_messages), ('uncapped', 10 ** 9)):
+            with contextlib.redirect_stdout(io.StringIO()):
+                full_run, chat_turn, peak, size, shown = measure(turns, max_messages, args.repeat)
+            print(f"{turns:>6} {label:>9} {full_run * 1000:>8.1f}ms {chat_turn * 1000:>8.1f}ms "
+                  f"{peak / 1024:>8.0f}KB {size / 1024:>7.1f}KB {shown:>6}")
+    registry.close_all()
+
+
+if __name__ == '__main__':
+    main()
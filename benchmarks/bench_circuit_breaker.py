@@ -0,0 +1,142 @@
+"""Turn latency through a simulated Gemini outage, with and without the circuit breaker
+
+Worker threads send chat turns continuously while the fake model goes
+through phases: healthy, down (requests fail after a timeout-like delay),
+healthy again, then slow (requests succeed but take seconds). Reports
+per-phase p50/p99 turn latency and how turns were answered (ai, degraded
+or fallback). Then checks that scripted conversations still reach
+confirmation while the breaker is open, using local extraction only.
+
+Usage: python benchmarks/bench_circuit_breaker.py [--workers N] [--phase-seconds S] [--outage-latency S]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ['LOCAL_EXTRACTION'] = 'false'
+os.environ['RESPONSE_CACHE'] = 'false'
+
+from benchmarks.conversation import script
+from benchmarks.fakes import FakeGenaiClient
+from chatbot_handler import ChatbotHandler
+from circuit_breaker import CircuitBreaker
+from session_store import new_session
+
+MESSAGES = [
+    "Hi, I'd like to book an appointment",
+    "Do you have anything next week?",
+    "What services do you offer?",
+    "Can I come in the afternoon?",
+]
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+
+def run_phases(chatbot, client, args):
+    """Drive turns through every phase; returns [(phase, [(latency, source)])]"""
+    phases = [
+        ('healthy', args.latency, 0.0),
+        ('down', args.outage_latency, 1.0),
+        ('recovered', args.latency, 0.0),
+        ('slow', args.slow_latency, 0.0),
+        ('recovered', args.latency, 0.0),
+    ]
+    results = []
+    current = {'turns': None}
+    stop = threading.Event()
+
+    def worker(n):
+        i = n
+        while not stop.is_set():
+            turns = current['turns']
+            start = time.perf_counter()
+            response = chatbot.process_message(MESSAGES[i % len(MESSAGES)], 'collecting', {})
+            turns.append((time.perf_counter() - start, response['source']))
+            i += 1
+            time.sleep(args.think_seconds)
+
+    for name, latency, failure_rate in phases:
+        client.latency, client.failure_rate = latency, failure_rate
+        current['turns'] = []
+        results.append((name, current['turns']))
+        if len(results) == 1:
+            threads = [threading.Thread(target=worker, args=(n,)) for n in range(args.workers)]
+            for thread in threads:
+                thread.start()
+        time.sleep(args.phase_seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def degraded_completion(chatbot, conversations):
+    """Conversations that reach confirmation with the model unreachable"""
+    completed = 0
+    for i in range(conversations):
+        session = new_session()
+        for message in script(i):
+            response = chatbot.process_message(message, session['conversation_state'], session['appointment_data'])
+            chatbot.apply_turn(session, message, response)
+        completed += session['conversation_state'] == 'confirmed'
+    return completed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--phase-seconds', type=float, default=10.0)
+    parser.add_argument('--think-seconds', type=float, default=0.05, help='pause between a worker\'s turns')
+    parser.add_argument('--latency', type=float, default=0.1, help='healthy model latency')
+    parser.add_argument('--outage-latency', type=float, default=1.0, help='time before a failing request errors')
+    parser.add_argument('--slow-latency', type=float, default=2.0)
+    parser.add_argument('--slow-call-seconds', type=float, default=1.0)
+    parser.add_argument('--open-seconds', type=float, default=2.0)
+    parser.add_argument('--conversations', type=int, default=50)
+    args = parser.parse_args()
+
+    for label in ('no breaker', 'breaker'):
+        client = FakeGenaiClient(latency=args.latency, seed=3)
+        chatbot = ChatbotHandler(client=client)
+        chatbot.breaker = None
+        if label == 'breaker':
+            chatbot.breaker = CircuitBreaker('gemini-bench', window=20, min_calls=8,
+                                             slow_call_seconds=args.slow_call_seconds,
+                                             open_seconds=args.open_seconds)
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = run_phases(chatbot, client, args)
+
+        print(f"\n{label}:")
+        print(f"  {'phase':<10} {'turns':>6} {'p50 ms':>8} {'p99 ms':>8}  answered by")
+        for name, turns in results:
+            latencies = [latency for latency, _ in turns]
+            sources = dict(Counter(source for _, source in turns))
+            print(f"  {name:<10} {len(turns):>6} {percentile(latencies, 50) * 1000:>8.0f} "
+                  f"{percentile(latencies, 99) * 1000:>8.0f}  {sources}")
+        if chatbot.breaker:
+            stats = chatbot.breaker.get_stats()
+            print(f"  breaker opened {stats['opened']}x, closed {stats['closed']}x, "
+                  f"rejected {stats['rejected']} calls; now {stats['state']}")
+
+    # Degraded mode on its own: the breaker stays open for the whole run
+    chatbot = ChatbotHandler(client=FakeGenaiClient(failure_rate=1.0))
+    chatbot.breaker = CircuitBreaker('gemini-down', min_calls=1, open_seconds=3600)
+    with contextlib.redirect_stdout(io.StringIO()):
+        chatbot.breaker.record_failure()
+        completed = degraded_completion(chatbot, args.conversations)
+    print(f"\ndegraded mode: {completed}/{args.conversations} scripted conversations reached confirmation")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,221 @@
+"""End-to-end booking benchmark against local stand-ins for Gemini, Google Sheets and SMTP
+
+Runs scripted multi-turn conversations (see conversation.py) through
+ChatbotHandler, books each one with GoogleSheetsHandler and sends the
+confirmation emails with EmailHandler, with configurable latency and
+failure injection for all three services. Reports bookings per second,
+per-turn and per-booking tail latency, failure counts and memory per
+booking (peak while running one conversation, and bytes still held
+afterwards, including the fake sheet's copy of the row), measured in a
+separate single-threaded pass under tracemalloc.
+
+--json writes the results to a file; --compare reads an earlier file and
+exits with status 1 if throughput, a tail latency or memory regressed by
+more than --tolerance.
+
+Usage: python benchmarks/bench_e2e.py [--conversations N] [--concurrency N] [--json PATH] [--compare PATH]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('GENAI_API_KEY', 'benchmark')
+os.environ.setdefault('EMAIL_ADDRESS', 'bookings@example.com')
+os.environ.setdefault('EMAIL_PASSWORD', 'password')
+
+from benchmarks.conversation import script, scripted_reply, run_conversation
+from benchmarks.fakes import FakeGenaiClient, FakeSMTPServer, FakeWorksheet
+from chatbot_handler import ChatbotHandler
+from email_handler import EmailHandler
+from google_sheets_handler import GoogleSheetsHandler
+from smtp_pool import SMTPConnectionPool
+
+# Result keys compared by --compare, and whether higher is better
+COMPARED = {
+    'bookings_per_second': True,
+    'turn_p50_ms': False,
+    'turn_p99_ms': False,
+    'booking_p50_ms': False,
+    'booking_p99_ms': False,
+    'peak_bytes_per_conversation': False,
+    'retained_bytes_per_booking': False,
+}
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+
+def build_services(args, smtp_server):
+    """Chatbot, sheet-backed store and email handler wired to the fakes"""
+    jitter = args.llm_jitter
+
+    def llm_latency(rng):
+        # Log-normal spread around the median gives a realistic long tail
+        return args.llm_latency * rng.lognormvariate(0, jitter) if jitter else args.llm_latency
+
+    chatbot = ChatbotHandler(client=FakeGenaiClient(
+        responder=scripted_reply, latency_sampler=llm_latency,
+        failure_rate=args.llm_failure_rate, seed=args.seed
+    ))
+    sheet = FakeWorksheet([], call_latency=args.sheets_latency, failure_rate=args.sheets_failure_rate,
+                          seed=args.seed)
+    store = GoogleSheetsHandler(sheet=sheet)
+    emails = EmailHandler(smtp_pool=SMTPConnectionPool(
+        smtp_server.host, smtp_server.port, 'user', 'password', max_size=args.concurrency, use_tls=False
+    ))
+    return chatbot, store, emails
+
+
+def run_load(args, smtp_server):
+    """Run every conversation with a thread pool and summarize throughput and latency"""
+    chatbot, store, emails = build_services(args, smtp_server)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        results = list(pool.map(
+            lambda i: run_conversation(chatbot, store, emails, script(i)), range(args.conversations)
+        ))
+    wall = time.perf_counter() - start
+    emails.get_smtp_pool().close_all()
+    store.close()
+
+    turns = [seconds for result in results for seconds in result['turn_seconds']]
+    bookings = [result['booking_seconds'] for result in results if result['booking_seconds'] is not None]
+    booked = sum(result['booked'] for result in results)
+    sources = Counter(source for result in results for source in result['sources'])
+    return {
+        'conversations': len(results),
+        'bookings': booked,
+        'emailed': sum(result['emailed'] for result in results),
+        'seconds': wall,
+        'bookings_per_second': booked / wall if wall else 0.0,
+        'turns_per_second': len(turns) / wall if wall else 0.0,
+        'turn_p50_ms': percentile(turns, 50) * 1000,
+        'turn_p95_ms': percentile(turns, 95) * 1000,
+        'turn_p99_ms': percentile(turns, 99) * 1000,
+        'booking_p50_ms': percentile(bookings, 50) * 1000,
+        'booking_p95_ms': percentile(bookings, 95) * 1000,
+        'booking_p99_ms': percentile(bookings, 99) * 1000,
+        'turn_sources': dict(sources),
+        'model_calls': chatbot.client.calls,
+        'sheets_failures': store.sheet.failures,
+        'emails_rejected': smtp_server.rejected,
+    }
+
+
+def run_allocations(args, smtp_server, conversations):
+    """Memory per booking with no injected latency, one conversation at a time"""
+    quiet = argparse.Namespace(**dict(vars(args), llm_latency=0.0, llm_jitter=0.0, sheets_latency=0.0,
+                                      concurrency=1))
+    chatbot, store, emails = build_services(quiet, smtp_server)
+    # Warm up caches and connections so they don't count against the first booking
+    run_conversation(chatbot, store, emails, script(args.conversations))
+
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    peaks = []
+    booked = 0
+    for i in range(conversations):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        result = run_conversation(chatbot, store, emails, script(args.conversations + 1 + i))
+        peaks.append(tracemalloc.get_traced_memory()[1] - before)
+        booked += result['booked']
+    retained = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    emails.get_smtp_pool().close_all()
+    store.close()
+    return {
+        'peak_bytes_per_conversation': percentile(peaks, 50),
+        'retained_bytes_per_booking': retained / booked if booked else 0.0,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Print changes against a baseline run; returns the names of regressed metrics"""
+    regressions = []
+    print(f"\ncompared with baseline (tolerance {tolerance:.0%}):")
+    for key, higher_is_better in COMPARED.items():
+        old, new = baseline.get(key), results.get(key)
+        if old is None or new is None:
+            continue
+        change = (new - old) / old if old else 0.0
+        worse = -change if higher_is_better else change
+        flag = ''
+        if worse > tolerance:
+            flag = '  REGRESSION'
+            regressions.append(key)
+        print(f"  {key:>28}: {old:12.1f} -> {new:12.1f} ({change:+.1%}){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--conversations', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=16, help='conversations in flight at once')
+    parser.add_argument('--llm-latency', type=float, default=0.2, help='median model latency in seconds')
+    parser.add_argument('--llm-jitter', type=float, default=0.5, help='log-normal sigma of the model latency')
+    parser.add_argument('--llm-failure-rate', type=float, default=0.0)
+    parser.add_argument('--llm-every-turn', action='store_true',
+                        help='disable the local fast path and response cache so every turn calls the model')
+    parser.add_argument('--sheets-latency', type=float, default=0.1)
+    parser.add_argument('--sheets-failure-rate', type=float, default=0.0)
+    parser.add_argument('--smtp-latency', type=float, default=0.05, help='connect and login latency each')
+    parser.add_argument('--smtp-send-latency', type=float, default=0.01)
+    parser.add_argument('--smtp-failure-rate', type=float, default=0.0)
+    parser.add_argument('--alloc-conversations', type=int, default=50,
+                        help='conversations in the tracemalloc pass (0 skips it)')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help='write results to this file')
+    parser.add_argument('--compare', help='baseline results file from an earlier --json run')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='allowed relative regression')
+    args = parser.parse_args()
+    if args.llm_every_turn:
+        os.environ['LOCAL_EXTRACTION'] = 'false'
+        os.environ['RESPONSE_CACHE'] = 'false'
+
+    with FakeSMTPServer(connect_latency=args.smtp_latency, auth_latency=args.smtp_latency,
+                        send_latency=args.smtp_send_latency, failure_rate=args.smtp_failure_rate,
+                        seed=args.seed) as smtp_server:
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = run_load(args, smtp_server)
+            if args.alloc_conversations:
+                results.update(run_allocations(args, smtp_server, args.alloc_conversations))
+
+    print(f"{results['conversations']} conversations, {args.concurrency} concurrent: "
+          f"{results['bookings']} booked, {results['emailed']} emailed in {results['seconds']:.2f}s")
+    print(f"throughput: {results['bookings_per_second']:.1f} bookings/s, "
+          f"{results['turns_per_second']:.1f} turns/s")
+    print(f"turn latency:    p50 {results['turn_p50_ms']:7.1f}ms  p95 {results['turn_p95_ms']:7.1f}ms  "
+          f"p99 {results['turn_p99_ms']:7.1f}ms")
+    print(f"booking latency: p50 {results['booking_p50_ms']:7.1f}ms  p95 {results['booking_p95_ms']:7.1f}ms  "
+          f"p99 {results['booking_p99_ms']:7.1f}ms")
+    print(f"turns by source: {results['turn_sources']}; model calls: {results['model_calls']}")
+    print(f"injected failures: sheets {results['sheets_failures']}, emails rejected {results['emails_rejected']}")
+    if 'peak_bytes_per_conversation' in results:
+        print(f"memory: peak {results['peak_bytes_per_conversation'] / 1024:.1f}KB per conversation, "
+              f"{results['retained_bytes_per_booking']:.0f} bytes retained per booking")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'config': vars(args), 'results': results}, f, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""Messages rendered per second: compiled email templates vs building MIMEMultipart trees per message
+
+The baseline reproduces the previous EmailHandler approach (an f-string
+body attached to a new MIMEMultipart, then as_string()), extended with
+an HTML alternative so both sides produce the same text+HTML message.
+The template paths use email_templates: one message at a time through a
+cached template, and a bulk reminder batch through render_many. Both
+build a fresh message each time; the template paths use EmailMessage,
+whose header encoding and folding cost more per message than the
+legacy compat32 classes. No SMTP is involved; this only measures
+building the wire text.
+
+Usage: python benchmarks/bench_email_templates.py [--messages N]
+"""
+import argparse
+import os
+import sys
+import time
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from email_handler import EmailHandler
+from email_templates import TemplateLoader
+
+
+def booking(i):
+    return {
+        'name': f'Customer {i}', 'email': f'customer{i}@example.com', 'phone': f'555{i:07d}',
+        'date': '2026-11-02', 'time': '10:00', 'service': 'Dental Cleaning', 'notes': ''
+    }
+
+
+def mime_message(handler, appointment_data):
+    """Baseline: the hard-coded f-string body in a fresh MIME tree"""
+    msg = MIMEMultipart('alternative')
+    msg['From'] = handler.email_address
+    msg['To'] = appointment_data['email']
+    msg['Subject'] = f"Appointment Confirmation - {handler.business_name}"
+    context = handler.user_context(appointment_data)
+    body = f"""Dear {context['name']},
+
+Thank you for booking an appointment with {context['business_name']}!
+
+Your appointment details:
+• Date: {context['date']}
+• Time: {context['time']}
+• Service: {context['service']}
+• Contact: {context['phone']}
+
+Additional Notes: {context['notes']}
+
+We look forward to seeing you on your appointment date. If you need to reschedule or cancel, please contact us as soon as possible.
+
+Best regards,
+{context['business_name']}
+"""
+    html_body = '<html><body>' + ''.join(f'<p>{line}</p>' for line in body.split('\n')) + '</body></html>'
+    msg.attach(MIMEText(body, 'plain', 'utf-8'))
+    msg.attach(MIMEText(html_body, 'html', 'utf-8'))
+    return msg.as_string()
+
+
+def rate(label, count, seconds, baseline=None):
+    per_second = count / seconds
+    speedup = f'  {per_second / baseline:5.1f}x' if baseline else ''
+    print(f"{label:<34} {per_second:>10,.0f} msg/s  {seconds / count * 1e6:7.1f} us/msg{speedup}")
+    return per_second
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=20000)
+    args = parser.parse_args()
+
+    handler = EmailHandler(templates=TemplateLoader())
+    handler.email_address = 'bookings@example.com'
+    bookings = [booking(i) for i in range(args.messages)]
+
+    start = time.perf_counter()
+    loader = TemplateLoader()
+    loader.get('user_confirmation')
+    cold = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(10000):
+        loader.get('user_confirmation')
+    print(f"template load and compile {cold * 1e3:.2f}ms; cached lookup {(time.perf_counter() - start) / 10000 * 1e6:.2f}us")
+
+    start = time.perf_counter()
+    for appointment_data in bookings:
+        mime_message(handler, appointment_data)
+    baseline = rate('MIMEMultipart per message', args.messages, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for appointment_data in bookings:
+        template = handler.templates.get('user_confirmation')
+        template.render(handler.email_address, appointment_data['email'],
+                        handler.user_context(appointment_data)).as_string()
+    rate('compiled template per message', args.messages, time.perf_counter() - start, baseline)
+
+    start = time.perf_counter()
+    for msg in handler.build_reminders(bookings):
+        msg.as_string()
+    rate('bulk reminders (render_many)', args.messages, time.perf_counter() - start, baseline)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""Overhead of the metrics layer and a sample of what it exports
+
+First times metrics.timed() around a no-op call with metrics disabled,
+enabled, sampled and (if opentelemetry-sdk is installed) with spans, in
+nanoseconds per call. Then runs booking turns against fake Gemini, Google
+Sheets and SMTP services, with injected model failures, and prints the
+resulting Prometheus output without the per-bucket lines.
+
+Usage: python benchmarks/bench_metrics.py [--calls N] [--turns N] [--failure-rate R]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('LOCAL_EXTRACTION', 'false')
+os.environ.setdefault('RESPONSE_CACHE', 'false')
+
+from benchmarks.fakes import FakeGenaiClient, FakeSMTPServer, FakeWorksheet
+from chatbot_handler import ChatbotHandler
+from email_handler import EmailHandler
+from google_sheets_handler import GoogleSheetsHandler
+from metrics import Metrics, get_metrics
+from smtp_pool import SMTPConnectionPool
+
+BOOKING = {
+    'name': 'Jane Doe',
+    'email': 'jane@example.com',
+    'phone': '5550001234',
+    'date': '2026-12-01',
+    'time': '10:00',
+    'service': 'Consultation'
+}
+
+
+def overhead(metrics, calls):
+    """Nanoseconds added per timed call"""
+    start = time.perf_counter()
+    for _ in range(calls):
+        pass
+    baseline = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(calls):
+        with metrics.timed('bench', 'noop'):
+            pass
+    return (time.perf_counter() - start - baseline) * 1e9 / calls
+
+
+def otel_tracer():
+    """A tracer whose spans are created but not exported, or None"""
+    try:
+        from opentelemetry.sdk.trace import TracerProvider
+    except ImportError:
+        return None
+    return TracerProvider().get_tracer('bench')
+
+
+def responder(prompt):
+    return json.dumps({
+        'message': 'Thanks! Which date works best for you?',
+        'state': 'collecting',
+        'data': {'service': 'Consultation'},
+        'needs': ['date'],
+        'ready_for_confirmation': False
+    })
+
+
+def run_turns(args):
+    """Drive chat turns, bookings and emails through the instrumented code paths"""
+    chatbot = ChatbotHandler(client=FakeGenaiClient(
+        responder=responder, latency=args.llm_latency, failure_rate=args.failure_rate, seed=1
+    ))
+    sheets = GoogleSheetsHandler(sheet=FakeWorksheet([], call_latency=args.sheets_latency))
+    with FakeSMTPServer(connect_latency=0.01, auth_latency=0.01) as server:
+        os.environ.setdefault('EMAIL_ADDRESS', 'bookings@example.com')
+        os.environ.setdefault('EMAIL_PASSWORD', 'password')
+        emails = EmailHandler(smtp_pool=SMTPConnectionPool(server.host, server.port, 'user', 'password',
+                                                           use_tls=False))
+        for i in range(args.turns):
+            chatbot.process_message(f'I need a consultation {i}', 'collecting', {})
+            sheets.add_appointment(BOOKING)
+            sheets.get_available_slots(BOOKING['date'])
+            if i % 5 == 0:
+                emails.send_notifications(BOOKING)
+        emails.get_smtp_pool().close_all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--calls', type=int, default=200000)
+    parser.add_argument('--turns', type=int, default=50)
+    parser.add_argument('--failure-rate', type=float, default=0.1, help='share of model calls that fail')
+    parser.add_argument('--llm-latency', type=float, default=0.005)
+    parser.add_argument('--sheets-latency', type=float, default=0.002)
+    args = parser.parse_args()
+
+    tracer = otel_tracer()
+    variants = [
+        ('disabled', Metrics(enabled=False)),
+        ('enabled', Metrics()),
+        ('sampled 10%', Metrics(sample_rate=0.1)),
+    ]
+    if tracer:
+        variants += [('otel spans', Metrics(tracer=tracer)), ('otel spans 10%', Metrics(sample_rate=0.1, tracer=tracer))]
+    else:
+        print("opentelemetry-sdk not installed; skipping span overhead")
+    for label, metrics in variants:
+        print(f"{label:>15}: {overhead(metrics, args.calls):7.0f} ns per timed call")
+
+    get_metrics().reset()
+    with contextlib.redirect_stdout(io.StringIO()):
+        run_turns(args)
+    print()
+    for line in get_metrics().render().splitlines():
+        if '_bucket{' not in line and not line.startswith('#'):
+            print(line)
+
+
+if __name__ == '__main__':
+    main()
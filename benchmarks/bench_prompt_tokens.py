@@ -0,0 +1,68 @@
+"""Prompt tokens per turn: the old concatenated prompt vs cached instructions plus a compact delta
+
+Usage: python benchmarks/bench_prompt_tokens.py
+"""
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ['LOCAL_EXTRACTION'] = 'false'
+os.environ['RESPONSE_CACHE'] = 'false'
+
+from benchmarks.fakes import FakeGenaiClient, count_tokens
+from chatbot_handler import ChatbotHandler
+
+LEGACY_CONTEXT = """
+CURRENT STATE: {state}
+CURRENT APPOINTMENT DATA: {data}
+MISSING FIELDS: {missing}
+USER MESSAGE: {message}
+
+IMPORTANT: Look carefully at the CURRENT APPOINTMENT DATA to see what information has already been collected. DO NOT ask for information that is already present in the appointment data.
+
+Based on the user's message and current appointment data, determine what to do next and respond appropriately.
+
+If the user mentions a service type (like consultation, medical check-up, dental cleaning, etc.), make sure to extract it and include it in your response data.
+
+Remember to validate any new information and guide the user through the booking process by asking for the NEXT missing field only.
+"""
+
+TURNS = [
+    ('greeting', {}, "Hi, I'd like to book an appointment"),
+    ('collecting', {}, "It's for a dental cleaning please"),
+    ('collecting', {'service': 'Dental Cleaning'}, "My name is Jane Doe and my email is jane@example.com"),
+    ('collecting', {'service': 'Dental Cleaning', 'name': 'Jane Doe', 'email': 'jane@example.com'},
+     "You can reach me on 555 123 4567, next Tuesday afternoon if possible"),
+]
+
+
+def legacy_prompt(system_prompt, state, data, message):
+    """The prompt the handler used to send: full instructions plus a verbose context block"""
+    missing = [f for f in ['name', 'email', 'phone', 'service', 'date', 'time'] if not data.get(f)]
+    context = LEGACY_CONTEXT.format(state=state, data=json.dumps(data), missing=missing, message=message)
+    return f"{system_prompt}\n\n{context}"
+
+
+def run(min_cache_tokens):
+    client = FakeGenaiClient(min_cache_tokens=min_cache_tokens)
+    chatbot = ChatbotHandler(client=client)
+    rows = []
+    for state, data, message in TURNS:
+        before = count_tokens(legacy_prompt(chatbot.get_system_prompt(), state, data, message))
+        chatbot.process_message(message, state, dict(data))
+        after = chatbot.get_prompt_stats()['last_turn']
+        rows.append((before, after['prompt_tokens'], after['uncached_tokens']))
+    return rows
+
+
+def main():
+    for label, min_tokens in (('context cache', 0), ('system_instruction only', 10_000)):
+        print(f"{label}:")
+        print(f"  {'turn':>4} {'before':>8} {'after':>8} {'uncached':>9}")
+        for i, (before, after, uncached) in enumerate(run(min_tokens), 1):
+            print(f"  {i:>4} {before:>8} {after:>8} {uncached:>9}")
+
+
+if __name__ == '__main__':
+    main()
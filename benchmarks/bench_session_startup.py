@@ -0,0 +1,84 @@
+"""Session cold-start time and memory: per-session handlers vs the shared resource registry
+
+Google authentication and opening the spreadsheet are simulated with a fixed
+delay before building the handler on a fake worksheet (whose calls, such as
+ensure_headers, pay a simulated round trip). The chatbot uses a real
+genai.Client constructed with a dummy key, which makes no network calls.
+
+Usage: python benchmarks/bench_session_startup.py [--sessions N] [--auth-latency SECONDS]
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('GENAI_API_KEY', 'benchmark-key')
+
+from benchmarks.fakes import FakeWorksheet
+from chatbot_handler import ChatbotHandler
+from email_handler import EmailHandler
+from google_sheets_handler import GoogleSheetsHandler
+from resources import ResourceRegistry
+
+
+def rss_bytes():
+    """Resident set size of this process (Linux)"""
+    with open('/proc/self/statm') as statm:
+        return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def measure(new_session, sessions):
+    """Create sessions; return (mean cold start ms, traced bytes retained, RSS growth)"""
+    gc.collect()
+    rss_before = rss_bytes()
+    tracemalloc.start()
+    kept = []
+    start = time.perf_counter()
+    for _ in range(sessions):
+        kept.append(new_session())
+    elapsed = time.perf_counter() - start
+    traced, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed * 1000 / sessions, traced, rss_bytes() - rss_before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sessions', type=int, default=100)
+    parser.add_argument('--auth-latency', type=float, default=0.15, help='simulated auth + open_by_key seconds')
+    parser.add_argument('--api-latency', type=float, default=0.05, help='simulated Sheets call round trip')
+    args = parser.parse_args()
+
+    sheet = FakeWorksheet(call_latency=args.api_latency)
+
+    def build_sheets_handler():
+        time.sleep(args.auth_latency)
+        return GoogleSheetsHandler(sheet=sheet)
+
+    def per_session():
+        return {
+            'sheets_handler': build_sheets_handler(),
+            'email_handler': EmailHandler(),
+            'chatbot': ChatbotHandler()
+        }
+
+    registry = ResourceRegistry()
+    registry.register('sheets', build_sheets_handler)
+    registry.register('email', EmailHandler)
+    registry.register('chatbot', ChatbotHandler)
+
+    def shared():
+        return {name: registry.get(name) for name in ('sheets', 'email', 'chatbot')}
+
+    print(f"{args.sessions} sessions")
+    for label, new_session in (('per-session handlers', per_session), ('shared registry', shared)):
+        cold_ms, traced, rss = measure(new_session, args.sessions)
+        print(f"{label:<22} cold start {cold_ms:8.2f} ms/session  "
+              f"heap {traced / 1024:9.1f} KiB  RSS +{rss / 1024:9.1f} KiB")
+
+
+if __name__ == '__main__':
+    main()
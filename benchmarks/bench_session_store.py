@@ -0,0 +1,72 @@
+"""Measure the per-turn cost of keeping conversation state in an external session store
+
+Each simulated turn is one load and one save of a session with the given
+number of turns of history, as app.py does on every message. Compares the
+in-memory, SQLite and Redis backends (Redis via a local fake RESP server,
+optionally with added network latency) and the compact encoding's size
+against plain JSON.
+
+Usage: python benchmarks/bench_session_store.py [--turns 10 100 1000] [--redis-latency SECONDS]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes import FakeRedisServer
+from session_store import (InMemorySessionStore, SQLiteSessionStore, RedisSessionStore,
+                           new_session, serialize_session)
+
+
+def make_session(turns):
+    session = new_session()
+    for i in range(turns):
+        session['messages'].append({'role': 'user', 'content': f'I would like a dental cleaning, message {i}'})
+        session['messages'].append({
+            'role': 'assistant',
+            'content': "Great choice! Could you tell me which date works best for you? "
+                       "We're open 9 AM to 5 PM on weekdays."
+        })
+    session['conversation_state'] = 'collecting'
+    session['appointment_data'] = {'name': 'Jane Doe', 'email': 'jane@example.com', 'service': 'Dental Cleaning'}
+    return session
+
+
+def time_turns(store, session, count):
+    """Mean milliseconds for one load + save round trip"""
+    store.save('bench', session)
+    start = time.perf_counter()
+    for _ in range(count):
+        loaded = store.load('bench')
+        store.save('bench', loaded)
+    return (time.perf_counter() - start) * 1000 / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--turns', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--count', type=int, default=300, help='load/save round trips per measurement')
+    parser.add_argument('--redis-latency', type=float, default=0.0005, help='simulated one-way Redis latency in seconds')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp, FakeRedisServer(latency=args.redis_latency) as redis_server:
+        stores = {
+            'memory': InMemorySessionStore(),
+            'sqlite': SQLiteSessionStore(os.path.join(tmp, 'sessions.db')),
+            'redis': RedisSessionStore(url=redis_server.url)
+        }
+        print(f"{'turns':>6} {'json B':>9} {'stored B':>9}  " + ' '.join(f'{name + " ms":>10}' for name in stores))
+        for turns in args.turns:
+            session = make_session(turns)
+            plain = len(json.dumps(session).encode('utf-8'))
+            compact = len(serialize_session(session))
+            timings = [time_turns(store, session, args.count) for store in stores.values()]
+            print(f"{turns:>6} {plain:>9} {compact:>9}  " + ' '.join(f'{ms:>10.3f}' for ms in timings))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""Bytes transferred per availability check before and after partitioning the sheet
+
+Builds a single-worksheet "legacy" spreadsheet with --years of past
+appointments plus the upcoming booking window, measures what a cold
+availability check (the slot index load) and a one-month history query
+download, runs sheet_partitions' migrate on it, and measures again.
+Sizes are the JSON size of the returned value ranges, roughly what the
+Sheets API sends. Also checks that a running slot index notices the
+archive job's row deletions and still indexes bookings appended after it.
+
+Usage: python benchmarks/bench_sheet_partitions.py [--years N] [--upcoming-days N]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes import FakeSpreadsheet, FakeWorksheet, make_appointment_rows
+from google_sheets_handler import GoogleSheetsHandler
+import sheet_partitions
+
+
+def cold_check(spreadsheet, day):
+    """Bytes read by a fresh handler answering one availability check"""
+    before = spreadsheet.bytes_read
+    handler = GoogleSheetsHandler(spreadsheet=spreadsheet)
+    slots = handler.get_available_slots(day)
+    return spreadsheet.bytes_read - before, slots
+
+
+def history_read(spreadsheet, start, end):
+    """Bytes read by a date-range query; returns (bytes, rows)"""
+    handler = GoogleSheetsHandler(spreadsheet=spreadsheet)
+    before = spreadsheet.bytes_read
+    rows = handler.get_appointments(start, end)
+    return spreadsheet.bytes_read - before, rows
+
+
+def scan_read(spreadsheet, start, end):
+    """The previous way to query a range: get_all_records and filter"""
+    before = spreadsheet.bytes_read
+    records = spreadsheet.sheet1.get_all_records()
+    rows = [record for record in records if start <= record['Date'] <= end]
+    return spreadsheet.bytes_read - before, rows
+
+
+def check_generation():
+    """A booking appended after an archive run reaches an index loaded before it"""
+    today = date.today()
+    rows = make_appointment_rows(90, (today - timedelta(days=5)).strftime('%Y-%m-%d'))
+    spreadsheet = FakeSpreadsheet(FakeWorksheet(rows))
+    handler = GoogleSheetsHandler(spreadsheet=spreadsheet)
+    handler.slot_index.load()
+    with contextlib.redirect_stdout(io.StringIO()):
+        sheet_partitions.main(['archive'], spreadsheet=spreadsheet)
+    day = (today + timedelta(days=30)).strftime('%Y-%m-%d')
+    spreadsheet.sheet1.rows.append(['', 'Other', 'o@example.com', '5550000000', day, '10:00', 'Consultation', '',
+                                    'Confirmed'])
+    handler.slot_index.sync_delta()
+    indexed = '10:00' not in handler.get_available_slots(day)
+    print(f"archive generation: booking appended after the run indexed {indexed}, row count "
+          f"{handler.slot_index._row_count} for {len(spreadsheet.sheet1.rows)} hot rows")
+    assert indexed and handler.slot_index._row_count == len(spreadsheet.sheet1.rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--years', type=int, default=3, help='years of past appointments in the legacy sheet')
+    parser.add_argument('--upcoming-days', type=int, default=60, help='days of future bookings')
+    args = parser.parse_args()
+
+    today = date.today()
+    first = today - timedelta(days=365 * args.years)
+    days = (today - first).days + args.upcoming_days
+    rows = make_appointment_rows(days * 9, first.strftime('%Y-%m-%d'))
+    spreadsheet = FakeSpreadsheet(FakeWorksheet(rows))
+    check_day = (today + timedelta(days=7)).strftime('%Y-%m-%d')
+    month = (today.replace(day=1) - timedelta(days=200)).replace(day=1)
+    month_start = month.strftime('%Y-%m-%d')
+    month_end = ((month + timedelta(days=32)).replace(day=1) - timedelta(days=1)).strftime('%Y-%m-%d')
+    print(f"legacy sheet: {len(rows):,} rows from {first} to {today + timedelta(days=args.upcoming_days - 1)}")
+
+    before_check, before_slots = cold_check(spreadsheet, check_day)
+    scan_bytes, scanned = scan_read(spreadsheet, month_start, month_end)
+
+    start = time.perf_counter()
+    calls_before = dict(spreadsheet.calls)
+    with contextlib.redirect_stdout(io.StringIO()):
+        stats = sheet_partitions.main(['migrate'], spreadsheet=spreadsheet)
+    seconds = time.perf_counter() - start
+    calls = {name: count - calls_before.get(name, 0) for name, count in spreadsheet.calls.items()
+             if count != calls_before.get(name, 0)}
+    writes = sum(sheet.calls.get('append_rows', 0) + sheet.calls.get('update', 0)
+                 for sheet in spreadsheet.worksheets())
+    print(f"migrate: moved {stats['archived']:,} rows into {len(stats['months'])} monthly archives in "
+          f"{seconds:.2f}s, verified={stats['verified']}")
+    print(f"         spreadsheet calls {calls}, {writes} worksheet writes")
+
+    after_check, after_slots = cold_check(spreadsheet, check_day)
+    assert after_slots == before_slots, 'availability changed after migrating'
+    print(f"cold availability check ({check_day}): {before_check / 1e3:8.1f}KB -> {after_check / 1e3:6.1f}KB "
+          f"({before_check / after_check:.1f}x less)")
+
+    range_bytes, ranged = history_read(spreadsheet, month_start, month_end)
+    assert [row[1] for row in ranged] == [record['Name'] for record in scanned], 'history rows differ'
+    print(f"history {month_start}..{month_end} ({len(ranged)} rows): get_all_records {scan_bytes / 1e3:8.1f}KB "
+          f"-> values_batch_get {range_bytes / 1e3:6.1f}KB ({scan_bytes / range_bytes:.1f}x less)")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        rerun = sheet_partitions.main(['archive'], spreadsheet=spreadsheet)
+    print(f"daily archive rerun: {rerun['archived']} rows to move")
+
+    check_generation()
+
+
+if __name__ == '__main__':
+    main()
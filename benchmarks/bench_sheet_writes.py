@@ -0,0 +1,70 @@
+"""Booking write throughput: one append_row per booking vs the batched write-behind buffer
+
+Usage: python benchmarks/bench_sheet_writes.py [--bookings N] [--threads N] [--latency SECONDS]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes import FakeWorksheet
+from google_sheets_handler import GoogleSheetsHandler
+from sheet_write_buffer import SheetWriteBuffer
+
+
+def booking(i):
+    return {
+        'name': f'Customer {i}',
+        'email': f'customer{i}@example.com',
+        'phone': '5550001234',
+        'date': '2026-12-01',
+        'time': f'{9 + i % 9:02d}:00',
+        'service': 'Consultation'
+    }
+
+
+def run(handler, bookings, threads):
+    """Submit bookings concurrently; return (seconds until acknowledged, results)"""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        results = list(pool.map(handler.add_appointment, (booking(i) for i in range(bookings))))
+    return time.perf_counter() - start, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--bookings', type=int, default=500)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--latency', type=float, default=0.05, help='simulated API round trip in seconds')
+    parser.add_argument('--batch-size', type=int, default=50)
+    parser.add_argument('--flush-seconds', type=float, default=0.5)
+    args = parser.parse_args()
+
+    sheet = FakeWorksheet(call_latency=args.latency)
+    direct = GoogleSheetsHandler(sheet=sheet)
+    elapsed, _ = run(direct, args.bookings, args.threads)
+    print(f"direct:   {args.bookings / elapsed:8.0f} bookings/s  "
+          f"append calls={sheet.calls.get('append_row', 0)}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sheet = FakeWorksheet(call_latency=args.latency)
+        buffer = SheetWriteBuffer(sheet, os.path.join(tmp, 'spool.jsonl'),
+                                  max_batch_size=args.batch_size, flush_interval=args.flush_seconds)
+        buffered = GoogleSheetsHandler(sheet=sheet, write_buffer=buffer)
+        start = time.perf_counter()
+        elapsed, results = run(buffered, args.bookings, args.threads)
+        for result in results:
+            result['future'].result()
+        total = time.perf_counter() - start
+        buffer.close()
+        assert len(sheet.rows) == args.bookings + 1
+        print(f"buffered: {args.bookings / elapsed:8.0f} bookings/s acknowledged, "
+              f"{args.bookings / total:.0f}/s written  append calls={sheet.calls.get('append_rows', 0)}")
+
+
+if __name__ == '__main__':
+    main()
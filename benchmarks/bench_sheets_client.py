@@ -0,0 +1,119 @@
+"""Booking sessions against a quota-enforcing fake Sheets API, with and without the SheetsClient layer
+
+Sessions arrive in waves, one wave per quota minute. Each one opens a
+GoogleSheetsHandler on the shared worksheet (a header check and a full
+slot index load, both reads), checks availability and books a slot (a
+write). The fake refuses requests over 60 reads or 60 writes per
+sliding minute with 429 and fails --server-error-rate of calls with
+503. Without the client those errors fail sessions. With it, requests
+are paced under the quota, errors are retried and identical concurrent
+reads are coalesced. --minute sets how many real seconds a quota minute
+lasts, so a run takes seconds instead of minutes; queue times are
+reported in quota seconds.
+
+Usage: python benchmarks/bench_sheets_client.py [--sessions N] [--waves N] [--minute SECONDS]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import threading
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes import FakeQuota, FakeWorksheet, make_appointment_rows
+from appointment_store import TIME_SLOTS
+from google_sheets_handler import GoogleSheetsHandler
+from metrics import get_metrics
+from sheets_client import SheetsClient
+
+
+def session(sheet, client, index, results):
+    start = time.perf_counter()
+    handler = GoogleSheetsHandler(sheet=sheet, sheets_client=client)
+    day = (date.today() + timedelta(days=1 + index % 170)).strftime('%Y-%m-%d')
+    slot = TIME_SLOTS[index // 170 % len(TIME_SLOTS)]
+    slots = handler.get_available_slots(day)
+    booked = slot in slots and handler.add_appointment({
+        'name': f'Customer {index}', 'email': f'customer{index}@example.com', 'phone': '5550000000',
+        'service': 'Consultation', 'date': day, 'time': slot
+    })['success']
+    results.append((booked, time.perf_counter() - start))
+
+
+def run(args, use_client):
+    scale = 60.0 / args.minute  # quota minutes per real minute
+    quota = FakeQuota(reads=60, writes=60, window=args.minute)
+    sheet = FakeWorksheet(make_appointment_rows(args.rows), call_latency=args.latency, quota=quota,
+                          failure_rate=args.server_error_rate, failure_code=503, seed=1)
+    client = None
+    if use_client:
+        client = SheetsClient(reads_per_minute=50 * scale, writes_per_minute=50 * scale, burst=10,
+                              base_delay=1.0 / scale, max_delay=32.0 / scale, max_wait=60.0 / scale)
+    get_metrics().reset()
+
+    results = []
+    threads = []
+    per_wave = -(-args.sessions // args.waves)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for wave in range(args.waves):
+            wave_start = start + wave * args.minute
+            time.sleep(max(0.0, wave_start - time.perf_counter()))
+            for index in range(wave * per_wave, min(args.sessions, (wave + 1) * per_wave)):
+                thread = threading.Thread(target=session, args=(sheet, client, index, results))
+                thread.start()
+                threads.append(thread)
+        for thread in threads:
+            thread.join()
+    seconds = time.perf_counter() - start
+
+    latencies = sorted(latency * scale for _, latency in results)
+    booked = sum(1 for ok, _ in results if ok)
+    row = {
+        'booked': booked,
+        'failed': len(results) - booked,
+        'reads': quota.accepted['read'],
+        'writes': quota.accepted['write'],
+        'rejected_429': quota.rejected['read'] + quota.rejected['write'],
+        'p50': latencies[len(latencies) // 2],
+        'p95': latencies[int(len(latencies) * 0.95)],
+        'seconds': seconds * scale
+    }
+    if client:
+        stats = client.get_stats()
+        queue = [get_metrics().get_histogram('sheets_queue_seconds', kind=kind) for kind in ('read', 'write')]
+        waits = sum(h['count'] for h in queue if h)
+        row.update(retries=stats['retries'], coalesced=stats['coalesced'],
+                   mean_queue=sum(h['sum'] for h in queue if h) * scale / max(waits, 1))
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, default=200)
+    parser.add_argument('--waves', type=int, default=4, help='session arrival waves, one per quota minute')
+    parser.add_argument('--minute', type=float, default=2.0, help='real seconds per quota minute')
+    parser.add_argument('--rows', type=int, default=2000, help='existing appointments in the sheet')
+    parser.add_argument('--latency', type=float, default=0.02, help='simulated API round trip in real seconds')
+    parser.add_argument('--server-error-rate', type=float, default=0.03)
+    args = parser.parse_args()
+
+    print(f"{args.sessions} sessions in {args.waves} waves, quota 60 reads + 60 writes per minute, "
+          f"{args.server_error_rate:.0%} 503s; times in quota seconds")
+    print(f"{'mode':<8} {'booked':>7} {'failed':>7} {'reads':>6} {'writes':>7} {'429s':>5} {'retries':>8} "
+          f"{'coalesced':>10} {'queue':>7} {'p50':>6} {'p95':>6} {'total':>7}")
+    for mode, use_client in (('raw', False), ('client', True)):
+        row = run(args, use_client)
+        queue = f"{row['mean_queue']:.1f}s" if 'mean_queue' in row else '-'
+        print(f"{mode:<8} {row['booked']:>7} {row['failed']:>7} {row['reads']:>6} {row['writes']:>7} "
+              f"{row['rejected_429']:>5} {row.get('retries', '-'):>8} {row.get('coalesced', '-'):>10} "
+              f"{queue:>7} {row['p50']:>5.1f}s "
+              f"{row['p95']:>5.1f}s {row['seconds']:>6.0f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Compare slot availability check latency: full sheet scan vs the local slot index
+
+Also checks that idle delta syncs (empty reads) don't skip rows appended
+afterwards by another process.
+
+Usage: python benchmarks/bench_slot_index.py [--latency SECONDS]
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes import FakeWorksheet, make_appointment_rows
+from google_sheets_handler import GoogleSheetsHandler
+
+ALL_SLOTS = ['09:00', '10:00', '11:00', '12:00', '13:00', '14:00', '15:00', '16:00', '17:00']
+
+
+def scan_available_slots(sheet, date):
+    """The previous implementation: download every record and scan it"""
+    booked = [r.get('Time') for r in sheet.get_all_records()
+              if r.get('Date') == date and r.get('Status') == 'Confirmed']
+    return [slot for slot in ALL_SLOTS if slot not in booked]
+
+
+def time_checks(fn, dates, repeat):
+    """Return the mean latency of fn(date) in milliseconds"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for date in dates:
+            fn(date)
+    return (time.perf_counter() - start) * 1000 / (repeat * len(dates))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--latency', type=float, default=0.0, help='simulated API round trip in seconds')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'scan ms':>10} {'index ms':>10} {'speedup':>9}")
+    for size in (1_000, 10_000, 100_000):
+        tomorrow = (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d')
+        sheet = FakeWorksheet(make_appointment_rows(size, tomorrow), call_latency=args.latency)
+        handler = GoogleSheetsHandler(sheet=sheet)
+        dates = sorted({row[4] for row in sheet.rows[1:]})[:20]
+
+        scan_ms = time_checks(lambda d: scan_available_slots(sheet, d), dates, args.repeat)
+        handler.get_available_slots(dates[0])  # initial index load
+        index_ms = time_checks(handler.get_available_slots, dates, args.repeat * 100)
+
+        assert handler.get_available_slots(dates[0]) == scan_available_slots(sheet, dates[0])
+        print(f"{size:>8} {scan_ms:>10.3f} {index_ms:>10.4f} {scan_ms / index_ms:>8.0f}x")
+
+    check_idle_deltas()
+
+
+def check_idle_deltas():
+    """A booking appended by another replica after several empty delta reads is still indexed"""
+    sheet = FakeWorksheet(make_appointment_rows(1, '2027-01-01'))
+    handler = GoogleSheetsHandler(sheet=sheet)
+    handler.slot_index.load()
+    for _ in range(3):
+        handler.slot_index.sync_delta()
+    sheet.rows.append(['2027-01-01 00:00:00', 'Other', 'o@example.com', '5550000000', '2027-01-02', '10:00',
+                       'Consultation', '', 'Confirmed'])
+    handler.slot_index.sync_delta()
+    indexed = handler.slot_index.get_status('2027-01-02', '10:00') == 'Confirmed'
+    print(f"idle delta syncs: row count {handler.slot_index._row_count} for {len(sheet.rows)} sheet rows, "
+          f"external booking indexed {indexed}")
+    assert indexed and handler.slot_index._row_count == len(sheet.rows)
+
+
+if __name__ == '__main__':
+    main()
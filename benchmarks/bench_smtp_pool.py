@@ -0,0 +1,74 @@
+"""Email send latency: a new SMTP session per message vs the pooled connection
+
+Usage: python benchmarks/bench_smtp_pool.py [--messages N] [--handshake SECONDS]
+"""
+import argparse
+import os
+import smtplib
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes import FakeSMTPServer
+from email_handler import EmailHandler
+from smtp_pool import SMTPConnectionPool
+
+BOOKING = {
+    'name': 'Jane Doe',
+    'email': 'jane@example.com',
+    'phone': '5550001234',
+    'date': '2026-12-01',
+    'time': '10:00',
+    'service': 'Consultation'
+}
+
+
+class PerMessagePool:
+    """The previous behaviour: connect and log in for every message"""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+
+    def sendmail(self, from_addr, to_addrs, msg):
+        server = smtplib.SMTP(self.host, self.port)
+        server.login('user', 'password')
+        server.sendmail(from_addr, to_addrs, msg)
+        server.quit()
+
+
+def run(pool, bookings):
+    """Send booking notifications and return milliseconds per booking"""
+    os.environ.setdefault('EMAIL_ADDRESS', 'bookings@example.com')
+    os.environ.setdefault('EMAIL_PASSWORD', 'password')
+    handler = EmailHandler(smtp_pool=pool)
+    start = time.perf_counter()
+    for _ in range(bookings):
+        result = handler.send_notifications(BOOKING)
+        assert result['success'], result
+    return (time.perf_counter() - start) * 1000 / bookings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--bookings', type=int, default=100)
+    parser.add_argument('--handshake', type=float, default=0.02,
+                        help='simulated connect+TLS and login latency in seconds each')
+    args = parser.parse_args()
+
+    with FakeSMTPServer(connect_latency=args.handshake, auth_latency=args.handshake) as server:
+        legacy_ms = run(PerMessagePool(server.host, server.port), args.bookings)
+        legacy_connections = server.connections
+
+        pool = SMTPConnectionPool(server.host, server.port, 'user', 'password', use_tls=False)
+        pooled_ms = run(pool, args.bookings)
+        pool.close_all()
+
+        print(f"per-message connection: {legacy_ms:7.2f} ms/booking  connections={legacy_connections}")
+        print(f"pooled connection:      {pooled_ms:7.2f} ms/booking  connections={pool.stats['connects']}")
+        print(f"messages delivered: {server.messages}")
+
+
+if __name__ == '__main__':
+    main()
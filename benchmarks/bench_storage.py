@@ -0,0 +1,106 @@
+"""Compare the Google Sheets and SQLite storage backends at scale
+
+Measures booking throughput and availability check latency with a large
+existing table, and how far the SQLite store's Sheets mirror lags behind.
+
+Usage: python benchmarks/bench_storage.py [--rows N] [--latency SECONDS] [--bookings N]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes import FakeWorksheet, make_appointment_rows
+from google_sheets_handler import GoogleSheetsHandler
+from sqlite_store import SQLiteAppointmentStore
+
+
+def booking(i):
+    return {
+        'name': f'Bench Customer {i}',
+        'email': f'bench{i}@example.com',
+        'phone': '5551234567',
+        'date': '2027-06-01',
+        'time': f'{9 + i % 9:02d}:00',
+        'service': 'Consultation',
+        'notes': ''
+    }
+
+
+def time_bookings(store, count):
+    """Return bookings per second"""
+    start = time.perf_counter()
+    for i in range(count):
+        assert store.add_appointment(booking(i))['success']
+    return count / (time.perf_counter() - start)
+
+
+def time_checks(store, dates, repeat):
+    """Return the mean availability check latency in milliseconds"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for date in dates:
+            store.get_available_slots(date)
+    return (time.perf_counter() - start) * 1000 / (repeat * len(dates))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=100_000, help='existing appointments')
+    parser.add_argument('--latency', type=float, default=0.15, help='simulated Sheets API round trip in seconds')
+    parser.add_argument('--bookings', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    # Bookable dates, which the slot index holds; earlier ones are read from the sheet on demand
+    rows = make_appointment_rows(args.rows, (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d'))
+    dates = sorted({row[4] for row in rows})[:20]
+
+    # Google Sheets backend (local slot index, one append per booking)
+    sheet = FakeWorksheet(rows, call_latency=args.latency)
+    sheets = GoogleSheetsHandler(sheet=sheet)
+    start = time.perf_counter()
+    sheets.get_available_slots(dates[0])
+    sheets_load_ms = (time.perf_counter() - start) * 1000
+    sheets_check_ms = time_checks(sheets, dates, args.repeat)
+    sheets_rate = time_bookings(sheets, args.bookings)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # SQLite backend, preloaded with the same rows and already mirrored
+        store = SQLiteAppointmentStore(os.path.join(tmp, 'appointments.db'))
+        conn = store._connect()
+        conn.execute('BEGIN')
+        conn.executemany(
+            'INSERT INTO appointments (created_at, name, email, phone, date, time, service, notes, status, mirrored) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 1)',
+            rows
+        )
+        conn.execute('COMMIT')
+        sqlite_check_ms = time_checks(store, dates, args.repeat)
+        sqlite_rate = time_bookings(store, args.bookings * 50)
+        assert store.get_available_slots(dates[0]) == sheets.get_available_slots(dates[0])
+
+        # Mirror the new bookings to a slow fake sheet and time the catch-up
+        mirror_sheet = FakeWorksheet([], call_latency=args.latency)
+        mirror = GoogleSheetsHandler(sheet=mirror_sheet)
+        store.mirror = mirror
+        pending = store.unmirrored_count()
+        start = time.perf_counter()
+        while store.mirror_pending():
+            pass
+        mirror_s = time.perf_counter() - start
+
+    print(f"{args.rows} existing rows, {args.latency * 1000:.0f}ms simulated Sheets latency")
+    print(f"{'backend':<10} {'bookings/s':>12} {'check ms':>10}")
+    print(f"{'sheets':<10} {sheets_rate:>12.1f} {sheets_check_ms:>10.4f}  (+{sheets_load_ms:.0f}ms index load per refresh)")
+    print(f"{'sqlite':<10} {sqlite_rate:>12.1f} {sqlite_check_ms:>10.4f}")
+    print(f"mirror: {pending} bookings copied in {mirror_s:.2f}s with "
+          f"{mirror_sheet.calls.get('append_rows', 0)} append_rows calls")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""Time to first visible text: process_message vs process_message_stream against a mocked streaming model
+
+Usage: python benchmarks/bench_streaming.py [--ttft SECONDS] [--chunk-latency SECONDS] [--turns N]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ['LOCAL_EXTRACTION'] = 'false'
+os.environ['RESPONSE_CACHE'] = 'false'
+
+from benchmarks.fakes import FakeGenaiClient
+from chatbot_handler import ChatbotHandler
+
+REPLY = json.dumps({
+    'message': "Thanks! I'd be happy to book a dental cleaning for you. We have openings most weekdays "
+               "between 9 AM and 5 PM. Could you tell me your full name so I can start the booking?",
+    'state': 'collecting',
+    'data': {'service': 'Dental Cleaning'},
+    'needs': ['name', 'email', 'phone', 'date', 'time'],
+    'ready_for_confirmation': False
+})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--ttft', type=float, default=0.3, help='model time to first token in seconds')
+    parser.add_argument('--chunk-latency', type=float, default=0.02, help='seconds per streamed chunk')
+    parser.add_argument('--turns', type=int, default=10)
+    args = parser.parse_args()
+
+    client = FakeGenaiClient(responder=lambda prompt: REPLY, latency=args.ttft, chunk_latency=args.chunk_latency)
+    chatbot = ChatbotHandler(client=client)
+
+    blocking = []
+    for _ in range(args.turns):
+        start = time.perf_counter()
+        chatbot.process_message("I'd like a dental cleaning", 'collecting', {})
+        blocking.append(time.perf_counter() - start)
+
+    first_text, complete = [], []
+    for _ in range(args.turns):
+        start = time.perf_counter()
+        turn = chatbot.process_message_stream("I'd like a dental cleaning", 'collecting', {})
+        result = turn.consume()
+        assert result['data'] == {'service': 'Dental Cleaning'}, result
+        first_text.append(turn.first_chunk_seconds)
+        complete.append(time.perf_counter() - start)
+
+    print(f"process_message:        first text {statistics.median(blocking) * 1000:7.1f} ms")
+    print(f"process_message_stream: first text {statistics.median(first_text) * 1000:7.1f} ms, "
+          f"complete {statistics.median(complete) * 1000:7.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+"""Hundreds of clinics in one process: per-tenant memory, LRU eviction, isolation and slot capacity
+
+Every tenant has its own fake spreadsheet and a calendar (hourly, 30-minute
+slots with two providers, or closed at weekends). Their handlers and slot
+holds come from one ResourceRegistry, as in resources.py, sharing the
+process's Sheets client. Reports:
+  scale       heap per tenant and availability latency cold and warm, then a
+              round-robin over every tenant with --cache-size of them kept
+  isolation   the same slot booked in two tenants, each seeing only its own
+  capacity    --bookers threads racing for one slot, in the Sheets handler
+              and the SQLite store; exactly capacity of them may win
+  calendar    next-available search never offers a closed day, nor a
+              restricted service outside its slots, and booking one there
+              is refused
+
+Exits non-zero if a correctness check fails.
+
+Usage: python benchmarks/bench_tenants.py [--tenants N] [--rows N] [--cache-size N] [--bookers N]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes import FakeWorksheet, make_appointment_rows
+from google_sheets_handler import GoogleSheetsHandler
+from resources import ResourceRegistry
+from sheets_client import SheetsClient
+from slot_reservations import SlotReservations, InMemoryReservationBackend
+from sqlite_store import SQLiteAppointmentStore
+from tenants import Calendar, Tenant
+
+CALENDARS = [
+    {},
+    {'slot_minutes': 30, 'providers': ['Dr. Adams', 'Dr. Baker']},
+    {'hours': {'sat': None, 'sun': None}, 'default_hours': ['08:00', '16:00'],
+     'service_slots': {'X-Ray': ['08:00', '09:00']}},
+]
+
+
+def make_tenants(count):
+    return [Tenant(f'clinic-{i:04d}', name=f'Clinic {i}', calendar=Calendar.from_dict(CALENDARS[i % len(CALENDARS)]))
+            for i in range(count)]
+
+
+def appointment(owner, day, slot):
+    return {
+        'name': f'Booker {owner}', 'email': f'{owner}@example.com', 'phone': '5551234567',
+        'date': day, 'time': slot, 'service': 'Consultation', 'notes': ''
+    }
+
+
+def build_registry(tenants, sheets, cache_size, client, built):
+    registry = ResourceRegistry(max_tenants=cache_size)
+
+    def build_sheets(tenant):
+        built[0] += 1
+        return GoogleSheetsHandler(sheet=sheets[tenant.id], tenant=tenant, sheets_client=client)
+
+    def build_reservations(tenant):
+        return SlotReservations(InMemoryReservationBackend(stripes=8), capacity=tenant.calendar.capacity)
+
+    registry.register('sheets', build_sheets, close=GoogleSheetsHandler.close, per_tenant=True)
+    registry.register('reservations', build_reservations, per_tenant=True, evictable=False)
+    return registry
+
+
+def run_scale(args, tenants, client):
+    """Heap per resident tenant and availability latency, then a round-robin past the cache size"""
+    day = (date.today() + timedelta(days=3)).strftime('%Y-%m-%d')
+    sheets = {tenant.id: FakeWorksheet(make_appointment_rows(args.rows, date.today().strftime('%Y-%m-%d')))
+              for tenant in tenants}
+
+    built = [0]
+    registry = build_registry(tenants, sheets, len(tenants), client, built)
+    tracemalloc.start()
+    start = time.perf_counter()
+    for tenant in tenants:
+        registry.get('sheets', tenant).get_available_slots(day)
+        registry.get('reservations', tenant)
+    cold = (time.perf_counter() - start) / len(tenants)
+    heap, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for tenant in tenants:
+        registry.get('sheets', tenant).get_available_slots(day)
+    warm = (time.perf_counter() - start) / len(tenants)
+    print(f"scale      {len(tenants)} tenants x {args.rows} rows: heap {heap / len(tenants) / 1024:.1f} KiB/tenant, "
+          f"availability cold {cold * 1000:.2f} ms, warm {warm * 1e6:.1f} us")
+
+    built = [0]
+    registry = build_registry(tenants, sheets, args.cache_size, client, built)
+    tracemalloc.start()
+    start = time.perf_counter()
+    requests = 0
+    for _ in range(args.rounds):
+        for tenant in tenants:
+            registry.get('sheets', tenant).get_available_slots(day)
+            requests += 1
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"lru        cache {args.cache_size}: {requests} requests, {built[0]} handler builds, "
+          f"{registry.tenant_count()} resident, peak heap {peak / 1024 / 1024:.1f} MiB, "
+          f"{seconds / requests * 1000:.2f} ms/request")
+    return registry.tenant_count() <= args.cache_size
+
+
+def run_isolation(tenants):
+    """The same slot booked in two tenants; each sees only its own booking"""
+    day = (date.today() + timedelta(days=5)).strftime('%Y-%m-%d')
+    first, second = tenants[0], tenants[3 % len(tenants)]
+    handlers = {tenant.id: GoogleSheetsHandler(sheet=FakeWorksheet(), tenant=tenant) for tenant in (first, second)}
+    holds = {tenant.id: SlotReservations(capacity=tenant.calendar.capacity) for tenant in (first, second)}
+
+    ok = holds[first.id].book(handlers[first.id], appointment('a', day, '10:00'), 'a')['success']
+    free_in_second = '10:00' in handlers[second.id].get_available_slots(day)
+    ok = ok and holds[second.id].book(handlers[second.id], appointment('b', day, '10:00'), 'b')['success']
+    taken_in_first = '10:00' not in handlers[first.id].get_available_slots(day)
+    passed = ok and free_in_second and taken_in_first
+    print(f"isolation  same slot in two tenants: both booked {ok}, other tenant unaffected {free_in_second}: "
+          f"{'ok' if passed else 'FAILED'}")
+    return passed
+
+
+def race(store, reservations, day, slot, bookers):
+    """bookers threads book one slot at once; returns how many succeeded"""
+    results = []
+    barrier = threading.Barrier(bookers)
+
+    def book(owner):
+        barrier.wait()
+        results.append(reservations.book(store, appointment(owner, day, slot), owner)['success'])
+
+    threads = [threading.Thread(target=book, args=(f'owner{i}',)) for i in range(bookers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(results)
+
+
+def run_capacity(args, tmp):
+    """Bookers race for one slot per capacity, against the Sheets handler and the SQLite store"""
+    day = (date.today() + timedelta(days=7)).strftime('%Y-%m-%d')
+    passed = True
+    for capacity in (1, 3):
+        tenant = Tenant(f'cap{capacity}', calendar=Calendar(capacity=capacity))
+        sheet = FakeWorksheet(call_latency=0.001)
+        stores = {
+            'sheets': GoogleSheetsHandler(sheet=sheet, tenant=tenant),
+            'sqlite': SQLiteAppointmentStore(db_path=tenant.path_for(os.path.join(tmp, 'appointments.db')),
+                                             calendar=tenant.calendar)
+        }
+        for name, store in stores.items():
+            booked = race(store, SlotReservations(capacity=capacity), day, '11:00', args.bookers)
+            full = '11:00' not in store.get_available_slots(day)
+            if name == 'sheets':
+                store.slot_index.load()  # after a reload from the sheet the slot must still be full
+                full = full and '11:00' not in store.get_available_slots(day) and not store.slot_index._pending
+            ok = booked == capacity and full
+            passed = passed and ok
+            print(f"capacity   {name:<7} capacity {capacity}: {booked} of {args.bookers} bookers won, "
+                  f"slot full afterwards {full}: {'ok' if ok else 'FAILED'}")
+            store.close()
+    return passed
+
+
+def run_calendar(tenants):
+    """Tenants closed at weekends are never offered a Saturday or Sunday"""
+    tenant = tenants[2 % len(tenants)]
+    handler = GoogleSheetsHandler(sheet=FakeWorksheet(), tenant=tenant)
+    slots = handler.find_next_available(n=200)
+    weekend = [slot for slot in slots if date.fromisoformat(slot[0]).weekday() >= 5]
+    xray = handler.find_next_available('x-ray', n=20)
+    outside = [slot for slot in xray if slot[1] not in ('08:00', '09:00')]
+    reservations = SlotReservations(calendar=tenant.calendar)
+    day = slots[0][0]
+    refused = not reservations.book(handler, dict(appointment('xray', day, '10:00'), service='x-ray'), 'xray')['success']
+    allowed = reservations.book(handler, dict(appointment('xray', day, '09:00'), service='X-Ray'), 'xray')['success']
+    ok = (len(slots) == 200 and not weekend and slots[0][1] == '08:00' and len(xray) == 20 and not outside
+          and refused and allowed)
+    print(f"calendar   {tenant.calendar.describe()}: {len(slots)} openings, {len(weekend)} at weekends, "
+          f"{len(outside)} X-Ray openings outside its slots, booking at 10:00 refused {refused}, "
+          f"at 09:00 accepted {allowed}: {'ok' if ok else 'FAILED'}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tenants', type=int, default=300)
+    parser.add_argument('--rows', type=int, default=200, help='existing appointments per tenant')
+    parser.add_argument('--cache-size', type=int, default=100, help='tenants kept resident (TENANT_CACHE_SIZE)')
+    parser.add_argument('--rounds', type=int, default=3, help='round-robin passes over every tenant')
+    parser.add_argument('--bookers', type=int, default=40, help='threads racing for one slot')
+    args = parser.parse_args()
+
+    tenants = make_tenants(args.tenants)
+    client = SheetsClient(reads_per_minute=0, writes_per_minute=0)  # shared, unthrottled for the fake
+    with tempfile.TemporaryDirectory() as tmp:
+        results = []
+        for check in (lambda: run_scale(args, tenants, client), lambda: run_isolation(tenants),
+                      lambda: run_capacity(args, tmp), lambda: run_calendar(tenants)):
+            out = io.StringIO()
+            with contextlib.redirect_stdout(out):
+                passed = check()
+            # Only the report lines, not the handlers' own logging
+            print('\n'.join(line for line in out.getvalue().splitlines() if line.split(' ', 1)[0] in
+                            ('scale', 'lru', 'isolation', 'capacity', 'calendar')))
+            results.append(passed)
+    if not all(results):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
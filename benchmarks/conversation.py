@@ -0,0 +1,108 @@
+"""Scripted multi-turn booking conversations for the end-to-end benchmarks
+
+script(i) builds the customer's side of conversation i, scripted_reply is
+a deterministic stand-in for the model that extracts what the customer
+said, and run_conversation drives one conversation through
+ChatbotHandler, then books it with an appointment store and sends the
+confirmation emails with an EmailHandler, timing each step.
+"""
+import json
+import re
+import time
+from datetime import datetime, timedelta
+
+from appointment_store import TIME_SLOTS
+from booking_flow import wants_to_confirm
+from session_store import new_session
+
+SERVICES = ['Consultation', 'Dental Cleaning', 'X-Ray', 'Blood Test', 'Vaccination']
+REQUIRED = ['name', 'email', 'phone', 'service', 'date', 'time']
+
+
+def letters(i):
+    """Alphabetic suffix so generated names pass name validation"""
+    out = ''
+    i += 1
+    while i:
+        i, rem = divmod(i - 1, 26)
+        out = chr(ord('a') + rem) + out
+    return out
+
+
+def script(i, days=170):
+    """Customer messages for conversation i; each books a distinct slot while slots last"""
+    date = (datetime.now() + timedelta(days=1 + (i // len(TIME_SLOTS)) % days)).strftime('%Y-%m-%d')
+    return [
+        f"Hi, I'd like to book a {SERVICES[i % len(SERVICES)].lower()}",
+        f"My name is Jane {letters(i).title()}",
+        f"jane.{letters(i)}@example.com",
+        f"555{i:07d}",
+        date,
+        TIME_SLOTS[i % len(TIME_SLOTS)],
+        "yes"
+    ]
+
+
+def scripted_reply(prompt):
+    """Model stand-in: extract the fields present in the turn's message and ask for the next one"""
+    turn = json.loads(prompt)
+    message = turn['message']
+    data = {}
+    for service in SERVICES:
+        if service.lower() in message.lower():
+            data['service'] = service
+    name = re.search(r'my name is (.+)', message, re.IGNORECASE)
+    if name:
+        data['name'] = name.group(1).strip()
+    for field, pattern in (('email', r'\S+@\S+'), ('date', r'\d{4}-\d{2}-\d{2}'),
+                           ('time', r'^\d{2}:\d{2}$'), ('phone', r'^\d{10,15}$')):
+        match = re.search(pattern, message.strip())
+        if match:
+            data[field] = match.group(0)
+
+    missing = [field for field in turn['missing'] if field not in data]
+    if not missing and message.strip().lower() == 'yes':
+        reply, state = 'Your appointment is confirmed!', 'confirmed'
+    elif not missing:
+        reply, state = 'I have everything I need. Shall I book it?', 'confirming'
+    else:
+        reply, state = f"Thanks! Could you tell me your {missing[0]}?", 'collecting'
+    return json.dumps({
+        'message': reply,
+        'state': state,
+        'data': data,
+        'needs': missing,
+        'ready_for_confirmation': not missing
+    })
+
+
+def run_conversation(chatbot, store, emails, messages):
+    """Run one conversation to a booking
+
+    Returns {'turn_seconds', 'sources', 'booking_seconds', 'booked',
+    'emailed'}; booking_seconds covers saving the appointment and sending
+    both confirmation emails.
+    """
+    session = new_session()
+    turn_seconds = []
+    sources = []
+    result = {'turn_seconds': turn_seconds, 'sources': sources, 'booking_seconds': None,
+              'booked': False, 'emailed': False}
+    for message in messages:
+        start = time.perf_counter()
+        response = chatbot.process_message(message, session['conversation_state'], session['appointment_data'])
+        chatbot.apply_turn(session, message, response)
+        turn_seconds.append(time.perf_counter() - start)
+        sources.append(response.get('source'))
+
+        if wants_to_confirm(session, response, message):
+            if any(not session['appointment_data'].get(field) for field in REQUIRED):
+                continue  # a failed turn lost a detail; the customer would be asked again
+            start = time.perf_counter()
+            saved = store.add_appointment(session['appointment_data'])
+            result['booked'] = saved['success']
+            if saved['success']:
+                result['emailed'] = emails.send_notifications(session['appointment_data'])['success']
+            result['booking_seconds'] = time.perf_counter() - start
+            break
+    return result
@@ -0,0 +1,650 @@
+"""Local stand-ins for the external services used by the benchmarks"""
+import re
+import threading
+import time
+
+HEADERS = ['Timestamp', 'Name', 'Email', 'Phone', 'Date', 'Time', 'Service', 'Notes', 'Status']
+
+# Worksheet calls counted against the read quota; everything else is a write
+FAKE_READ_METHODS = {
+    'row_values', 'get_all_values', 'get_values', 'get_all_records', 'batch_get', 'values_batch_get', 'worksheets'
+}
+
+
+class FakeAPIError(Exception):
+    """Stand-in for gspread's APIError, carrying the HTTP status in .code"""
+
+    def __init__(self, code, message):
+        super().__init__(f'{code}: {message}')
+        self.code = code
+
+
+class FakeQuota:
+    """Per-user Sheets API quota: at most reads/writes requests in any sliding window of window seconds
+
+    Requests over the limit are refused with a 429 FakeAPIError, as Google
+    does. Share one instance between worksheets to model one service
+    account; shrink window to run minutes of quota in seconds.
+    """
+
+    def __init__(self, reads=60, writes=60, window=60.0):
+        from collections import deque
+
+        self.limits = {'read': reads, 'write': writes}
+        self.window = window
+        self.recent = {'read': deque(), 'write': deque()}
+        self.accepted = {'read': 0, 'write': 0}
+        self.rejected = {'read': 0, 'write': 0}
+        self._lock = threading.Lock()
+
+    def check(self, name):
+        kind = 'read' if name in FAKE_READ_METHODS else 'write'
+        now = time.monotonic()
+        with self._lock:
+            recent = self.recent[kind]
+            while recent and recent[0] <= now - self.window:
+                recent.popleft()
+            if len(recent) >= self.limits[kind]:
+                self.rejected[kind] += 1
+                raise FakeAPIError(429, f'Quota exceeded for {kind} requests per minute per user')
+            recent.append(now)
+            self.accepted[kind] += 1
+
+
+class FakeWorksheet:
+    """In-memory worksheet exposing the subset of the gspread Worksheet API the app uses
+
+    failure_rate injects RuntimeErrors into that fraction of API calls,
+    drawn from a random.Random seeded with seed, or FakeAPIErrors with
+    failure_code (e.g. 503) when given. A FakeQuota refuses calls over
+    its limits with 429 before they run. With keep_rows=False
+    written rows are only counted (rows_written), so bulk benchmarks
+    measure the writer rather than the fake's storage. With count_bytes,
+    bytes_read totals the JSON size of every value range returned, roughly
+    what the API would send.
+    """
+
+    def __init__(self, rows=None, call_latency=0.0, failure_rate=0.0, seed=None, keep_rows=True,
+                 title='Sheet1', sheet_id=0, headers=True, count_bytes=False, quota=None, failure_code=None):
+        import random
+
+        self.title = title
+        self.id = sheet_id
+        self.rows = ([list(HEADERS)] if headers else []) + [list(row) for row in (rows or [])]
+        self.call_latency = call_latency
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.keep_rows = keep_rows
+        self.row_count = max(1000, len(self.rows))  # grid size, like a new Google sheet
+        self.rows_written = 0
+        self.count_bytes = count_bytes
+        self.quota = quota
+        self.failure_code = failure_code
+        self.bytes_read = 0
+        self.calls = {}
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def _call(self, name):
+        """Count an API call, simulate its round trip and maybe fail it"""
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+        if self.quota:
+            self.quota.check(name)
+        with self._lock:
+            failed = self.failure_rate and self.random.random() < self.failure_rate
+            if failed:
+                self.failures += 1
+        if self.call_latency:
+            time.sleep(self.call_latency)
+        if failed:
+            if self.failure_code:
+                raise FakeAPIError(self.failure_code, f'Injected Google Sheets failure in {name}')
+            raise RuntimeError(f'Injected Google Sheets failure in {name}')
+
+    def _sent(self, values):
+        """Count the response size of values returned to the caller"""
+        import json
+
+        if self.count_bytes:
+            with self._lock:
+                self.bytes_read += len(json.dumps(values))
+        return values
+
+    def row_values(self, row):
+        self._call('row_values')
+        return self._sent(list(self.rows[row - 1]) if row <= len(self.rows) else [])
+
+    def insert_row(self, values, index=1, **kwargs):
+        self._call('insert_row')
+        with self._lock:
+            self.rows.insert(index - 1, list(values))
+
+    def append_row(self, values, **kwargs):
+        self._call('append_row')
+        with self._lock:
+            self.rows.append([str(v) for v in values])
+
+    def append_rows(self, values, **kwargs):
+        self._call('append_rows')
+        with self._lock:
+            self.rows_written += len(values)
+            if self.keep_rows:
+                self.rows.extend([str(v) for v in row] for row in values)
+            self.row_count = max(self.row_count, len(self.rows))
+
+    def add_rows(self, rows):
+        self._call('add_rows')
+        with self._lock:
+            self.row_count += rows
+
+    def update(self, values, range_name=None, **kwargs):
+        self._call('update')
+        match = re.match(r'^([A-Z])(\d+)', range_name)
+        column, start = ord(match.group(1)) - ord('A'), int(match.group(2))
+        with self._lock:
+            if start + len(values) - 1 > self.row_count:
+                raise RuntimeError(f'Range {range_name} exceeds grid limits')
+            self.rows_written += len(values)
+            if self.keep_rows:
+                if len(self.rows) < start - 1 + len(values):
+                    self.rows.extend([] for _ in range(start - 1 + len(values) - len(self.rows)))
+                for number, row in enumerate(values, start):
+                    cells = self.rows[number - 1]
+                    cells.extend('' for _ in range(column - len(cells)))
+                    cells[column:column + len(row)] = [str(v) for v in row]
+
+    def delete_rows(self, start_index, end_index=None):
+        self._call('delete_rows')
+        with self._lock:
+            del self.rows[start_index - 1:end_index or start_index]
+
+    def get_all_values(self, **kwargs):
+        self._call('get_all_values')
+        return self._sent([list(row) for row in self.rows])
+
+    def read_range(self, range_name):
+        """Rows in an A1 range like A2:I, E2:E500 or J1, without counting an API call"""
+        match = re.match(r'^([A-Z])(\d+)(?::([A-Z])(\d*))?$', range_name)
+        first_column, start, last_column, end = match.groups()
+        if last_column is None:
+            last_column, end = first_column, start
+        start = int(start)
+        end = int(end) if end else len(self.rows)
+        columns = slice(ord(first_column) - ord('A'), ord(last_column) - ord('A') + 1)
+        return [list(row[columns]) for row in self.rows[start - 1:end]]
+
+    def batch_get(self, ranges, **kwargs):
+        self._call('batch_get')
+        return self._sent([self.read_range(range_name) for range_name in ranges])
+
+    def get_values(self, range_name=None, **kwargs):
+        self._call('get_values')
+        if range_name is None:
+            return self._sent([list(row) for row in self.rows] or [[]])
+        # Like gspread, an empty range comes back as one empty row rather than []
+        return self._sent(self.read_range(range_name) or [[]])
+
+    def get_all_records(self, **kwargs):
+        self._call('get_all_records')
+        header = self.rows[0]
+        self._sent(self.rows)
+        return [dict(zip(header, row)) for row in self.rows[1:]]
+
+
+class FakeSpreadsheet:
+    """In-memory spreadsheet of FakeWorksheets with the batch APIs used for partitioned reads
+
+    values_batch_get and batch_update (deleteDimension on rows only) are
+    answered from the worksheets; bytes_read covers every worksheet plus
+    batch reads.
+    """
+
+    def __init__(self, sheet1=None, call_latency=0.0):
+        self.sheet1 = sheet1 or FakeWorksheet(call_latency=call_latency)
+        self.sheet1.count_bytes = True
+        self.call_latency = call_latency
+        self._worksheets = [self.sheet1]
+        self.calls = {}
+        self.batch_bytes = 0
+        self._lock = threading.Lock()
+
+    def _call(self, name):
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+        if self.call_latency:
+            time.sleep(self.call_latency)
+
+    @property
+    def bytes_read(self):
+        return self.batch_bytes + sum(sheet.bytes_read for sheet in self._worksheets)
+
+    def worksheets(self):
+        self._call('worksheets')
+        return list(self._worksheets)
+
+    def worksheet(self, title):
+        self._call('worksheet')
+        for sheet in self._worksheets:
+            if sheet.title == title:
+                return sheet
+        raise LookupError(f'Worksheet {title} not found')
+
+    def add_worksheet(self, title, rows, cols, index=None):
+        self._call('add_worksheet')
+        sheet = FakeWorksheet(title=title, sheet_id=len(self._worksheets), headers=False,
+                              call_latency=self.call_latency, count_bytes=True)
+        sheet.row_count = rows
+        self._worksheets.append(sheet)
+        return sheet
+
+    def values_batch_get(self, ranges, params=None):
+        import json
+
+        self._call('values_batch_get')
+        value_ranges = []
+        for range_name in ranges:
+            title, _, cells = range_name.rpartition('!')
+            title = title[1:-1].replace("''", "'") if title.startswith("'") else title
+            sheet = next(sheet for sheet in self._worksheets if sheet.title == title)
+            values = sheet.read_range(cells)
+            value_ranges.append({'range': range_name, 'values': values} if values else {'range': range_name})
+        with self._lock:
+            self.batch_bytes += len(json.dumps(value_ranges))
+        return {'valueRanges': value_ranges}
+
+    def batch_update(self, body):
+        self._call('batch_update')
+        for request in body['requests']:
+            span = request['deleteDimension']['range']
+            sheet = next(sheet for sheet in self._worksheets if sheet.id == span['sheetId'])
+            with sheet._lock:
+                del sheet.rows[span['startIndex']:span['endIndex']]
+        return {'replies': [{} for _ in body['requests']]}
+
+
+def make_appointment_rows(count, start_date='2026-01-01'):
+    """Build synthetic confirmed appointment rows spread across hourly slots"""
+    from datetime import datetime, timedelta
+
+    base = datetime.strptime(start_date, '%Y-%m-%d')
+    rows = []
+    for i in range(count):
+        date = (base + timedelta(days=i // 9)).strftime('%Y-%m-%d')
+        rows.append([
+            '2026-01-01 00:00:00',
+            f'Customer {i}',
+            f'customer{i}@example.com',
+            f'555000{i:04d}',
+            date,
+            f'{9 + i % 9:02d}:00',
+            'Consultation',
+            '',
+            'Confirmed' if i % 10 else 'Cancelled'
+        ])
+    return rows
+
+
+class FakeSMTPServer:
+    """Threaded local SMTP stand-in in the spirit of aiosmtpd's debugging server
+
+    It speaks enough of the protocol for smtplib (EHLO, AUTH PLAIN, MAIL,
+    RCPT, DATA, NOOP, RSET, QUIT) and sleeps on connect and on AUTH to stand
+    in for the TCP+TLS and login handshake cost of a real relay. STARTTLS is
+    not offered, so clients must connect with TLS disabled. send_latency is
+    added to each message, and failure_rate rejects that fraction of them
+    with a temporary 451 error, drawn from a random.Random seeded with seed.
+    """
+
+    def __init__(self, connect_latency=0.0, auth_latency=0.0, host='127.0.0.1', send_latency=0.0,
+                 failure_rate=0.0, seed=None):
+        import random
+        import socketserver
+
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def reply(self, line):
+                self.wfile.write(f'{line}\r\n'.encode())
+
+            def handle(self):
+                with server._lock:
+                    server.connections += 1
+                time.sleep(server.connect_latency)
+                self.reply('220 fake-smtp ready')
+                while True:
+                    line = self.rfile.readline()
+                    if not line:
+                        return
+                    command = line.decode().strip()
+                    verb = command.split(' ', 1)[0].upper()
+                    if verb in ('EHLO', 'HELO'):
+                        self.wfile.write(b'250-fake-smtp\r\n250 AUTH PLAIN\r\n')
+                    elif verb == 'AUTH':
+                        time.sleep(server.auth_latency)
+                        self.reply('235 Authentication successful')
+                    elif verb in ('MAIL', 'RCPT', 'RSET', 'NOOP'):
+                        self.reply('250 OK')
+                    elif verb == 'DATA':
+                        self.reply('354 End data with <CR><LF>.<CR><LF>')
+                        while self.rfile.readline() not in (b'.\r\n', b''):
+                            pass
+                        time.sleep(server.send_latency)
+                        with server._lock:
+                            failed = server.failure_rate and server.random.random() < server.failure_rate
+                            if failed:
+                                server.rejected += 1
+                            else:
+                                server.messages += 1
+                        self.reply('451 Injected temporary failure' if failed else '250 Queued')
+                    elif verb == 'QUIT':
+                        self.reply('221 Bye')
+                        return
+                    else:
+                        self.reply('502 Command not implemented')
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self._server = socketserver.ThreadingTCPServer((host, 0), Handler)
+        self._server.daemon_threads = True
+        self.host, self.port = self._server.server_address
+        self.connect_latency = connect_latency
+        self.auth_latency = auth_latency
+        self.send_latency = send_latency
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.connections = 0
+        self.messages = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class FakeRedisServer:
+    """Threaded local server speaking enough RESP2 for redis-py
+
+    Supports PING, GET, SET (with EX/PX), DEL, EXISTS, EXPIRE, TTL, FLUSHDB
+    and answers CLIENT/SELECT with OK. Keys expire lazily on access, like
+    Redis' passive expiry. latency is added to every command to stand in for
+    the network hop to a separate Redis host.
+    """
+
+    def __init__(self, latency=0.0, host='127.0.0.1'):
+        import socketserver
+
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def read_command(self):
+                line = self.rfile.readline()
+                if not line:
+                    return None
+                if not line.startswith(b'*'):
+                    return line.split()  # inline command
+                args = []
+                for _ in range(int(line[1:])):
+                    size = int(self.rfile.readline()[1:])
+                    args.append(self.rfile.read(size + 2)[:-2])
+                return args
+
+            def bulk(self, value):
+                if value is None:
+                    return b'$-1\r\n'
+                return b'$%d\r\n%s\r\n' % (len(value), value)
+
+            def handle(self):
+                while True:
+                    args = self.read_command()
+                    if args is None:
+                        return
+                    if server.latency:
+                        time.sleep(server.latency)
+                    with server._lock:
+                        server.commands += 1
+                        reply = server._execute([args[0].upper()] + args[1:], self)
+                    self.wfile.write(reply)
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self._server = socketserver.ThreadingTCPServer((host, 0), Handler)
+        self._server.daemon_threads = True
+        self.host, self.port = self._server.server_address
+        self.url = f'redis://{self.host}:{self.port}/0'
+        self.latency = latency
+        self.commands = 0
+        self.data = {}  # key -> (value, expires_at or None)
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def _live(self, key):
+        entry = self.data.get(key)
+        if entry and entry[1] is not None and entry[1] <= time.monotonic():
+            del self.data[key]
+            return None
+        return entry
+
+    def _execute(self, args, handler):
+        command = args[0]
+        if command == b'PING':
+            return b'+PONG\r\n'
+        if command in (b'CLIENT', b'SELECT'):
+            return b'+OK\r\n'
+        if command == b'GET':
+            entry = self._live(args[1])
+            return handler.bulk(entry[0] if entry else None)
+        if command == b'SET':
+            expires_at = None
+            options = [arg.upper() for arg in args[3:]]
+            if b'EX' in options:
+                expires_at = time.monotonic() + int(args[3 + options.index(b'EX') + 1])
+            elif b'PX' in options:
+                expires_at = time.monotonic() + int(args[3 + options.index(b'PX') + 1]) / 1000
+            self.data[args[1]] = (args[2], expires_at)
+            return b'+OK\r\n'
+        if command in (b'DEL', b'EXISTS'):
+            keys = [key for key in args[1:] if self._live(key)]
+            if command == b'DEL':
+                for key in keys:
+                    del self.data[key]
+            return b':%d\r\n' % len(keys)
+        if command == b'EXPIRE':
+            entry = self._live(args[1])
+            if not entry:
+                return b':0\r\n'
+            self.data[args[1]] = (entry[0], time.monotonic() + int(args[2]))
+            return b':1\r\n'
+        if command == b'TTL':
+            entry = self._live(args[1])
+            if not entry:
+                return b':-2\r\n'
+            return b':%d\r\n' % (-1 if entry[1] is None else round(entry[1] - time.monotonic()))
+        if command == b'FLUSHDB':
+            self.data.clear()
+            return b'+OK\r\n'
+        return b"-ERR unknown command '%s'\r\n" % command
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def count_tokens(text):
+    """Rough token estimate (about four characters per token)"""
+    return len(text) // 4
+
+
+class FakeGenerateResponse:
+    """Stand-in for a genai GenerateContentResponse"""
+
+    def __init__(self, text, prompt_tokens=0, output_tokens=0, cached_tokens=0):
+        from types import SimpleNamespace
+
+        self.text = text
+        self.usage_metadata = SimpleNamespace(
+            prompt_token_count=prompt_tokens,
+            candidates_token_count=output_tokens,
+            cached_content_token_count=cached_tokens,
+            total_token_count=prompt_tokens + output_tokens
+        )
+
+
+def default_reply(prompt):
+    """Canned booking assistant reply used when no responder is given"""
+    import json
+
+    return json.dumps({
+        'message': 'Happy to help you book an appointment! Which service would you like?',
+        'state': 'collecting',
+        'data': {},
+        'needs': ['name', 'email', 'phone', 'service', 'date', 'time'],
+        'ready_for_confirmation': False
+    })
+
+
+class FakeGenaiModels:
+    """Stand-in for genai Client.models with configurable latency"""
+
+    def __init__(self, client):
+        self._client = client
+
+    def generate_content(self, model, contents, config=None):
+        client = self._client
+        first_token = client.sample_latency()
+        if first_token:
+            time.sleep(first_token)
+        response = self._respond(contents, config)
+        # A non-streaming call returns only after the whole reply is generated
+        if client.chunk_latency:
+            time.sleep(client.chunk_count(response.text) * client.chunk_latency)
+        return response
+
+    def generate_content_stream(self, model, contents, config=None):
+        client = self._client
+        first_token = client.sample_latency()
+        if first_token:
+            time.sleep(first_token)
+        response = self._respond(contents, config)
+        text = response.text
+        pieces = [text[i:i + client.chunk_size] for i in range(0, len(text), client.chunk_size)]
+        for i, piece in enumerate(pieces):
+            if i and client.chunk_latency:
+                time.sleep(client.chunk_latency)
+            chunk = FakeGenerateResponse(piece)
+            if i == len(pieces) - 1:
+                chunk.usage_metadata = response.usage_metadata
+            yield chunk
+
+    def _respond(self, contents, config):
+        """Produce the full reply for a request, or raise an injected failure"""
+        client = self._client
+        client.calls += 1
+        client.maybe_fail()
+        prompt = contents if isinstance(contents, str) else str(contents)
+
+        # Account for instructions sent inline or referenced from a context cache
+        instruction_tokens = cached_tokens = 0
+        if config is not None and getattr(config, 'cached_content', None):
+            cached_tokens = client.caches.tokens(config.cached_content)
+        elif config is not None and getattr(config, 'system_instruction', None):
+            instruction_tokens = count_tokens(str(config.system_instruction))
+
+        text = client.responder(prompt)
+        return FakeGenerateResponse(
+            text,
+            prompt_tokens=count_tokens(prompt) + instruction_tokens + cached_tokens,
+            output_tokens=count_tokens(text),
+            cached_tokens=cached_tokens
+        )
+
+
+class FakeAsyncGenaiModels:
+    """Stand-in for genai Client.aio.models"""
+
+    def __init__(self, models):
+        self._models = models
+
+    async def generate_content(self, model, contents, config=None):
+        import asyncio
+
+        client = self._models._client
+        first_token = client.sample_latency()
+        if first_token:
+            await asyncio.sleep(first_token)
+        response = self._models._respond(contents, config)
+        if client.chunk_latency:
+            await asyncio.sleep(client.chunk_count(response.text) * client.chunk_latency)
+        return response
+
+
+class FakeGenaiCaches:
+    """Stand-in for genai Client.caches with Gemini's minimum cacheable size"""
+
+    def __init__(self, min_tokens=0):
+        self.min_tokens = min_tokens
+        self._contents = {}
+
+    def create(self, model, config=None):
+        from types import SimpleNamespace
+
+        tokens = count_tokens(str(config.system_instruction))
+        if tokens < self.min_tokens:
+            raise ValueError(f'Cached content is too small: {tokens} < {self.min_tokens} tokens')
+        name = f'cachedContents/fake-{len(self._contents)}'
+        self._contents[name] = tokens
+        return SimpleNamespace(name=name, model=model)
+
+    def tokens(self, name):
+        if name not in self._contents:
+            raise ValueError(f'Cached content {name} not found')
+        return self._contents[name]
+
+
+class FakeGenaiClient:
+    """Stand-in for genai.Client returning canned JSON replies
+
+    latency is the time to first token; latency_sampler, if given, is called
+    with a random.Random to draw it per request instead. failure_rate injects
+    RuntimeErrors into that fraction of requests.
+    """
+
+    def __init__(self, responder=None, latency=0.0, chunk_latency=0.0, chunk_size=16, min_cache_tokens=0,
+                 latency_sampler=None, failure_rate=0.0, seed=None):
+        import random
+        from types import SimpleNamespace
+
+        self.responder = responder or default_reply
+        self.latency = latency
+        self.chunk_latency = chunk_latency  # time per further chunk of chunk_size characters
+        self.chunk_size = chunk_size
+        self.latency_sampler = latency_sampler
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.calls = 0
+        self.models = FakeGenaiModels(self)
+        self.aio = SimpleNamespace(models=FakeAsyncGenaiModels(self.models))
+        self.caches = FakeGenaiCaches(min_cache_tokens)
+
+    def sample_latency(self):
+        """Time to first token for one request"""
+        if self.latency_sampler:
+            return self.latency_sampler(self.random)
+        return self.latency
+
+    def maybe_fail(self):
+        """Raise an injected failure for failure_rate of requests"""
+        if self.failure_rate and self.random.random() < self.failure_rate:
+            raise RuntimeError('Injected model failure')
+
+    def chunk_count(self, text):
+        """Number of streamed chunks a reply is split into"""
+        return max(1, -(-len(text) // self.chunk_size))
@@ -0,0 +1,239 @@
+"""Stress test slot booking with hundreds of concurrent bookers and count double bookings
+
+Runs four scenarios against the same small calendar:
+  check-then-append   the old is_slot_available + add_appointment sequence
+  memory              SlotReservations with the in-process backend, threads only
+  sqlite              SlotReservations with the shared SQLite backend, several processes
+  lagging store       a store whose availability reads trail its writes, with
+                      listers polling availability while bookers book; then some
+                      appointments are cancelled and must be rebooked exactly once
+
+Some bookers abandon their hold without confirming, so expiry is exercised
+too. Exits non-zero if any reservation scenario double-books a slot.
+
+Usage: python benchmarks/stress_reservations.py [--bookers N] [--processes N] [--latency SECONDS] [--lag SECONDS]
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from appointment_store import AppointmentStore, TIME_SLOTS
+from benchmarks.fakes import FakeWorksheet
+from google_sheets_handler import GoogleSheetsHandler
+from slot_reservations import SlotReservations, InMemoryReservationBackend, SQLiteReservationBackend
+from sqlite_store import SQLiteAppointmentStore
+
+DATES = ['2027-03-01', '2027-03-02']
+SLOTS = [(date, slot) for date in DATES for slot in TIME_SLOTS]
+
+
+def appointment(owner, slot):
+    return {
+        'name': f'Booker {owner}', 'email': f'{owner}@example.com', 'phone': '5551234567',
+        'date': slot[0], 'time': slot[1], 'service': 'Consultation', 'notes': ''
+    }
+
+
+class LaggingStore(AppointmentStore):
+    """Appointments in memory whose availability reads only see rows older than lag seconds
+
+    Like a slot index between delta syncs; confirmed_count is always current.
+    """
+
+    def __init__(self, lag):
+        self.lag = lag
+        self.rows = []  # [[date, time, status, saved_at]]
+        self.lock = threading.Lock()
+
+    def add_appointment(self, appointment_data):
+        with self.lock:
+            self.rows.append([appointment_data['date'], appointment_data['time'], 'Confirmed', time.monotonic()])
+        return {'success': True, 'message': 'Appointment added successfully'}
+
+    def get_available_slots(self, date):
+        seen_before = time.monotonic() - self.lag
+        with self.lock:
+            booked = {row[1] for row in self.rows
+                      if row[0] == date and row[2] == 'Confirmed' and row[3] <= seen_before}
+        return [slot for slot in TIME_SLOTS if slot not in booked]
+
+    def confirmed_count(self, date, time_slot):
+        with self.lock:
+            return sum(1 for row in self.rows if row[:3] == [date, time_slot, 'Confirmed'])
+
+    def cancel(self, n):
+        with self.lock:
+            for row in [row for row in self.rows if row[2] == 'Confirmed'][:n]:
+                row[2] = 'Cancelled'
+
+    def confirmed(self):
+        with self.lock:
+            return [(row[0], row[1]) for row in self.rows if row[2] == 'Confirmed']
+
+
+def run_listers(count, store, reservations, stop):
+    """Poll availability like the chat and API listings do until stop is set"""
+    def lister():
+        while not stop.is_set():
+            for date in DATES:
+                reservations.filter_available(date, store.get_available_slots(date))
+            time.sleep(0.01)
+
+    threads = [threading.Thread(target=lister) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def run_booker(owner, store, reservations, seed, abandon_rate, think_time, patience):
+    """Pick slots until one is booked or abandoned, retrying held slots for patience seconds"""
+    rng = random.Random(seed)
+    candidates = SLOTS[:]
+    rng.shuffle(candidates)
+    give_up_at = time.monotonic() + patience
+    while True:
+        for slot in candidates:
+            if reservations is None:
+                # Old behaviour: check, then append
+                if not store.is_slot_available(*slot):
+                    continue
+                time.sleep(rng.uniform(0, think_time))
+                return 'booked' if store.add_appointment(appointment(owner, slot))['success'] else 'failed'
+
+            if not reservations.hold(slot[0], slot[1], owner)['success']:
+                continue
+            time.sleep(rng.uniform(0, think_time))
+            if rng.random() < abandon_rate:
+                return 'abandoned'
+            if reservations.book(store, appointment(owner, slot), owner)['success']:
+                return 'booked'
+        if reservations is None or time.monotonic() > give_up_at:
+            return 'no slot'
+        time.sleep(0.05)  # abandoned holds expire, so keep trying for a while
+
+
+def run_threads(count, offset, store, reservations, abandon_rate, think_time, patience=0):
+    outcomes = Counter()
+    lock = threading.Lock()
+
+    def worker(i):
+        outcome = run_booker(f'b{offset + i}', store, reservations, offset + i, abandon_rate, think_time, patience)
+        with lock:
+            outcomes[outcome] += 1
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return outcomes
+
+
+def sqlite_process(args):
+    count, offset, store_path, reservation_path, hold_seconds, abandon_rate, think_time = args
+    store = SQLiteAppointmentStore(store_path)
+    reservations = SlotReservations(SQLiteReservationBackend(reservation_path), hold_seconds=hold_seconds)
+    return run_threads(count, offset, store, reservations, abandon_rate, think_time, hold_seconds * 3)
+
+
+def double_bookings(booked_slots):
+    counts = Counter(booked_slots)
+    return sum(n - 1 for n in counts.values() if n > 1), len(counts)
+
+
+def report(name, outcomes, booked_slots, elapsed):
+    doubles, distinct = double_bookings(booked_slots)
+    print(f"{name:<20} {dict(outcomes)}  rows={len(booked_slots)} slots={distinct} "
+          f"double bookings={doubles}  {elapsed:.2f}s")
+    return doubles
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--bookers', type=int, default=400)
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--latency', type=float, default=0.02, help='simulated Sheets API round trip in seconds')
+    parser.add_argument('--hold-seconds', type=float, default=0.5)
+    parser.add_argument('--abandon-rate', type=float, default=0.2)
+    parser.add_argument('--think-time', type=float, default=0.05, help='max delay between picking and confirming')
+    parser.add_argument('--lag', type=float, default=0.3, help='how far the lagging store\'s availability trails')
+    args = parser.parse_args()
+
+    def sheet_rows(sheet):
+        return [(row[4], row[5]) for row in sheet.rows[1:] if row[8] == 'Confirmed']
+
+    # Baseline: no reservations
+    sheet = FakeWorksheet([], call_latency=args.latency)
+    start = time.perf_counter()
+    outcomes = run_threads(args.bookers, 0, GoogleSheetsHandler(sheet=sheet), None, 0, args.think_time)
+    report('check-then-append', outcomes, sheet_rows(sheet), time.perf_counter() - start)
+
+    # In-process reservations in front of the Sheets handler
+    sheet = FakeWorksheet([], call_latency=args.latency)
+    reservations = SlotReservations(InMemoryReservationBackend(), hold_seconds=args.hold_seconds)
+    start = time.perf_counter()
+    outcomes = run_threads(args.bookers, 0, GoogleSheetsHandler(sheet=sheet), reservations,
+                           args.abandon_rate, args.think_time, args.hold_seconds * 3)
+    failed = report('memory', outcomes, sheet_rows(sheet), time.perf_counter() - start)
+
+    # Shared SQLite reservations across processes
+    with tempfile.TemporaryDirectory() as tmp:
+        store_path = os.path.join(tmp, 'appointments.db')
+        reservation_path = os.path.join(tmp, 'reservations.db')
+        SQLiteAppointmentStore(store_path)
+        SQLiteReservationBackend(reservation_path)
+        per_process = args.bookers // args.processes
+        jobs = [(per_process, i * per_process, store_path, reservation_path, args.hold_seconds,
+                 args.abandon_rate, args.think_time) for i in range(args.processes)]
+        start = time.perf_counter()
+        with multiprocessing.Pool(args.processes) as pool:
+            results = pool.map(sqlite_process, jobs)
+        elapsed = time.perf_counter() - start
+        outcomes = sum(results, Counter())
+        rows = SQLiteAppointmentStore(store_path)._connect().execute(
+            "SELECT date, time FROM appointments WHERE status = 'Confirmed'"
+        ).fetchall()
+        failed += report(f'sqlite x{args.processes} procs', outcomes, [tuple(row) for row in rows], elapsed)
+
+    # Availability reads lag behind bookings; listing must not free seats, cancellations are rebooked once
+    store = LaggingStore(args.lag)
+    reservations = SlotReservations(InMemoryReservationBackend(), hold_seconds=args.hold_seconds,
+                                    get_store=lambda: store, cancel_grace=args.lag * 2)
+    stop = threading.Event()
+    listers = run_listers(8, store, reservations, stop)
+    start = time.perf_counter()
+    outcomes = run_threads(args.bookers, 0, store, reservations, args.abandon_rate, args.think_time,
+                           args.hold_seconds * 3)
+    failed += report('lagging store', outcomes, store.confirmed(), time.perf_counter() - start)
+
+    cancelled = min(5, len(store.confirmed()))
+    store.cancel(cancelled)
+    time.sleep(args.lag * 3)  # past the grace, and past the lag so listings show the freed slots
+    start = time.perf_counter()
+    before = len(store.confirmed())
+    outcomes = run_threads(cancelled * 4, args.bookers, store, reservations, 0, args.think_time, args.hold_seconds)
+    stop.set()
+    for thread in listers:
+        thread.join()
+    rebooked = len(store.confirmed()) - before
+    failed += report(f'  after {cancelled} cancelled', outcomes, store.confirmed(), time.perf_counter() - start)
+    if rebooked != cancelled:
+        print(f'FAIL: {rebooked} of {cancelled} cancelled slots were rebooked')
+        failed += 1
+
+    if failed:
+        print('FAIL: reservations allowed double bookings')
+        sys.exit(1)
+    print('OK: no double bookings with reservations')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+from resources import get_store, get_notification_outbox, get_reservations
+
+CONFIRM_WORDS = ['yes', 'confirm', 'book', 'ok']
+
+SUCCESS_MESSAGE = "✅ Perfect! Your appointment has been booked successfully. You'll receive a confirmation email shortly."
+
+
+def hold_selected_slot(session, owner):
+    """Hold the slot the customer picked so no other session can take it
+
+    Returns an error message if the slot is no longer available.
+    """
+    data = session['appointment_data']
+    slot = (data.get('date'), data.get('time'))
+    if not all(slot) or slot == session['held_slot']:
+        return None
+
+    reservations = get_reservations(session.get('tenant'))
+    if session['held_slot']:
+        reservations.release(*session['held_slot'], owner)
+        session['held_slot'] = None
+
+    result = reservations.hold(slot[0], slot[1], owner)
+    if not result['success']:
+        data.pop('time', None)
+        session['conversation_state'] = 'collecting'
+        store = get_store(session.get('tenant'))
+        available = reservations.filter_available(slot[0], store.get_available_slots(slot[0]), owner)
+        if available:
+            return f"Sorry, {result['error']}. Available times that day: {', '.join(available)}. Which would you like?"
+        return f"Sorry, {result['error']}. That day is fully booked, could you pick another date?"
+    session['held_slot'] = slot
+    return None
+
+
+def wants_to_confirm(session, bot_response, message):
+    """True when this turn completed the booking conversation"""
+    return (session['conversation_state'] == 'confirmed' or
+            (bot_response.get('ready_for_confirmation') and
+             any(word in message.lower() for word in CONFIRM_WORDS)))
+
+
+def confirm_booking(session, owner):
+    """Claim the held slot, save the appointment and queue the confirmation emails
+
+    Returns {'success': True, 'message', 'booking_id'} or {'success': False, 'message', 'error'};
+    the session is reset for a new booking on success.
+    """
+    try:
+        # Claim the slot and save to the configured appointment store
+        tenant_id = session.get('tenant')
+        save_result = get_reservations(tenant_id).book(get_store(tenant_id), session['appointment_data'], owner)
+
+        if not save_result['success']:
+            # The hold is gone either way; the next time picked is held afresh
+            session['held_slot'] = None
+            return {
+                'success': False,
+                'error': save_result['error'],
+                'message': f"❌ Sorry, there was an error saving your appointment: {save_result['error']}. Please try again."
+            }
+
+        # Queue email notifications for background delivery
+        booking_id = get_notification_outbox().enqueue(session['appointment_data'], tenant_id)
+        session['booking_ids'].append(booking_id)
+
+        # Reset for new booking
+        session['conversation_state'] = 'greeting'
+        session['appointment_data'] = {}
+        session['held_slot'] = None
+        return {'success': True, 'message': SUCCESS_MESSAGE, 'booking_id': booking_id}
+
+    except Exception as e:
+        return {
+            'success': False,
+            'error': str(e),
+            'message': f"❌ An unexpected error occurred: {str(e)}. Please try again."
+        }
+
+
+def reset_session(session, owner):
+    """Drop the current booking and any slot it holds"""
+    if session['held_slot']:
+        get_reservations(session.get('tenant')).release(*session['held_slot'], owner)
+    session['messages'] = []
+    session['summary'] = None
+    session['conversation_state'] = 'greeting'
+    session['appointment_data'] = {}
+    session['held_slot'] = None
@@ -0,0 +1,377 @@
+"""Bulk import and export of appointments for the Google Sheets backend
+
+Import streams a CSV or JSONL file in fixed-size chunks, normalizes each
+record with batch_validation.py's parsers (regex fast paths with a
+strptime fallback, accepting what the chatbot accepts) and writes each
+chunk with one append_rows call, or with one range update per chunk at a fixed starting
+row (--at-row) so a retried or resumed chunk overwrites the same rows
+instead of appending duplicates. Export pages through the sheet in
+ranged reads and streams rows out, optionally only one day's schedule.
+Memory stays bounded by the chunk or page size, not the file size.
+
+    python bulk_io.py import appointments.csv --rejects rejects.jsonl
+    python bulk_io.py import history.jsonl --at-row 2 --skip 250000
+    python bulk_io.py export schedule.csv --date 2026-11-02
+
+Column names match the sheet header (Timestamp, Name, Email, Phone, Date,
+Time, Service, Notes, Status) in any case; only Name, Email, Service,
+Date and Time are required. Historical dates are accepted unless
+--booking-window is given. Requests are paced under the Sheets
+per-minute write quota and rate-limit errors are retried with backoff.
+The worksheet comes from resources.get_worksheet (--tenant picks a
+clinic), without the app's shared rate limiter.
+"""
+import argparse
+import contextlib
+import csv
+import json
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+import batch_validation
+from appointment_store import APPOINTMENT_COLUMNS, appointment_row
+from chatbot_handler import ChatbotHandler
+from local_extractor import TIME_PATTERN
+from sheets_client import is_retryable
+from tenants import get_tenants
+
+FIELDS = [column.lower() for column in APPOINTMENT_COLUMNS]
+LAST_COLUMN = chr(ord('A') + len(APPOINTMENT_COLUMNS) - 1)
+
+# Memoized date and time parses are dropped past this many distinct values
+MAX_MEMO_ENTRIES = 10000
+
+
+def detect_format(path, fmt=None):
+    """'csv' or 'jsonl', from --format or the file extension"""
+    if fmt:
+        return fmt
+    if path.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    if path.endswith('.csv'):
+        return 'csv'
+    raise ValueError(f"Can't tell the format of {path}; pass --format csv or --format jsonl")
+
+
+def open_text(path, mode):
+    """A file, or stdin/stdout for '-' (left open on exit)"""
+    if path == '-':
+        return contextlib.nullcontext(sys.stdin if 'r' in mode else sys.stdout)
+    return open(path, mode, newline='', encoding='utf-8')
+
+
+def read_records(f, fmt):
+    """Yield (line_number, record) with lowercased keys; unparseable lines yield a None record"""
+    if fmt == 'csv':
+        reader = csv.reader(f)
+        header = [name.strip().lower() for name in next(reader, [])]
+        for row in reader:
+            if row:
+                yield reader.line_num, dict(zip(header, row))
+        return
+    for line_number, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            yield line_number, None
+            continue
+        if not isinstance(record, dict):
+            yield line_number, None
+            continue
+        yield line_number, {str(key).lower(): value for key, value in record.items()}
+
+
+class RecordValidator:
+    """Turns imported records into sheet rows using batch_validation's parsers
+
+    Dates, times and services repeat heavily in bulk files, so their
+    parses are memoized per run. With a calendar, appointments from today
+    on must fit its service_slots; older rows are history and kept as is.
+    """
+
+    def __init__(self, booking_window=False, calendar=None):
+        self.calendar = calendar
+        self.today = datetime.now().strftime('%Y-%m-%d')
+        self.earliest = self.latest = None
+        if booking_window:
+            today = datetime.now().date()
+            self.earliest = today + timedelta(days=1)
+            self.latest = today + timedelta(days=batch_validation.BOOKING_WINDOW_DAYS)
+        self.timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        self._dates = {}
+        self._times = {}
+        self._services = {}
+
+    @staticmethod
+    def parse_time(value):
+        """validate_time, also taking short forms like "10am"; times off the hour are rejected, not rounded"""
+        match = TIME_PATTERN.match(value)
+        if match:
+            hour, minutes, meridiem = match.groups()
+            value = f"{int(hour)}:{minutes or '00'} {meridiem.upper()}M"
+        minutes = value.partition(':')[2][:2]
+        if minutes and minutes != '00':
+            return None
+        return batch_validation.parse_time(value)
+
+    def _memo(self, cache, parse, value):
+        parsed = cache.get(value, False)
+        if parsed is False:
+            if len(cache) >= MAX_MEMO_ENTRIES:
+                cache.clear()
+            parsed = cache[value] = parse(value)
+        return parsed
+
+    def validate(self, record):
+        """Return (row, None) for a valid record or (None, error)"""
+        if record is None:
+            return None, 'not a JSON object'
+        values = {field: str(record.get(field) or '').strip() for field in FIELDS}
+        data = {'name': values['name'], 'notes': values['notes']}
+        if not data['name']:
+            return None, 'missing name'
+
+        if not batch_validation.EMAIL_PATTERN.match(values['email']):
+            return None, f"invalid email: {values['email']!r}"
+        data['email'] = values['email'].lower()
+
+        if values['phone']:
+            data['phone'] = ChatbotHandler.clean_phone(values['phone'])
+            if not data['phone']:
+                return None, f"invalid phone: {values['phone']!r}"
+
+        data['service'] = self._memo(self._services, batch_validation.match_service, values['service'])
+        if not data['service']:
+            return None, 'missing service'
+
+        data['date'] = self._memo(
+            self._dates, lambda value: batch_validation.parse_date(value, self.earliest, self.latest), values['date']
+        )
+        if not data['date']:
+            return None, f"invalid date: {values['date']!r}"
+
+        data['time'] = self._memo(self._times, self.parse_time, values['time'])
+        if not data['time']:
+            return None, f"invalid time: {values['time']!r}"
+
+        allowed = self.calendar.service_times(data['service']) if self.calendar else None
+        if allowed is not None and data['date'] >= self.today and data['time'] not in allowed:
+            return None, f"{data['service']} is only available at {', '.join(allowed)}"
+
+        return appointment_row(data, values['status'] or 'Confirmed', values['timestamp'] or self.timestamp), None
+
+
+class RequestPacer:
+    """Spaces Sheets API requests under a per-minute quota and retries rate-limit errors with backoff"""
+
+    def __init__(self, requests_per_minute=50, max_retries=5, base_delay=2.0, max_delay=64.0,
+                 sleep=time.sleep, clock=time.monotonic):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sleep = sleep
+        self.clock = clock
+        self._next_at = 0.0
+        self.stats = {'requests': 0, 'retries': 0, 'waited_seconds': 0.0}
+
+    def wait(self):
+        """Block until the next request fits under the quota"""
+        now = self.clock()
+        if self._next_at > now:
+            self.stats['waited_seconds'] += self._next_at - now
+            self.sleep(self._next_at - now)
+            now = self._next_at
+        self._next_at = now + self.interval
+
+    def call(self, fn, *args, **kwargs):
+        """Make one paced request, retrying retryable errors"""
+        for attempt in range(self.max_retries + 1):
+            self.wait()
+            self.stats['requests'] += 1
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable(e):
+                    raise
+                delay = min(self.base_delay * 2 ** attempt, self.max_delay) * random.uniform(0.8, 1.2)
+                print(f"Sheets request rate limited or failed ({str(e)}), retrying in {delay:.1f}s")
+                self.stats['retries'] += 1
+                self.sleep(delay)
+
+
+def import_records(sheet, records, chunk_size=1000, pacer=None, at_row=None, skip=0, dry_run=False,
+                   rejects=None, booking_window=False, calendar=None):
+    """Validate records and write them to the sheet chunk by chunk
+
+    records yields (line_number, record). The first `skip` records are
+    passed over unread, for resuming an interrupted import. Rejected
+    records are written to `rejects` (a text file) as JSON lines. Returns
+    stats; if a write fails for good, the --skip (and --at-row) values
+    that continue after the last written chunk are printed before the
+    error is re-raised.
+    """
+    pacer = pacer or RequestPacer()
+    validator = RecordValidator(booking_window, calendar)
+    stats = {'read': 0, 'written': 0, 'rejected': 0, 'chunks': 0, 'resume': skip}
+    next_row = at_row
+    chunk = []
+
+    def write(rows):
+        nonlocal next_row
+        if not dry_run:
+            if next_row is None:
+                pacer.call(sheet.append_rows, rows)
+            else:
+                end = next_row + len(rows) - 1
+                if sheet.row_count < end:
+                    pacer.call(sheet.add_rows, end - sheet.row_count)
+                pacer.call(sheet.update, rows, f'A{next_row}:{LAST_COLUMN}{end}')
+                next_row = end + 1
+        stats['written'] += len(rows)
+        stats['chunks'] += 1
+        stats['resume'] = skip + stats['read']
+
+    try:
+        for index, (line_number, record) in enumerate(records):
+            if index < skip:
+                continue
+            stats['read'] += 1
+            row, error = validator.validate(record)
+            if error:
+                stats['rejected'] += 1
+                if rejects:
+                    rejects.write(json.dumps({'line': line_number, 'error': error, 'record': record}) + '\n')
+                continue
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                write(chunk)
+                chunk = []
+        if chunk:
+            write(chunk)
+    except Exception as e:
+        resume = f"--skip {stats['resume']}" + (f" --at-row {next_row}" if next_row is not None else '')
+        print(f"Error importing appointments after {stats['written']} rows: {str(e)}; resume with {resume}")
+        raise
+    stats['resume'] = skip + stats['read']
+    stats.update(pacer.stats)
+    return stats
+
+
+def iter_sheet_rows(sheet, page_size=5000, pacer=None):
+    """Yield every appointment as a dict keyed by lowercased column, one ranged read per page"""
+    pacer = pacer or RequestPacer()
+    header = pacer.call(sheet.get_values, f'A1:{LAST_COLUMN}1')
+    # gspread answers an empty range with [[]]
+    columns = [name.strip().lower() for name in header[0]] if header and any(header[0]) else FIELDS
+    start = 2
+    while True:
+        page = pacer.call(sheet.get_values, f'A{start}:{LAST_COLUMN}{start + page_size - 1}')
+        rows = [row for row in page if any(row)]
+        for row in rows:
+            yield dict(zip(columns, row))
+        if not rows or len(page) < page_size:
+            return
+        start += page_size
+
+
+def export_rows(rows, f, fmt, date=None, status=None):
+    """Write appointment dicts as CSV or JSONL; with a date, that day's rows sorted by time"""
+    if date:
+        rows = sorted((row for row in rows if row.get('date') == date), key=lambda row: row.get('time', ''))
+    if status:
+        rows = (row for row in rows if row.get('status') == status)
+
+    count = 0
+    if fmt == 'csv':
+        writer = csv.writer(f)
+        writer.writerow(APPOINTMENT_COLUMNS)
+        for row in rows:
+            writer.writerow([row.get(field, '') for field in FIELDS])
+            count += 1
+    else:
+        for row in rows:
+            f.write(json.dumps({field: row.get(field, '') for field in FIELDS}) + '\n')
+            count += 1
+    return count
+
+
+def open_sheet(tenant_id=None):
+    """The appointments worksheet from the shared resources, without the shared client's pacing and retries
+
+    RequestPacer already spaces and retries every request; stacked on the
+    SheetsClient's own retries the attempts and backoff would multiply.
+    """
+    from resources import get_worksheet
+    return get_worksheet(tenant_id)
+
+
+def main(argv=None, sheet=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tenant', help='clinic id from TENANTS_FILE (default: the default clinic)')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    importer = commands.add_parser('import', help='load appointments from a CSV or JSONL file')
+    importer.add_argument('path', help="input file, or - for stdin")
+    importer.add_argument('--format', choices=['csv', 'jsonl'])
+    importer.add_argument('--chunk-size', type=int, default=1000, help='rows per write request')
+    importer.add_argument('--writes-per-minute', type=float, default=50, help='Sheets allows 60 per user')
+    importer.add_argument('--at-row', type=int, help='write with range updates starting at this sheet row')
+    importer.add_argument('--skip', type=int, default=0, help='input records to pass over (resume)')
+    importer.add_argument('--rejects', help='write rejected records here as JSON lines')
+    importer.add_argument('--booking-window', action='store_true',
+                          help='only accept dates in the next 180 days, like the chatbot')
+    importer.add_argument('--dry-run', action='store_true', help='validate without writing')
+
+    exporter = commands.add_parser('export', help='write appointments to a CSV or JSONL file')
+    exporter.add_argument('path', help="output file, or - for stdout")
+    exporter.add_argument('--format', choices=['csv', 'jsonl'])
+    exporter.add_argument('--date', help='only this day (YYYY-MM-DD), sorted by time')
+    exporter.add_argument('--status', help='only rows with this status, e.g. Confirmed')
+    exporter.add_argument('--page-size', type=int, default=5000, help='rows per read request')
+    exporter.add_argument('--reads-per-minute', type=float, default=50, help='Sheets allows 60 per user')
+    args = parser.parse_args(argv)
+
+    fmt = detect_format(args.path, args.format)
+    start = time.perf_counter()
+    if args.command == 'import':
+        tenant = get_tenants().get(args.tenant)
+        if sheet is None and not args.dry_run:
+            sheet = open_sheet(args.tenant)
+        rejects = open(args.rejects, 'w', encoding='utf-8') if args.rejects else None
+        try:
+            with open_text(args.path, 'r') as f:
+                stats = import_records(
+                    sheet, read_records(f, fmt), chunk_size=args.chunk_size,
+                    pacer=RequestPacer(args.writes_per_minute), at_row=args.at_row, skip=args.skip,
+                    dry_run=args.dry_run, rejects=rejects, booking_window=args.booking_window,
+                    calendar=tenant.calendar if tenant else None
+                )
+        finally:
+            if rejects:
+                rejects.close()
+        seconds = time.perf_counter() - start
+        print(f"Imported {stats['written']} of {stats['read']} records ({stats['rejected']} rejected) "
+              f"in {stats['chunks']} chunks, {seconds:.1f}s, {stats['written'] / seconds if seconds else 0:.0f} rows/s")
+        return stats
+
+    if sheet is None:
+        sheet = open_sheet(args.tenant)
+    rows = iter_sheet_rows(sheet, args.page_size, RequestPacer(args.reads_per_minute))
+    with open_text(args.path, 'w') as f:
+        count = export_rows(rows, f, fmt, args.date, args.status)
+    print(f"Exported {count} appointments in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    return {'exported': count}
+
+
+if __name__ == '__main__':
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass  # dotenv not available, using environment variables directly
+    main()
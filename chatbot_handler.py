@@ -1,34 +1,110 @@
 import os
 import json
 import re
+import threading
+import time
 from datetime import datetime, timedelta
 from google import genai
 from google.genai import types
+from local_extractor import LocalExtractor
+from response_cache import get_cache
+from prompt_cache import get_instruction_cache, is_stale_cache_error
+from streaming import MessageFieldParser, StreamedTurn
+from metrics import get_metrics
+from circuit_breaker import get_breaker
+from appointment_store import TIME_SLOTS
 
 class ChatbotHandler:
-    def __init__(self):
-        """Initialize AI chatbot handler"""
-        api_key = os.getenv("GENAI_API_KEY")
-        if not api_key:
-            raise ValueError("GENAI_API_KEY environment variable is not set")
+    services = [
+        "Consultation",
+        "Medical Check-up", 
+        "Dental Cleaning",
+        "Physical Therapy",
+        "Vaccination",
+        "Blood Test",
+        "X-Ray",
+        "Other"
+    ]
+    
+    def __init__(self, client=None, slot_finder=None, tenant=None):
+        """Initialize AI chatbot handler, optionally for one tenant's services and calendar"""
+        if client is None:
+            api_key = os.getenv("GENAI_API_KEY")
+            if not api_key:
+                raise ValueError("GENAI_API_KEY environment variable is not set")
+            client = genai.Client(api_key=api_key)
             
-        self.client = genai.Client(api_key=api_key)
-        self.services = [
-            "Consultation",
-            "Medical Check-up", 
-            "Dental Cleaning",
-            "Physical Therapy",
-            "Vaccination",
-            "Blood Test",
-            "X-Ray",
-            "Other"
-        ]
+        self.client = client
+        
+        # Callable(service, after, n) -> [(date, time)] used to offer open slots
+        self.slot_finder = slot_finder
+        # Per-tenant services and calendar (see tenants.py); without a tenant the class defaults apply
+        self.tenant = tenant
+        self.services = (tenant.services if tenant and tenant.services else None) or type(self).services
+        self.calendar = tenant.calendar if tenant else None
+        
+        self.model = "gemini-2.5-flash"
+        self.prompt_date = None
+        self.system_prompt = self.build_system_prompt()
         
+        # Static instructions are sent once through Gemini context caching
+        self.instruction_cache = None
+        if os.getenv('GEMINI_CONTEXT_CACHE', 'true').lower() == 'true':
+            self.instruction_cache = get_instruction_cache()
+        self.prompt_stats = {'turns': 0, 'prompt_tokens': 0, 'cached_tokens': 0, 'last_turn': None}
+        
+        # Rule-based fast path for turns that don't need the model
+        self.local_extractor = None
+        if os.getenv('LOCAL_EXTRACTION', 'true').lower() == 'true':
+            self.local_extractor = LocalExtractor(self)
+        
+        # Process-wide cache of model responses for repeated turns
+        self.response_cache = None
+        if os.getenv('RESPONSE_CACHE', 'true').lower() == 'true':
+            self.response_cache = get_cache(
+                path=os.getenv('RESPONSE_CACHE_PATH') or None,
+                max_entries=int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '1000')),
+                max_bytes=int(os.getenv('RESPONSE_CACHE_MAX_BYTES', str(10 * 1024 * 1024))),
+                ttl=float(os.getenv('RESPONSE_CACHE_TTL', '3600'))
+            )
+        
+        self.turn_stats = {
+            'local_turns': 0, 'cache_turns': 0, 'llm_turns': 0,
+            'local_seconds': 0.0, 'cache_seconds': 0.0, 'llm_seconds': 0.0
+        }
+        self._stats_lock = threading.Lock()
+        # Process-wide latency, token and fallback metrics (see metrics.py)
+        self.metrics = get_metrics()
+        
+        # Stop waiting on Gemini while it is failing or slow; turns run on local extraction meanwhile
+        self.breaker = None
+        if os.getenv('GEMINI_BREAKER', 'true').lower() == 'true':
+            failure_rate = float(os.getenv('GEMINI_BREAKER_FAILURE_RATE', '0.5'))
+            self.breaker = get_breaker(
+                'gemini',
+                window=int(os.getenv('GEMINI_BREAKER_WINDOW', '20')),
+                failure_threshold=failure_rate,
+                slow_call_threshold=failure_rate,
+                slow_call_seconds=float(os.getenv('GEMINI_BREAKER_SLOW_SECONDS', '10')),
+                open_seconds=float(os.getenv('GEMINI_BREAKER_OPEN_SECONDS', '30'))
+            )
+        self.degraded_extractor = LocalExtractor(self)
+    
+    def build_system_prompt(self):
+        """Build the static system instruction for today's date"""
         # Get current date for AI context
-        current_date = datetime.now().strftime('%Y-%m-%d')
+        self.prompt_date = datetime.now().strftime('%Y-%m-%d')
+        current_date = self.prompt_date
         current_day = datetime.now().strftime('%A, %B %d, %Y')
+        assistant = 'an AI appointment booking assistant'
+        time_rule = '9 AM to 5 PM, hourly slots'
+        slots = TIME_SLOTS
+        if self.tenant:
+            assistant += f' for {self.tenant.name}'
+            time_rule = self.calendar.describe()
+            slots = self.calendar.slots
         
-        self.system_prompt = f"""You are an AI appointment booking assistant. Your job is to help users book appointments through a conversational interface.
+        return f"""You are {assistant}. Your job is to help users book appointments through a conversational interface.
 
 CURRENT DATE AND TIME: Today is {current_day} ({current_date})
 
@@ -38,10 +114,10 @@ APPOINTMENT REQUIREMENTS:
 - Phone (10-15 digits required)
 - Service type (from available services or custom)
 - Date (must be future date, within 6 months from today {current_date})
-- Time (9 AM to 5 PM, hourly slots)
+- Time ({time_rule})
 - Notes (optional)
 
-AVAILABLE SERVICES: Consultation, Medical Check-up, Dental Cleaning, Physical Therapy, Vaccination, Blood Test, X-Ray, Other
+AVAILABLE SERVICES: {', '.join(self.services)}
 
 CONVERSATION FLOW:
 1. Greet user and start collecting information
@@ -56,7 +132,7 @@ IMPORTANT RULES:
 - If information is missing or invalid, ask for it again politely
 - Keep track of what information you still need
 - Only accept confirmation when ALL required fields are collected
-- Available time slots: 09:00, 10:00, 11:00, 12:00, 13:00, 14:00, 15:00, 16:00, 17:00
+- Available time slots: {', '.join(slots)}
 - Dates must be tomorrow ({(datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d')}) or later, within 6 months from today
 - When validating dates, remember that today is {current_date}
 
@@ -70,62 +146,435 @@ Always respond with a JSON object containing:
   "ready_for_confirmation": true/false
 }}
 
-STATES: greeting, collecting, confirming, confirmed"""
+STATES: greeting, collecting, confirming, confirmed
+
+EACH TURN you receive a compact JSON object:
+{{"state": current conversation state, "collected": fields already collected, "missing": fields still needed, "message": the user's message}}
+It may also include "open": the earliest free slots ("YYYY-MM-DD HH:MM") from the collected date, or from tomorrow.
+In long conversations "earlier" sums up the turns no longer shown, including details the user gave there.
+
+TURN RULES:
+- Look carefully at "collected" to see what information has already been collected. DO NOT ask for information that is already present.
+- If the user mentions a service type (like consultation, medical check-up, dental cleaning, etc.), extract it and include it in your response data.
+- Validate any new information and guide the user through the booking process by asking for the NEXT missing field only.
+- When asking for a date or time and "open" is present, offer those slots as concrete options."""
+    
+    def get_system_prompt(self):
+        """Return the system instruction, rebuilding it when the date changes"""
+        if self.prompt_date != datetime.now().strftime('%Y-%m-%d'):
+            self.system_prompt = self.build_system_prompt()
+        return self.system_prompt
+    
+    def build_turn_context(self, message, current_state, appointment_data, openings=None, earlier=None):
+        """Build the minimal per-turn delta sent alongside the cached instructions"""
+        collected = {field: value for field, value in appointment_data.items() if value}
+        missing = [field for field in ['name', 'email', 'phone', 'service', 'date', 'time'] if not collected.get(field)]
+        context = {'state': current_state, 'collected': collected, 'missing': missing, 'message': message}
+        if openings:
+            context['open'] = [f'{date} {time_slot}' for date, time_slot in openings]
+        if earlier:
+            context['earlier'] = earlier
+        return json.dumps(context, separators=(',', ':'))
+    
+    def find_next_available(self, service=None, after=None, n=3):
+        """Earliest open (date, time) slots on or after a date, or [] if unknown"""
+        if not self.slot_finder:
+            return []
+        try:
+            return self.slot_finder(service, after, n)
+        except Exception as e:
+            print(f"Error finding available slots: {str(e)}")
+            return []
+    
+    def turn_openings(self, appointment_data, n=5):
+        """Open slots worth showing the model while the time is still missing"""
+        if appointment_data.get('time') or not (appointment_data.get('date') or appointment_data.get('service')):
+            return []
+        return self.find_next_available(appointment_data.get('service'), appointment_data.get('date'), n)
+    
+    def format_openings(self, openings):
+        """Human-readable list of (date, time) slots"""
+        days = {}
+        for date, time_slot in openings:
+            days.setdefault(date, []).append(time_slot)
+        parts = []
+        for date, times in days.items():
+            label = datetime.strptime(date, '%Y-%m-%d').strftime('%A, %B %d')
+            parts.append(f"{label} at {', '.join(times)}")
+        return '; '.join(parts)
+    
+    def check_slot_available(self, ai_response, current_data):
+        """If the chosen date and time are already booked, drop the time and offer alternatives"""
+        date = current_data.get('date')
+        time_slot = current_data.get('time')
+        if not (self.slot_finder and date and time_slot):
+            return
+        if 'date' not in ai_response['data'] and 'time' not in ai_response['data']:
+            return  # only check when this turn picked the slot
+        
+        service = current_data.get('service')
+        openings = self.find_next_available(service, date, 9)
+        if not openings:
+            return  # availability unknown; the booking step still guards against conflicts
+        if (date, time_slot) in openings:
+            return
+        
+        same_day = [slot for slot in openings if slot[0] == date][:3]
+        alternatives = same_day or openings[:3]
+        notice = f"Sorry, {time_slot} on {date} is already booked."
+        if alternatives:
+            notice += f" The nearest open slots are {self.format_openings(alternatives)}. Which would you like?"
+        
+        ai_response['data'].pop('time', None)
+        current_data.pop('time', None)
+        ai_response['state'] = 'collecting'
+        ai_response['alternatives'] = alternatives
+        ai_response['slot_notice'] = notice
+        ai_response['message'] = f"{ai_response['message']}\n\n{notice}"
+    
+    def build_generate_config(self):
+        """Generation config carrying the system instruction, cached when possible"""
+        if self.instruction_cache:
+            return self.instruction_cache.get_config(
+                self.client, self.model, self.get_system_prompt(), response_mime_type="application/json"
+            )
+        return types.GenerateContentConfig(
+            system_instruction=self.get_system_prompt(),
+            response_mime_type="application/json"
+        )
+    
+    def record_prompt_usage(self, response):
+        """Record prompt token usage reported for a turn"""
+        usage = getattr(response, 'usage_metadata', None)
+        if usage is None:
+            return
+        prompt_tokens = usage.prompt_token_count or 0
+        cached_tokens = usage.cached_content_token_count or 0
+        output_tokens = getattr(usage, 'candidates_token_count', None) or 0
+        self.metrics.inc('gemini_tokens_total', prompt_tokens - cached_tokens, kind='prompt_uncached')
+        self.metrics.inc('gemini_tokens_total', cached_tokens, kind='prompt_cached')
+        self.metrics.inc('gemini_tokens_total', output_tokens, kind='output')
+        with self._stats_lock:
+            self.prompt_stats['turns'] += 1
+            self.prompt_stats['prompt_tokens'] += prompt_tokens
+            self.prompt_stats['cached_tokens'] += cached_tokens
+            self.prompt_stats['last_turn'] = {
+                'prompt_tokens': prompt_tokens,
+                'cached_tokens': cached_tokens,
+                'uncached_tokens': prompt_tokens - cached_tokens
+            }
+    
+    def get_prompt_stats(self):
+        """Average prompt tokens per turn, split into cached and uncached"""
+        with self._stats_lock:
+            stats = dict(self.prompt_stats)
+        turns = stats['turns']
+        return {
+            'turns': turns,
+            'avg_prompt_tokens': stats['prompt_tokens'] / turns if turns else 0.0,
+            'avg_cached_tokens': stats['cached_tokens'] / turns if turns else 0.0,
+            'avg_uncached_tokens': (stats['prompt_tokens'] - stats['cached_tokens']) / turns if turns else 0.0,
+            'last_turn': stats['last_turn']
+        }
+    
+    def record_turn(self, source, elapsed):
+        """Record how a turn was served and how long it took"""
+        self.metrics.inc('chatbot_turns_total', source=source)
+        if self.metrics.sampled():
+            self.metrics.observe('chatbot_turn_seconds', elapsed, source=source)
+        with self._stats_lock:
+            self.turn_stats[f'{source}_turns'] += 1
+            self.turn_stats[f'{source}_seconds'] += elapsed
+    
+    def get_turn_stats(self):
+        """Share of turns served locally, from cache and by the LLM, and the latency saved"""
+        with self._stats_lock:
+            stats = dict(self.turn_stats)
+        
+        total = stats['local_turns'] + stats['cache_turns'] + stats['llm_turns']
+        avg_llm = stats['llm_seconds'] / stats['llm_turns'] if stats['llm_turns'] else 0.0
+        saved = 0.0
+        result = {}
+        for source in ('local', 'cache', 'llm'):
+            turns = stats[f'{source}_turns']
+            avg = stats[f'{source}_seconds'] / turns if turns else 0.0
+            result[f'{source}_turns'] = turns
+            result[f'{source}_share'] = turns / total if total else 0.0
+            result[f'avg_{source}_seconds'] = avg
+            if source != 'llm':
+                saved += turns * (avg_llm - avg)
+        result['latency_saved_seconds'] = max(saved, 0.0)
+        if self.response_cache:
+            result['response_cache'] = self.response_cache.get_stats()
+        return result
+    
+    def is_cacheable(self, ai_response, appointment_data):
+        """Only cache replies that carry nothing collected from this conversation
+        
+        The cache key records which fields are filled but not their values, so a
+        reply quoting any of them (a date, time or service as much as a name)
+        could be replayed to a different customer.
+        """
+        data = ai_response.get('data') or {}
+        if not isinstance(data, dict) or any(data.get(field) for field in ('name', 'email', 'phone')):
+            return False
+        text = (str(ai_response.get('message', '')) + ' ' + ' '.join(str(value) for value in data.values())).lower()
+        for value in appointment_data.values():
+            if value and str(value).lower() in text:
+                return False
+        return True
+    
+    def answer_without_model(self, message, current_state, appointment_data):
+        """Try the local fast path and the response cache; return (response or None, cache key)"""
+        # Answer unambiguous turns locally without a model round trip
+        if self.local_extractor:
+            start = time.perf_counter()
+            local_response = self.local_extractor.extract(message, current_state, appointment_data)
+            if local_response:
+                validated_response = self.validate_ai_response(local_response, appointment_data)
+                validated_response['source'] = 'local'
+                self.record_turn('local', time.perf_counter() - start)
+                return validated_response, None
+        
+        # Reuse the model's answer to an identical earlier turn
+        cache_key = None
+        if self.response_cache:
+            start = time.perf_counter()
+            cache_key = self.response_cache.make_key(
+                current_state, appointment_data, message, self.tenant.id if self.tenant else ''
+            )
+            cached_text = self.response_cache.get(cache_key)
+            if cached_text:
+                validated_response = self.validate_ai_response(json.loads(cached_text), appointment_data)
+                validated_response['source'] = 'cache'
+                self.record_turn('cache', time.perf_counter() - start)
+                return validated_response, cache_key
+        
+        return None, cache_key
+    
+    def model_available(self):
+        """False while the circuit breaker is keeping turns off the model"""
+        return self.breaker is None or self.breaker.allow()
+    
+    def degraded_response(self, message, current_state, appointment_data):
+        """Answer a turn with local field extraction while the model is unavailable"""
+        response = self.degraded_extractor.extract_degraded(message, current_state, appointment_data)
+        validated_response = self.validate_ai_response(response, appointment_data)
+        validated_response['source'] = 'degraded'
+        self.metrics.inc('chatbot_turns_total', source='degraded')
+        return validated_response
+    
+    def call_model(self, context, stream=False):
+        """Call Gemini, feeding the outcome and latency to the circuit breaker
+        
+        With stream=True the call can still fail after its first chunk, so it
+        returns (first chunk, chunks, seconds to first chunk) and the outcome
+        is recorded by recorded_chunks once the stream has been read.
+        """
+        start = time.perf_counter()
+        try:
+            response = self.generate(context, stream)
+        except Exception:
+            if self.breaker:
+                self.breaker.record_failure()
+            raise
+        if stream:
+            return response + (time.perf_counter() - start,)
+        if self.breaker:
+            self.breaker.record_success(time.perf_counter() - start)
+        return response
+    
+    def recorded_chunks(self, first_chunk, chunks, latency):
+        """Yield a model stream's chunks, then record the call with the circuit breaker
+        
+        A failure mid-stream counts against the model; a stream the reader
+        abandons counts only if its first chunk was slow.
+        """
+        if first_chunk:
+            yield first_chunk
+        chunks = iter(chunks)
+        while True:
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                break
+            except Exception:
+                if self.breaker:
+                    self.breaker.record_failure()
+                raise
+            try:
+                yield chunk
+            except GeneratorExit:
+                if self.breaker:
+                    self.breaker.record_cancelled(latency)
+                raise
+        if self.breaker:
+            self.breaker.record_success(latency)
     
-    def process_message(self, message, current_state, appointment_data):
+    def generate(self, context, stream=False):
+        """Call Gemini with the cached instructions, resending them inline if the cache is gone"""
+        config = self.build_generate_config()
+        try:
+            return self.request_model(context, config, stream)
+        except Exception as e:
+            # Only a cache the API no longer recognizes is worth a resend; other errors
+            # (outages, rate limits) would just be doubled by one
+            if not config.cached_content or not is_stale_cache_error(e):
+                raise
+            # The cached instructions expired server-side; resend them directly
+            self.instruction_cache.invalidate(self.client, self.model, self.get_system_prompt())
+            config = types.GenerateContentConfig(
+                system_instruction=self.get_system_prompt(),
+                response_mime_type="application/json"
+            )
+            return self.request_model(context, config, stream)
+    
+    def request_model(self, context, config, stream=False):
+        """One timed Gemini request; a stream is timed up to its first chunk"""
+        if not stream:
+            with self.metrics.timed('gemini', 'generate_content'):
+                return self.client.models.generate_content(model=self.model, contents=context, config=config)
+        with self.metrics.timed('gemini', 'generate_content_stream'):
+            response = self.client.models.generate_content_stream(model=self.model, contents=context, config=config)
+            # Pull the first chunk so a stale cache reference fails here, not mid-reply
+            response = iter(response)
+            first_chunk = next(response, None)
+        return first_chunk, response
+    
+    def parse_model_response(self, text, cache_key, message, current_state, appointment_data):
+        """Parse, cache and validate the model's JSON reply"""
+        if not text:
+            return self.create_fallback_response(message, current_state, appointment_data)
+        try:
+            ai_response = json.loads(text)
+        except json.JSONDecodeError:
+            # Fallback if JSON parsing fails
+            return self.create_fallback_response(message, current_state, appointment_data)
+        
+        if cache_key and isinstance(ai_response, dict) and self.is_cacheable(ai_response, appointment_data):
+            self.response_cache.put(cache_key, text)
+        
+        # Validate and clean the response
+        validated_response = self.validate_ai_response(ai_response, appointment_data)
+        validated_response['source'] = 'ai'  # Mark as AI response
+        return validated_response
+    
+    def process_message(self, message, current_state, appointment_data, earlier=None):
         """Process user message using AI and return appropriate response"""
         try:
-            # Prepare context for the AI
-            missing_fields = []
-            for field in ['name', 'email', 'phone', 'service', 'date', 'time']:
-                if not appointment_data.get(field):
-                    missing_fields.append(field)
+            response, cache_key = self.answer_without_model(message, current_state, appointment_data)
+            if response:
+                return response
+            if not self.model_available():
+                return self.degraded_response(message, current_state, appointment_data)
             
-            context = f"""
-CURRENT STATE: {current_state}
-CURRENT APPOINTMENT DATA: {json.dumps(appointment_data)}
-MISSING FIELDS: {missing_fields}
-USER MESSAGE: {message}
-
-IMPORTANT: Look carefully at the CURRENT APPOINTMENT DATA to see what information has already been collected. DO NOT ask for information that is already present in the appointment data.
-
-Based on the user's message and current appointment data, determine what to do next and respond appropriately.
-
-If the user mentions a service type (like consultation, medical check-up, dental cleaning, etc.), make sure to extract it and include it in your response data.
-
-Remember to validate any new information and guide the user through the booking process by asking for the NEXT missing field only.
-"""
-
-            # Combine system prompt with user context for Gemini
-            full_prompt = f"{self.system_prompt}\n\n{context}"
+            # Only the per-turn delta is sent; static instructions travel in the config
+            openings = self.turn_openings(appointment_data)
+            if openings:
+                cache_key = None  # replies quoting live availability can't be reused
+            context = self.build_turn_context(message, current_state, appointment_data, openings, earlier)
             
-            response = self.client.models.generate_content(
-                model="gemini-2.5-flash",
-                contents=full_prompt,
-                config=types.GenerateContentConfig(
-                    response_mime_type="application/json"
-                )
-            )
+            start = time.perf_counter()
+            response = self.call_model(context)
+            self.record_turn('llm', time.perf_counter() - start)
+            self.record_prompt_usage(response)
             
-            if response.text:
-                try:
-                    ai_response = json.loads(response.text)
-                    
-                    # Validate and clean the response
-                    validated_response = self.validate_ai_response(ai_response, appointment_data)
-                    validated_response['source'] = 'ai'  # Mark as AI response
-                    return validated_response
-                    
-                except json.JSONDecodeError:
-                    # Fallback if JSON parsing fails
-                    return self.create_fallback_response(message, current_state, appointment_data)
-            else:
-                return self.create_fallback_response(message, current_state, appointment_data)
+            return self.parse_model_response(response.text, cache_key, message, current_state, appointment_data)
                 
         except Exception as e:
             print(f"AI Error: {str(e)}")
             return self.create_fallback_response(message, current_state, appointment_data)
     
+    def apply_turn(self, session, message, response):
+        """Fold a user message and the reply into a session's state and history
+        
+        The front ends load and save the session around this themselves, since
+        they hold and book slots between the reply and the save (see app.py).
+        """
+        session['messages'].append({'role': 'user', 'content': message})
+        session['conversation_state'] = response.get('state', session['conversation_state'])
+        session['appointment_data'].update(response.get('data', {}))
+        session['messages'].append({'role': 'assistant', 'content': response['message']})
+    
+    def process_message_stream(self, message, current_state, appointment_data, earlier=None):
+        """Process user message, streaming the reply text as the model generates it
+        
+        Returns a StreamedTurn: iterate it for text chunks (e.g. with
+        st.write_stream); afterwards its result holds the same response dict
+        process_message would return, with data and state applied only once
+        the full reply has been parsed.
+        """
+        turn = StreamedTurn()
+        turn.chunks = self._stream_turn(turn, message, current_state, appointment_data, earlier)
+        return turn
+    
+    def _stream_turn(self, turn, message, current_state, appointment_data, earlier=None):
+        """Generator behind process_message_stream"""
+        start = time.perf_counter()
+        streamed = []
+        try:
+            response, cache_key = self.answer_without_model(message, current_state, appointment_data)
+            if not response and not self.model_available():
+                response = self.degraded_response(message, current_state, appointment_data)
+            if response:
+                turn.result = response
+                turn.first_chunk_seconds = time.perf_counter() - start
+                yield response['message']
+                return
+            
+            openings = self.turn_openings(appointment_data)
+            if openings:
+                cache_key = None
+            context = self.build_turn_context(message, current_state, appointment_data, openings, earlier)
+            first_chunk, chunks, latency = self.call_model(context, stream=True)
+            
+            parser = MessageFieldParser()
+            raw = []
+            last_chunk = None
+            for chunk in self.recorded_chunks(first_chunk, chunks, latency):
+                last_chunk = chunk
+                if not chunk.text:
+                    continue
+                raw.append(chunk.text)
+                text = parser.feed(chunk.text)
+                if text:
+                    if turn.first_chunk_seconds is None:
+                        turn.first_chunk_seconds = time.perf_counter() - start
+                    streamed.append(text)
+                    yield text
+            
+            self.record_turn('llm', time.perf_counter() - start)
+            if last_chunk is not None:
+                self.record_prompt_usage(last_chunk)
+            
+            result = self.parse_model_response(''.join(raw), cache_key, message, current_state, appointment_data)
+            if not streamed:
+                # The reply had no message field to stream; show it whole
+                turn.result = result
+                turn.first_chunk_seconds = time.perf_counter() - start
+                yield result['message']
+            elif result.get('source') == 'ai':
+                turn.result = result
+                if result.get('slot_notice'):
+                    yield "\n\n" + result['slot_notice']
+            else:
+                # The reply couldn't be parsed; keep what the user saw and add the fallback question
+                tail = "\n\n" + result['message']
+                result['message'] = ''.join(streamed) + tail
+                turn.result = result
+                yield tail
+        
+        except Exception as e:
+            print(f"AI Error: {str(e)}")
+            result = self.create_fallback_response(message, current_state, appointment_data)
+            if streamed:
+                tail = "\n\n" + result['message']
+                result['message'] = ''.join(streamed) + tail
+            else:
+                tail = result['message']
+            turn.result = result
+            yield tail
+    
     def validate_ai_response(self, ai_response, current_data):
         """Validate and enhance AI response"""
         # Ensure required fields exist
@@ -153,21 +602,13 @@ Remember to validate any new information and guide the user through the booking
                 if parsed_date:
                     validated_data[key] = parsed_date
             elif key == 'time' and value:
-                parsed_time = self.validate_time(str(value))
+                parsed_time = self.match_time(str(value))
                 if parsed_time:
                     validated_data[key] = parsed_time
             elif key == 'service' and value:
-                # Validate service - accept any of the predefined services or custom service
-                service_value = str(value).strip()
+                service_value = self.normalize_service(str(value), self.services)
                 if service_value:
-                    # Check if it matches any predefined service (case insensitive)
-                    for predefined_service in self.services:
-                        if predefined_service.lower() in service_value.lower() or service_value.lower() in predefined_service.lower():
-                            validated_data[key] = predefined_service
-                            break
-                    else:
-                        # If no match found, use the custom service
-                        validated_data[key] = service_value.title()
+                    validated_data[key] = service_value
             elif key in ['name', 'notes'] and value:
                 validated_data[key] = str(value).strip()
         
@@ -176,6 +617,7 @@ Remember to validate any new information and guide the user through the booking
         # Determine what fields are still needed
         all_required = ['name', 'email', 'phone', 'service', 'date', 'time']
         current_data.update(validated_data)
+        self.check_slot_available(ai_response, current_data)
         needs = [field for field in all_required if not current_data.get(field)]
         ai_response['needs'] = needs
         ai_response['ready_for_confirmation'] = len(needs) == 0
@@ -184,6 +626,7 @@ Remember to validate any new information and guide the user through the booking
     
     def create_fallback_response(self, message, current_state, appointment_data):
         """Create fallback response when AI fails"""
+        self.metrics.inc('chatbot_fallbacks_total')
         # Check what information we still need
         required_fields = ['name', 'email', 'phone', 'service', 'date', 'time']
         missing_fields = [field for field in required_fields if not appointment_data.get(field)]
@@ -208,24 +651,46 @@ Remember to validate any new information and guide the user through the booking
                 'source': 'fallback'  # Mark as fallback response
             }
     
-    def validate_email(self, email):
+    def match_time(self, time_str):
+        """Parse a time into one of this handler's bookable slots, or None"""
+        if self.calendar:
+            return self.calendar.match_time(time_str)
+        return self.validate_time(time_str)
+    
+    @classmethod
+    def normalize_service(cls, service_value, services=None):
+        """Map a service to a predefined one (case insensitive), or title-case a custom service"""
+        service_value = service_value.strip()
+        if not service_value:
+            return None
+        for predefined_service in services or cls.services:
+            if predefined_service.lower() in service_value.lower() or service_value.lower() in predefined_service.lower():
+                return predefined_service
+        return service_value.title()
+    
+    @staticmethod
+    def validate_email(email):
         """Validate email format"""
         pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
         return re.match(pattern, email) is not None
     
-    def clean_phone(self, phone):
+    @staticmethod
+    def clean_phone(phone):
         """Clean and validate phone number"""
         cleaned = re.sub(r'[\s\-\(\)]', '', phone)
         if cleaned.isdigit() and 10 <= len(cleaned) <= 15:
             return cleaned
         return None
     
-    def validate_date(self, date_str):
-        """Validate and parse date"""
+    @staticmethod
+    def validate_date(date_str, booking_window=True):
+        """Validate and parse date; with booking_window=False past and far-off dates are accepted too"""
         formats = ['%Y-%m-%d', '%m/%d/%Y', '%m-%d-%Y', '%B %d, %Y', '%b %d, %Y']
         for fmt in formats:
             try:
                 date_obj = datetime.strptime(date_str, fmt).date()
+                if not booking_window:
+                    return date_obj.strftime('%Y-%m-%d')
                 today = datetime.now().date()
                 if date_obj > today and date_obj <= today + timedelta(days=180):
                     return date_obj.strftime('%Y-%m-%d')
@@ -233,7 +698,8 @@ Remember to validate any new information and guide the user through the booking
                 continue
         return None
     
-    def validate_time(self, time_str):
+    @staticmethod
+    def validate_time(time_str):
         """Validate and parse time"""
         time_str = time_str.strip().upper().replace('.', ':')
         
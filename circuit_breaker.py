@@ -0,0 +1,149 @@
+import threading
+import time
+from collections import deque
+from metrics import get_metrics
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Exported as the circuit_breaker_state gauge
+STATE_CODES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose breaker is open"""
+
+
+class CircuitBreaker:
+    """Rolling-window circuit breaker for a flaky or slow dependency
+
+    While closed, the outcomes of the last `window` calls are kept. Once at
+    least min_calls are in the window and either the share of failures
+    reaches failure_threshold or the share of calls slower than
+    slow_call_seconds reaches slow_call_threshold, the breaker opens and
+    allow() refuses calls for open_seconds. It then goes half-open and lets
+    up to half_open_probes calls through: if that many succeed in time it
+    closes with a fresh window, and any failed or slow probe opens it again.
+    """
+
+    def __init__(self, name, window=20, min_calls=10, failure_threshold=0.5, slow_call_seconds=10.0,
+                 slow_call_threshold=0.5, open_seconds=30.0, half_open_probes=2, clock=time.monotonic):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_threshold = failure_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_threshold = slow_call_threshold
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.clock = clock
+        self.state = CLOSED
+        self.opened_at = None
+        self.stats = {'rejected': 0, 'opened': 0, 'closed': 0}
+        self._outcomes = deque(maxlen=window)  # (failed, slow)
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self._lock = threading.Lock()
+        self._metrics = get_metrics()
+        self._metrics.set_gauge('circuit_breaker_state', STATE_CODES[CLOSED], dependency=name)
+
+    def allow(self):
+        """Whether a call may go ahead now; in half-open state this takes a probe slot"""
+        with self._lock:
+            if self.state == OPEN:
+                if self.clock() - self.opened_at < self.open_seconds:
+                    return self._reject()
+                self._transition(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                if self._probes_in_flight + self._probe_successes >= self.half_open_probes:
+                    return self._reject()
+                self._probes_in_flight += 1
+            return True
+
+    def record_success(self, elapsed=0.0):
+        """Record a completed call and how long it took"""
+        self._record(False, elapsed >= self.slow_call_seconds)
+
+    def record_failure(self):
+        """Record a call that raised"""
+        self._record(True, False)
+
+    def record_cancelled(self, elapsed=0.0):
+        """Record a call abandoned by the caller; only counts against the dependency if it was slow"""
+        if elapsed >= self.slow_call_seconds:
+            self._record(False, True)
+            return
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probes_in_flight = max(self._probes_in_flight - 1, 0)
+
+    def _record(self, failed, slow):
+        with self._lock:
+            if self.state == OPEN:
+                return  # a straggler from before the breaker opened
+            if self.state == HALF_OPEN:
+                self._probes_in_flight = max(self._probes_in_flight - 1, 0)
+                if failed or slow:
+                    self._transition(OPEN)
+                    return
+                self._probe_successes += 1
+                if self._probe_successes >= self.half_open_probes:
+                    self._transition(CLOSED)
+                return
+
+            self._outcomes.append((failed, slow))
+            count = len(self._outcomes)
+            if count < self.min_calls:
+                return
+            failures = sum(1 for f, _ in self._outcomes if f)
+            slow_calls = sum(1 for _, s in self._outcomes if s)
+            if failures / count >= self.failure_threshold or slow_calls / count >= self.slow_call_threshold:
+                self._transition(OPEN)
+
+    def _reject(self):
+        self.stats['rejected'] += 1
+        self._metrics.inc('circuit_breaker_rejected_total', dependency=self.name)
+        return False
+
+    def _transition(self, state):
+        """Move to a new state; called with the lock held"""
+        self.state = state
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        if state == OPEN:
+            self.opened_at = self.clock()
+            self.stats['opened'] += 1
+        elif state == CLOSED:
+            self._outcomes.clear()
+            self.stats['closed'] += 1
+        self._metrics.set_gauge('circuit_breaker_state', STATE_CODES[state], dependency=self.name)
+        self._metrics.inc('circuit_breaker_transitions_total', dependency=self.name, state=state)
+        print(f"Circuit breaker for {self.name} is now {state.replace('_', '-')}")
+
+    def get_stats(self):
+        """Current state, window error and slow-call rates and transition counts"""
+        with self._lock:
+            count = len(self._outcomes)
+            failures = sum(1 for f, _ in self._outcomes if f)
+            slow_calls = sum(1 for _, s in self._outcomes if s)
+            return dict(
+                self.stats,
+                state=self.state,
+                window_calls=count,
+                error_rate=failures / count if count else 0.0,
+                slow_rate=slow_calls / count if count else 0.0
+            )
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name, **kwargs):
+    """Return the process-wide breaker for a dependency, creating it with kwargs on first use"""
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = CircuitBreaker(name, **kwargs)
+            _breakers[name] = breaker
+        return breaker
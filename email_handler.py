@@ -1,23 +1,44 @@
-import smtplib
 import os
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 from datetime import datetime
+from email_templates import get_loader
+from smtp_pool import get_pool
 
 class EmailHandler:
-    def __init__(self):
-        """Initialize email handler"""
+    def __init__(self, smtp_pool=None, templates=None, business_email=None, business_name=None, locale=None):
+        """Initialize email handler; business_email, business_name and locale override the environment per tenant"""
         self.smtp_server = os.getenv('SMTP_SERVER', 'smtp.gmail.com')
         self.smtp_port = int(os.getenv('SMTP_PORT', '587'))
         self.email_address = os.getenv('EMAIL_ADDRESS', '')
         self.email_password = os.getenv('EMAIL_PASSWORD', '')
-        self.business_email = os.getenv('BUSINESS_EMAIL', self.email_address)
-        self.business_name = os.getenv('BUSINESS_NAME', 'Appointment Booking Service')
+        self.business_email = business_email or os.getenv('BUSINESS_EMAIL', self.email_address)
+        self.business_name = business_name or os.getenv('BUSINESS_NAME', 'Appointment Booking Service')
+        self.smtp_pool = smtp_pool
+        self.templates = templates or get_loader()
+        # Customer emails use this locale's templates; None means EMAIL_LOCALE
+        self.locale = locale
+    
+    def get_smtp_pool(self):
+        """Return the shared SMTP connection pool for this account"""
+        if self.smtp_pool is None:
+            self.smtp_pool = get_pool(
+                self.smtp_server,
+                self.smtp_port,
+                self.email_address,
+                self.email_password,
+                max_size=int(os.getenv('SMTP_POOL_SIZE', '4')),
+                idle_timeout=float(os.getenv('SMTP_IDLE_TIMEOUT', '60')),
+                use_tls=os.getenv('SMTP_USE_TLS', 'true').lower() == 'true'
+            )
+        return self.smtp_pool
+    
+    def is_configured(self):
+        """Check whether SMTP credentials are set"""
+        return bool(self.email_address and self.email_password)
     
     def send_notifications(self, appointment_data):
         """Send email notifications to user and business"""
         try:
-            if not self.email_address or not self.email_password:
+            if not self.is_configured():
                 return {
                     'success': False,
                     'error': 'Email credentials not configured. Please set EMAIL_ADDRESS and EMAIL_PASSWORD environment variables.'
@@ -52,6 +73,19 @@ class EmailHandler:
                 'error': f'Email sending failed: {str(e)}'
             }
     
+    def user_context(self, appointment_data):
+        """Template fields for emails to the customer"""
+        return {
+            'business_name': self.business_name,
+            'name': appointment_data.get('name') or 'Customer',
+            'email': appointment_data.get('email'),
+            'phone': appointment_data.get('phone') or 'Not provided',
+            'date': appointment_data.get('date'),
+            'time': appointment_data.get('time'),
+            'service': appointment_data.get('service'),
+            'notes': appointment_data.get('notes') or 'None'
+        }
+    
     def send_user_confirmation(self, appointment_data):
         """Send confirmation email to user"""
         try:
@@ -59,38 +93,8 @@ class EmailHandler:
             if not user_email:
                 return {'success': False, 'error': 'User email not provided'}
             
-            # Create message
-            msg = MIMEMultipart()
-            msg['From'] = self.email_address
-            msg['To'] = user_email
-            msg['Subject'] = f"Appointment Confirmation - {self.business_name}"
-            
-            # Email body
-            body = f"""
-Dear {appointment_data.get('name', 'Customer')},
-
-Thank you for booking an appointment with {self.business_name}!
-
-Your appointment details:
-• Date: {appointment_data.get('date')}
-• Time: {appointment_data.get('time')}
-• Service: {appointment_data.get('service')}
-• Contact: {appointment_data.get('phone', 'Not provided')}
-
-Additional Notes: {appointment_data.get('notes', 'None')}
-
-We look forward to seeing you on your appointment date. If you need to reschedule or cancel, please contact us as soon as possible.
-
-Best regards,
-{self.business_name}
-
----
-This is an automated message. Please do not reply to this email.
-"""
-            
-            msg.attach(MIMEText(body, 'plain'))
-            
-            # Send email
+            template = self.templates.get('user_confirmation', self.locale)
+            msg = template.render(self.email_address, user_email, self.user_context(appointment_data))
             return self.send_email(msg)
             
         except Exception as e:
@@ -99,58 +103,52 @@ This is an automated message. Please do not reply to this email.
     def send_business_notification(self, appointment_data):
         """Send notification email to business"""
         try:
-            # Create message
-            msg = MIMEMultipart()
-            msg['From'] = self.email_address
-            msg['To'] = self.business_email
-            msg['Subject'] = f"New Appointment Booking - {appointment_data.get('date')} {appointment_data.get('time')}"
+            context = self.user_context(appointment_data)
+            context['name'] = appointment_data.get('name')
+            context['booking_time'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             
-            # Email body
-            body = f"""
-New Appointment Booking Alert
-
-A new appointment has been booked through the online system:
-
-Customer Details:
-• Name: {appointment_data.get('name')}
-• Email: {appointment_data.get('email')}
-• Phone: {appointment_data.get('phone', 'Not provided')}
-
-Appointment Details:
-• Date: {appointment_data.get('date')}
-• Time: {appointment_data.get('time')}
-• Service: {appointment_data.get('service')}
-
-Additional Notes: {appointment_data.get('notes', 'None')}
-
-Booking Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-
-Please prepare for this appointment and contact the customer if needed.
-
----
-Automated Booking System
-"""
-            
-            msg.attach(MIMEText(body, 'plain'))
-            
-            # Send email
+            # Business notifications always use the default locale
+            msg = self.templates.get('business_notification').render(self.email_address, self.business_email, context)
             return self.send_email(msg)
             
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
+    def build_reminders(self, appointments):
+        """Render day-before reminders for a batch of appointments, skipping any without an email"""
+        recipients = [
+            (appointment_data['email'], self.user_context(appointment_data))
+            for appointment_data in appointments if appointment_data.get('email')
+        ]
+        return self.templates.get('reminder', self.locale).render_many(self.email_address, recipients)
+    
+    def send_reminders(self, appointments):
+        """Send day-before reminders; returns counts of sent and failed emails"""
+        if not self.is_configured():
+            return {'success': False, 'sent': 0, 'failed': 0, 'error': 'Email credentials not configured'}
+        try:
+            messages = self.build_reminders(appointments)
+        except Exception as e:
+            return {'success': False, 'sent': 0, 'failed': 0, 'error': f'Reminder rendering failed: {str(e)}'}
+        
+        errors = []
+        for msg in messages:
+            result = self.send_email(msg)
+            if not result['success']:
+                errors.append(f"{msg['To']}: {result['error']}")
+        return {
+            'success': not errors,
+            'sent': len(messages) - len(errors),
+            'failed': len(errors),
+            'error': '; '.join(errors) or None
+        }
+    
     def send_email(self, msg):
-        """Send email using SMTP"""
+        """Send email over a pooled SMTP connection"""
         try:
-            # Create SMTP session
-            server = smtplib.SMTP(self.smtp_server, self.smtp_port)
-            server.starttls()  # Enable TLS encryption
-            server.login(self.email_address, self.email_password)
-            
             # Send email
             text = msg.as_string()
-            server.sendmail(self.email_address, msg['To'], text)
-            server.quit()
+            self.get_smtp_pool().sendmail(self.email_address, msg['To'], text)
             
             return {'success': True, 'message': 'Email sent successfully'}
             
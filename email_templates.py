@@ -0,0 +1,149 @@
+import email.policy
+import html
+import os
+import re
+import string
+import threading
+from email.message import EmailMessage
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates', 'email')
+
+# Files making up one email in a locale directory; the HTML part is optional
+SUBJECT_SUFFIX = '.subject.txt'
+TEXT_SUFFIX = '.txt'
+HTML_SUFFIX = '.html'
+
+LOCALE_PATTERN = re.compile(r'^[A-Za-z]{2,3}([_-][A-Za-z0-9]{2,8})?$')
+
+# CRLF lines, RFC 2047 headers folded at 78 characters, and 7-bit bodies (quoted-printable or
+# base64), since smtplib.sendmail only takes ASCII text
+MESSAGE_POLICY = email.policy.SMTP.clone(cte_type='7bit')
+
+
+def build_message(sender, to, subject, text, html_body=None):
+    """An EmailMessage with a text body and, when given, an HTML alternative; line breaks in headers are dropped"""
+    msg = EmailMessage(policy=MESSAGE_POLICY)
+    msg['From'] = ' '.join(str(sender).split())
+    msg['To'] = ' '.join(str(to).split())
+    msg['Subject'] = ' '.join(subject.split())
+    msg.set_content(text)
+    if html_body is not None:
+        msg.add_alternative(html_body, subtype='html')
+    return msg
+
+
+class CompiledTemplate:
+    """One template part, checked once and rendered with str.format_map
+
+    Placeholders are plain {field} names; attribute or index lookups,
+    conversions and format specs are rejected when the template is loaded.
+    Missing or None fields render as an empty string. With escape=True
+    values are HTML-escaped.
+    """
+
+    def __init__(self, source, name='<string>', escape=False):
+        fields = set()
+        for _, field, spec, conversion in string.Formatter().parse(source):
+            if field is None:
+                continue
+            if not field.isidentifier() or spec or conversion:
+                raise ValueError(f"Unsupported placeholder {{{field}}} in email template {name}")
+            fields.add(field)
+        self.name = name
+        self.source = source
+        self.fields = tuple(sorted(fields))
+        self.escape = escape
+
+    def render(self, context):
+        """Fill in the placeholders from a dict"""
+        values = {}
+        for field in self.fields:
+            value = context.get(field)
+            value = '' if value is None else str(value)
+            values[field] = html.escape(value) if self.escape else value
+        return self.source.format_map(values)
+
+
+class EmailTemplate:
+    """Compiled subject, text and optional HTML parts of one email
+
+    Only the compiled parts are cached; every render builds a new message.
+    """
+
+    def __init__(self, name, subject, text, html=None):
+        self.name = name
+        self.subject = CompiledTemplate(subject.strip(), f'{name}{SUBJECT_SUFFIX}')
+        self.text = CompiledTemplate(text, f'{name}{TEXT_SUFFIX}')
+        self.html = CompiledTemplate(html, f'{name}{HTML_SUFFIX}', escape=True) if html is not None else None
+
+    def render(self, sender, to, context):
+        """Render one message as an EmailMessage"""
+        return build_message(sender, to, self.subject.render(context), self.text.render(context),
+                             self.html.render(context) if self.html else None)
+
+    def render_many(self, sender, recipients):
+        """Render a batch from (to, context) pairs, e.g. a day's reminders"""
+        return [self.render(sender, to, context) for to, context in recipients]
+
+
+class TemplateLoader:
+    """Loads email templates from <directory>/<locale>/<name>.{subject.txt,txt,html} and caches them compiled
+
+    Templates missing from the requested locale come from the default
+    locale. The HTML part is optional; without it messages are text only.
+    """
+
+    def __init__(self, directory=TEMPLATE_DIR, default_locale='en'):
+        self.directory = directory
+        self.default_locale = default_locale
+        self._templates = {}  # (name, locale) -> EmailTemplate
+        self._lock = threading.Lock()
+
+    def get(self, name, locale=None):
+        """Return the compiled template, loading it on first use"""
+        if not locale or not LOCALE_PATTERN.match(locale):
+            locale = self.default_locale
+        key = (name, locale)
+        template = self._templates.get(key)
+        if template is None:
+            with self._lock:
+                template = self._templates.get(key)
+                if template is None:
+                    template = self._templates[key] = self._load(name, locale)
+        return template
+
+    def _load(self, name, locale):
+        # Every part comes from one locale so a message never mixes languages
+        for directory in dict.fromkeys((locale, self.default_locale)):
+            path = os.path.join(self.directory, directory, name)
+            subject, text = self._read(path + SUBJECT_SUFFIX), self._read(path + TEXT_SUFFIX)
+            if subject is not None and text is not None:
+                return EmailTemplate(name, subject, text, self._read(path + HTML_SUFFIX))
+        raise ValueError(f"Email template {name} not found in {self.directory}")
+
+    def _read(self, path):
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding='utf-8') as f:
+            return f.read()
+
+    def clear(self):
+        """Forget compiled templates so edited files are picked up"""
+        with self._lock:
+            self._templates.clear()
+
+
+_loader = None
+_loader_lock = threading.Lock()
+
+
+def get_loader():
+    """Return the process-wide template loader"""
+    global _loader
+    with _loader_lock:
+        if _loader is None:
+            _loader = TemplateLoader(
+                os.getenv('EMAIL_TEMPLATE_DIR', TEMPLATE_DIR),
+                os.getenv('EMAIL_LOCALE', 'en')
+            )
+        return _loader
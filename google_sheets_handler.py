@@ -2,28 +2,25 @@ import gspread
 from google.oauth2.service_account import Credentials
 import json
 import os
-from datetime import datetime
+import threading
+from availability import AvailabilityMap
+from slot_index import SlotIndex
+from sheet_write_buffer import SheetWriteBuffer
+from appointment_store import AppointmentStore, APPOINTMENT_COLUMNS, TIME_SLOTS, appointment_row
+from metrics import get_metrics
+from sheet_partitions import SheetPartitions
+from sheets_client import get_sheets_client
 
-class GoogleSheetsHandler:
-    def __init__(self):
-        """Initialize Google Sheets handler"""
-        self.client = None
-        self.sheet = None
-        self.setup_client()
-    
-    def setup_client(self):
-        """Setup Google Sheets client with authentication"""
-        try:
-            # Get credentials from environment variable
-            creds_json = os.getenv('GOOGLE_SHEETS_CREDENTIALS')
-            spreadsheet_id = os.getenv('GOOGLE_SPREADSHEET_ID')
-            
-            if not creds_json:
-                raise ValueError("GOOGLE_SHEETS_CREDENTIALS not found in environment variables")
-                
-            if not spreadsheet_id:
-                raise ValueError("GOOGLE_SPREADSHEET_ID not found in environment variables")
-            
+# Authorized gspread clients by credentials JSON, shared by every tenant's handler
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def authorized_client(creds_json):
+    """Return the process-wide gspread client for a service account, authorizing it on first use"""
+    with _clients_lock:
+        client = _clients.get(creds_json)
+        if client is None:
             # Parse the JSON string from environment variable
             try:
                 creds_dict = json.loads(creds_json)
@@ -36,14 +33,66 @@ class GoogleSheetsHandler:
                 'https://www.googleapis.com/auth/drive'
             ]
             
-            # Create credentials
+            # Create credentials and client
             credentials = Credentials.from_service_account_info(creds_dict, scopes=scope)
-            
-            # Initialize client
-            self.client = gspread.authorize(credentials)
-            
-            # Open the spreadsheet
-            self.sheet = self.client.open_by_key(spreadsheet_id).sheet1
+            client = _clients[creds_json] = gspread.authorize(credentials)
+        return client
+
+
+def open_spreadsheet(tenant=None):
+    """Open a tenant's spreadsheet, or GOOGLE_SPREADSHEET_ID's, with the shared client for GOOGLE_SHEETS_CREDENTIALS"""
+    # Get credentials from environment variable
+    creds_json = os.getenv('GOOGLE_SHEETS_CREDENTIALS')
+    spreadsheet_id = (tenant and tenant.spreadsheet_id) or os.getenv('GOOGLE_SPREADSHEET_ID')
+    
+    if not creds_json:
+        raise ValueError("GOOGLE_SHEETS_CREDENTIALS not found in environment variables")
+        
+    if not spreadsheet_id:
+        raise ValueError("GOOGLE_SPREADSHEET_ID not found in environment variables")
+    
+    # One client per service account is shared across tenants
+    client = authorized_client(creds_json)
+    with get_metrics().timed('sheets', 'open_by_key'):
+        return client.open_by_key(spreadsheet_id)
+
+
+def forget_client(creds_json):
+    """Drop a cached client so the next handler re-authenticates"""
+    with _clients_lock:
+        _clients.pop(creds_json, None)
+
+class GoogleSheetsHandler(AppointmentStore):
+    def __init__(self, sheet=None, write_buffer=None, spreadsheet=None, sheets_client=None, tenant=None):
+        """Initialize Google Sheets handler, optionally for a tenant's spreadsheet and calendar"""
+        self.client = None
+        self.sheets_client = sheets_client
+        self.tenant = tenant
+        self.calendar = tenant.calendar if tenant else None
+        if sheet is None and spreadsheet is not None:
+            sheet = spreadsheet.sheet1
+        self.spreadsheet = self.wrap(spreadsheet)
+        self.sheet = self.wrap(sheet)
+        self.slot_index = None
+        self.write_buffer = write_buffer
+        if self.sheet is None:
+            self.setup_client()
+        else:
+            self.ensure_headers()
+        self.setup_slot_index()
+        if self.write_buffer is None:
+            self.setup_write_buffer()
+    
+    def setup_client(self):
+        """Setup Google Sheets client with authentication"""
+        try:
+            # Open the spreadsheet with the client shared across tenants
+            spreadsheet = open_spreadsheet(self.tenant)
+            self.client = authorized_client(os.getenv('GOOGLE_SHEETS_CREDENTIALS'))
+            if self.sheets_client is None:
+                self.sheets_client = get_sheets_client()
+            self.spreadsheet = self.wrap(spreadsheet)
+            self.sheet = self.wrap(spreadsheet.sheet1)
             
             # Ensure headers exist
             self.ensure_headers()
@@ -52,36 +101,90 @@ class GoogleSheetsHandler:
             print(f"Error setting up Google Sheets client: {str(e)}")
             self.client = None
             self.sheet = None
+            self.spreadsheet = None
             raise
     
+    def wrap(self, target):
+        """Time every call on a gspread object and, with a sheets client, rate-limit and retry it"""
+        if self.sheets_client is not None:
+            target = self.sheets_client.wrap(target)
+        # Every call is timed and counted (see metrics.py), including any quota wait and retries
+        return get_metrics().instrument(target, 'sheets')
+    
     def ensure_headers(self):
         """Ensure the spreadsheet has proper headers"""
         try:
             if not self.sheet:
                 return
                 
-            headers = [
-                'Timestamp',
-                'Name',
-                'Email',
-                'Phone',
-                'Date',
-                'Time',
-                'Service',
-                'Notes',
-                'Status'
-            ]
+            headers = APPOINTMENT_COLUMNS
             
             # Check if first row has headers
             first_row = self.sheet.row_values(1)
             
-            if not first_row or first_row != headers:
+            # Cells right of the headers hold markers (see sheet_partitions.GENERATION_CELL)
+            if first_row[:len(headers)] != headers:
                 # Insert headers
                 self.sheet.insert_row(headers, 1)
                 
         except Exception as e:
             print(f"Error ensuring headers: {str(e)}")
     
+    def health_check(self):
+        """Check the sheet is reachable, re-authenticating once if it isn't"""
+        try:
+            if self.sheet:
+                self.sheet.row_values(1)
+                return True
+        except Exception as e:
+            print(f"Google Sheets health check failed, re-authenticating: {str(e)}")
+        
+        forget_client(os.getenv('GOOGLE_SHEETS_CREDENTIALS'))
+        try:
+            self.setup_client()
+        except Exception:
+            return False
+        
+        # Point the index and write buffer at the re-opened worksheet
+        if self.slot_index:
+            self.slot_index.sheet = self.sheet
+        if self.write_buffer:
+            self.write_buffer.sheet = self.sheet
+        return True
+    
+    def close(self):
+        """Flush buffered writes before the handler is discarded"""
+        if self.write_buffer:
+            self.write_buffer.close()
+    
+    def setup_slot_index(self):
+        """Create the local slot availability index for the sheet"""
+        if not self.sheet:
+            return
+        
+        self.slot_index = SlotIndex(
+            self.sheet,
+            refresh_interval=float(os.getenv('SLOT_INDEX_REFRESH_SECONDS', '300')),
+            delta_interval=float(os.getenv('SLOT_INDEX_DELTA_SECONDS', '15')),
+            availability=AvailabilityMap(calendar=self.calendar),
+            capacity=self.calendar.capacity if self.calendar else 1
+        )
+    
+    def setup_write_buffer(self):
+        """Enable batched write-behind appends when SHEETS_WRITE_BEHIND is set"""
+        if not self.sheet or os.getenv('SHEETS_WRITE_BEHIND', 'false').lower() != 'true':
+            return
+        
+        spool_path = os.getenv('SHEETS_SPOOL_PATH', 'sheets_spool.jsonl')
+        if self.tenant:
+            spool_path = self.tenant.path_for(spool_path)
+        self.write_buffer = SheetWriteBuffer(
+            self.sheet,
+            spool_path=spool_path,
+            max_batch_size=int(os.getenv('SHEETS_BATCH_SIZE', '50')),
+            flush_interval=float(os.getenv('SHEETS_FLUSH_SECONDS', '2'))
+        )
+    
     def add_appointment(self, appointment_data):
         """Add appointment to Google Sheets"""
         try:
@@ -92,25 +195,27 @@ class GoogleSheetsHandler:
                 }
             
             # Prepare row data
-            row_data = [
-                datetime.now().strftime('%Y-%m-%d %H:%M:%S'),  # Timestamp
-                appointment_data.get('name', ''),
-                appointment_data.get('email', ''),
-                appointment_data.get('phone', ''),
-                appointment_data.get('date', ''),
-                appointment_data.get('time', ''),
-                appointment_data.get('service', ''),
-                appointment_data.get('notes', ''),
-                'Confirmed'
-            ]
+            row_data = appointment_row(appointment_data)
             
-            # Add row to sheet
-            self.sheet.append_row(row_data)
+            # Add row to sheet, or queue it durably for the next batched append
+            future = None
+            if self.write_buffer:
+                future = self.write_buffer.submit(row_data)
+            else:
+                self.sheet.append_row(row_data)
             
-            return {
+            # Keep the local availability index current
+            if self.slot_index:
+                self.slot_index.record(row_data[4], row_data[5], row_data[8])
+            
+            result = {
                 'success': True,
                 'message': 'Appointment added successfully'
             }
+            if future:
+                result['message'] = 'Appointment saved and queued for Google Sheets'
+                result['future'] = future
+            return result
             
         except Exception as e:
             return {
@@ -124,34 +229,60 @@ class GoogleSheetsHandler:
             if not self.sheet:
                 return []
             
-            # Get all records
-            records = self.sheet.get_all_records()
-            
-            # Find booked slots for the date
-            booked_slots = []
-            for record in records:
-                if record.get('Date') == date and record.get('Status') == 'Confirmed':
-                    booked_slots.append(record.get('Time'))
-            
-            # Define all possible slots (9 AM to 5 PM, hourly)
-            all_slots = [
-                '09:00', '10:00', '11:00', '12:00',
-                '13:00', '14:00', '15:00', '16:00', '17:00'
-            ]
+            # Look up booked slots for the date in the local index
+            self.slot_index.ensure_fresh()
+            booked_slots = self.slot_index.booked_times(date)
             
             # Return available slots
-            available_slots = [slot for slot in all_slots if slot not in booked_slots]
+            slots = self.calendar.slots_on(date) if self.calendar else TIME_SLOTS
+            available_slots = [slot for slot in slots if slot not in booked_slots]
             return available_slots
             
         except Exception as e:
             print(f"Error getting available slots: {str(e)}")
             return []
     
-    def is_slot_available(self, date, time):
-        """Check if a specific slot is available"""
+    def find_next_available(self, service=None, after=None, n=3):
+        """Find the earliest open slots across the bookable window"""
         try:
-            available_slots = self.get_available_slots(date)
-            return time in available_slots
+            if not self.sheet:
+                return []
+            
+            self.slot_index.ensure_fresh()
+            return self.slot_index.find_next_available(service, after, n)
+            
         except Exception as e:
-            print(f"Error checking slot availability: {str(e)}")
-            return True  # Assume available if error occurs
+            print(f"Error searching available slots: {str(e)}")
+            return []
+    
+    def confirmed_count(self, date, time_slot):
+        """Confirmed appointments in a slot, read from the sheet rather than the index
+        
+        Rows this process has queued in its write buffer count too; rows other
+        processes have queued are only visible once they flush.
+        """
+        values = self.sheet.get_all_values()
+        columns = self.slot_index._header_columns(values[0] if values else [])
+        rows = values[1:] + (self.write_buffer.pending_rows() if self.write_buffer else [])
+        date_col, time_col, status_col = columns['Date'], columns['Time'], columns['Status']
+        return sum(1 for row in rows if len(row) > status_col and row[date_col] == date
+                   and row[time_col] == time_slot and row[status_col] == 'Confirmed')
+    
+    def get_appointments(self, start, end=None):
+        """Appointment rows dated start..end (YYYY-MM-DD), read from the hot and archive worksheets"""
+        try:
+            if not self.spreadsheet:
+                return []
+            
+            return SheetPartitions(self.spreadsheet, self.sheet).read_range(start, end or start)
+            
+        except Exception as e:
+            print(f"Error reading appointments: {str(e)}")
+            return []
+    
+    def add_rows(self, rows):
+        """Append already-built appointment rows in one batched call"""
+        self.sheet.append_rows(rows)
+        if self.slot_index:
+            for row in rows:
+                self.slot_index.record(row[4], row[5], row[8])
@@ -0,0 +1,240 @@
+import re
+
+REQUIRED_FIELDS = ['name', 'email', 'phone', 'service', 'date', 'time']
+
+FIELD_LABELS = {
+    'name': 'name',
+    'email': 'email address',
+    'phone': 'phone number',
+    'service': 'service',
+    'date': 'date',
+    'time': 'time'
+}
+
+AFFIRMATIVE_REPLIES = {
+    'yes', 'y', 'yeah', 'yep', 'yes please', 'ok', 'okay', 'sure', 'confirm', 'confirmed',
+    'book it', 'please book', 'please book it', 'go ahead', 'correct', 'sounds good'
+}
+
+TIME_PATTERN = re.compile(r'^(\d{1,2})(?::(\d{2}))?\s*([ap])\.?\s*m\.?$', re.IGNORECASE)
+CLOCK_PATTERN = re.compile(r'^(\d{1,2}):(\d{2})$')
+PHONE_PATTERN = re.compile(r'^\+?[\d\s\-\(\)]{10,20}$')
+NAME_PATTERN = re.compile(r"^(?:my name is|my name's|name is|name:)\s+([A-Za-z][A-Za-z'\-]*(?:\s+[A-Za-z][A-Za-z'\-]*){0,3})$", re.IGNORECASE)
+
+# Looser patterns for degraded mode, which looks for values anywhere in a message
+EMAIL_SEARCH = re.compile(r'[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}')
+DATE_SEARCH = re.compile(r'\b(?:\d{4}-\d{2}-\d{2}|\d{1,2}[/-]\d{1,2}[/-]\d{4}|[A-Za-z]{3,9} \d{1,2}, \d{4})\b')
+MERIDIEM_SEARCH = re.compile(r'\b(\d{1,2})(?::(\d{2}))?\s*([ap])\.?m\b\.?', re.IGNORECASE)
+CLOCK_SEARCH = re.compile(r'\b(\d{1,2}):(\d{2})\b')
+PHONE_SEARCH = re.compile(r'\+?\d[\d\s\-\(\)]{8,18}\d')
+NAME_SEARCH = re.compile(r"\b(?:my name is|my name's|name is|call me)\s+([A-Za-z][A-Za-z'\-]*(?:\s+[A-Za-z][A-Za-z'\-]*){0,2})", re.IGNORECASE)
+NOT_NAMES = {'hi', 'hello', 'hey', 'thanks', 'thank you', 'no', 'yes', 'ok', 'okay', 'help'}
+BARE_NAME_PATTERN = re.compile(r"^[A-Za-z][A-Za-z'\-]*(?:\s+[A-Za-z][A-Za-z'\-]*){0,3}$")
+
+
+class LocalExtractor:
+    """Rule-based parser that answers unambiguous turns without calling the model
+
+    A turn is handled locally only when the whole message is a single value
+    whose field is obvious from its shape (an email address, a phone number,
+    "3pm", an ISO date, an exact service name, "my name is ...") or a plain
+    "yes" once every field is collected. Anything else returns None so the
+    caller falls through to the LLM.
+    """
+
+    def __init__(self, validator):
+        self.validator = validator
+
+    def extract(self, message, current_state, appointment_data):
+        """Return a response dict for the turn, or None if it needs the model"""
+        text = message.strip().rstrip('.!')
+        if not text:
+            return None
+
+        missing = [field for field in REQUIRED_FIELDS if not appointment_data.get(field)]
+
+        if not missing:
+            if current_state == 'confirming' and text.lower() in AFFIRMATIVE_REPLIES:
+                return {
+                    'message': "Great, I'm booking your appointment now.",
+                    'state': 'confirmed',
+                    'data': {}
+                }
+            return None
+
+        field, value = self.parse_value(text)
+        if field is None or field not in missing:
+            return None  # corrections to collected fields are left to the model
+
+        remaining = [f for f in missing if f != field]
+        if remaining:
+            reply = f"Thanks, I've noted your {FIELD_LABELS[field]}. {self.prompt_for(remaining[0])}"
+            state = 'collecting'
+        else:
+            reply = self.summary({**appointment_data, field: value})
+            state = 'confirming'
+
+        return {'message': reply, 'state': state, 'data': {field: value}}
+
+    def parse_value(self, text):
+        """Identify the single field a message unambiguously provides"""
+        if '@' in text:
+            if self.validator.validate_email(text):
+                return 'email', text.lower()
+            return None, None
+
+        # Dates first: "2026-12-01" would otherwise look like a short phone number
+        date_value = self.validator.validate_date(text)
+        if date_value:
+            return 'date', date_value
+
+        if PHONE_PATTERN.match(text):
+            phone = self.validator.clean_phone(text.lstrip('+'))
+            return ('phone', phone) if phone else (None, None)
+
+        calendar = getattr(self.validator, 'calendar', None)
+        time_match = TIME_PATTERN.match(text)
+        if time_match:
+            hour, minutes, meridiem = time_match.groups()
+            if calendar:
+                time_value = calendar.match_time(f"{int(hour)}:{minutes or '00'} {meridiem.upper()}M")
+                return ('time', time_value) if time_value else (None, None)
+            if minutes not in (None, '00'):
+                return None, None  # only hourly slots exist; let the model explain
+            time_value = self.validator.validate_time(f"{int(hour)}:00 {meridiem.upper()}M")
+            return ('time', time_value) if time_value else (None, None)
+
+        clock_match = CLOCK_PATTERN.match(text)
+        if clock_match:
+            if calendar:
+                time_value = calendar.match_time(text)
+                return ('time', time_value) if time_value else (None, None)
+            if clock_match.group(2) != '00':
+                return None, None
+            time_value = self.validator.validate_time(text)
+            return ('time', time_value) if time_value else (None, None)
+
+        normalized = re.sub(r'^(?:an?|the)\s+', '', text.lower())
+        for service in self.validator.services:
+            if normalized == service.lower():
+                return 'service', service
+
+        name_match = NAME_PATTERN.match(text)
+        if name_match:
+            return 'name', name_match.group(1).title()
+
+        return None, None
+
+    def extract_degraded(self, message, current_state, appointment_data):
+        """Answer any turn from the fields found in it, for when the model is unavailable
+
+        Unlike extract(), this never returns None: it picks up every value
+        it can recognize anywhere in the message and asks for the next
+        missing field, so a booking can still be completed step by step.
+        """
+        text = message.strip().rstrip('.!')
+        missing = [field for field in REQUIRED_FIELDS if not appointment_data.get(field)]
+
+        if not missing:
+            if text.lower() in AFFIRMATIVE_REPLIES:
+                return {'message': "Great, I'm booking your appointment now.", 'state': 'confirmed', 'data': {}}
+            return {'message': self.summary(appointment_data), 'state': 'confirming', 'data': {}}
+
+        # A bare name only counts as one once we've asked for it, not in an opening "Hello"
+        found = self.find_values(text, missing[0] if current_state != 'greeting' else None)
+        remaining = [field for field in missing if field not in found]
+        if not remaining:
+            return {'message': self.summary({**appointment_data, **found}), 'state': 'confirming', 'data': found}
+
+        if found:
+            noted = ' and '.join(FIELD_LABELS[field] for field in found)
+            reply = f"Thanks, I've noted your {noted}. {self.prompt_for(remaining[0])}"
+        else:
+            reply = f"Sorry, I didn't catch that. {self.prompt_for(remaining[0])}"
+        return {'message': reply, 'state': 'collecting', 'data': found}
+
+    def find_values(self, text, asking=None):
+        """Every field value recognizable anywhere in a message; asking is the field just asked for"""
+        found = {}
+        rest = text
+
+        email = EMAIL_SEARCH.search(rest)
+        if email and self.validator.validate_email(email.group(0)):
+            found['email'] = email.group(0).lower()
+            rest = rest.replace(email.group(0), ' ')
+
+        for match in DATE_SEARCH.finditer(rest):
+            date_value = self.validator.validate_date(match.group(0))
+            if date_value:
+                found['date'] = date_value
+                rest = rest.replace(match.group(0), ' ')
+                break
+
+        calendar = getattr(self.validator, 'calendar', None)
+        time_match = MERIDIEM_SEARCH.search(rest)
+        if time_match and calendar:
+            time_value = calendar.match_time(
+                f"{int(time_match.group(1))}:{time_match.group(2) or '00'} {time_match.group(3).upper()}M"
+            )
+        elif time_match and time_match.group(2) in (None, '00'):
+            time_value = self.validator.validate_time(f"{int(time_match.group(1))}:00 {time_match.group(3).upper()}M")
+        else:
+            time_match = CLOCK_SEARCH.search(rest)
+            time_value = None
+            if time_match:
+                time_value = (calendar.match_time(time_match.group(0)) if calendar
+                              else self.validator.validate_time(time_match.group(0)))
+        if time_value:
+            found['time'] = time_value
+            rest = rest.replace(time_match.group(0), ' ')
+
+        phone = PHONE_SEARCH.search(rest)
+        if phone:
+            cleaned = self.validator.clean_phone(phone.group(0).lstrip('+'))
+            if cleaned:
+                found['phone'] = cleaned
+                rest = rest.replace(phone.group(0), ' ')
+
+        squashed = re.sub(r'[\s\-]', '', rest.lower())
+        for service in self.validator.services:
+            if service != 'Other' and re.sub(r'[\s\-]', '', service.lower()) in squashed:
+                found['service'] = service
+                break
+
+        name = NAME_SEARCH.search(rest)
+        if name:
+            found['name'] = name.group(1).strip().title()
+        elif (asking == 'name' and not found and BARE_NAME_PATTERN.match(text)
+              and text.lower() not in NOT_NAMES):
+            found['name'] = text.title()  # a bare reply to "what name should I book under?"
+
+        return found
+
+    def prompt_for(self, field):
+        """Question asking for the next missing field"""
+        if field == 'service':
+            return f"Which service would you like to book? We offer {', '.join(self.validator.services)}."
+        calendar = getattr(self.validator, 'calendar', None)
+        if field == 'time' and calendar:
+            return f"What time works best? We have {calendar.describe()}."
+        prompts = {
+            'name': "What name should I book the appointment under?",
+            'email': "What's your email address?",
+            'phone': "What's the best phone number to reach you?",
+            'date': "What date would you like to come in? (for example, YYYY-MM-DD)",
+            'time': "What time works best? We have hourly slots from 9 AM to 5 PM."
+        }
+        return prompts[field]
+
+    def summary(self, appointment_data):
+        """Booking summary shown before asking for confirmation"""
+        return (
+            "Here's a summary of your appointment:\n"
+            f"- Name: {appointment_data.get('name')}\n"
+            f"- Email: {appointment_data.get('email')}\n"
+            f"- Phone: {appointment_data.get('phone')}\n"
+            f"- Service: {appointment_data.get('service')}\n"
+            f"- Date: {appointment_data.get('date')}\n"
+            f"- Time: {appointment_data.get('time')}\n\n"
+            "Shall I go ahead and book it?"
+        )
@@ -0,0 +1,286 @@
+import bisect
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    from opentelemetry import trace
+except ImportError:
+    trace = None  # spans are only emitted when opentelemetry is installed
+
+# Upper bounds in seconds; covers a local SQLite read up to a slow model reply
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+METRICS = {
+    'external_call_seconds': ('histogram', 'Latency of calls to Gemini, Google Sheets and SMTP (sampled)'),
+    'external_calls_total': ('counter', 'Calls to Gemini, Google Sheets and SMTP by outcome'),
+    'chatbot_turns_total': ('counter', 'Chat turns by how they were answered (local, cache or llm)'),
+    'chatbot_turn_seconds': ('histogram', 'Time to answer a chat turn by how it was answered (sampled)'),
+    'chatbot_fallbacks_total': ('counter', "Turns answered with the rule-based fallback (source 'fallback')"),
+    'gemini_tokens_total': ('counter', 'Tokens reported in Gemini usage metadata'),
+    'circuit_breaker_state': ('gauge', 'Circuit breaker state: 0 closed, 1 half-open, 2 open'),
+    'circuit_breaker_transitions_total': ('counter', 'Circuit breaker state changes by new state'),
+    'circuit_breaker_rejected_total': ('counter', 'Calls refused while a circuit breaker was open'),
+    'sheets_queue_seconds': ('histogram', 'Time Google Sheets calls waited for the client-side quota'),
+    'sheets_retries_total': ('counter', 'Google Sheets calls retried after a rate limit or server error'),
+    'sheets_coalesced_total': ('counter', 'Google Sheets reads answered by an identical read in flight'),
+}
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def format_labels(labels, extra=None):
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    body = ','.join('{}="{}"'.format(
+        key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    ) for key, value in pairs)
+    return '{' + body + '}'
+
+
+def format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metrics:
+    """In-process counters, gauges and latency histograms with Prometheus text export
+
+    Counters are always exact. Latency observations (and OpenTelemetry
+    spans, when a tracer is set) are taken for a random sample_rate share of
+    calls, so histograms hold a sample; use external_calls_total for exact
+    call and error rates.
+    """
+
+    def __init__(self, enabled=True, sample_rate=1.0, tracer=None, buckets=DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.tracer = tracer
+        self.buckets = tuple(buckets)
+        self._counters = {}  # (name, labels) -> value
+        self._gauges = {}  # (name, labels) -> value
+        self._histograms = {}  # (name, labels) -> [count per bucket..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def sampled(self):
+        """Whether to time and trace this call"""
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    def inc(self, name, amount=1, **labels):
+        """Add to a counter"""
+        if self.enabled:
+            self.add((name, tuple(sorted(labels.items()))), amount)
+
+    def observe(self, name, value, **labels):
+        """Record one observation in a histogram"""
+        if self.enabled:
+            self.record((name, tuple(sorted(labels.items()))), value)
+
+    def set_gauge(self, name, value, **labels):
+        """Set a gauge to its current value"""
+        if self.enabled:
+            with self._lock:
+                self._gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def add(self, key, amount=1):
+        """inc() for a prebuilt (name, sorted label pairs) key"""
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def record(self, key, value):
+        """observe() for a prebuilt (name, sorted label pairs) key"""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._histograms.get(key)
+            if series is None:
+                series = self._histograms[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def timed(self, service, operation):
+        """Context manager that times a call to an external service and counts its outcome"""
+        return CallTimer(self, service, operation)
+
+    def instrument(self, target, service):
+        """Wrap a client object so every method call on it is timed"""
+        if target is None or isinstance(target, InstrumentedClient):
+            return target
+        return InstrumentedClient(target, service, self)
+
+    def get_counter(self, name, **labels):
+        """Current value of one counter series"""
+        with self._lock:
+            return self._counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def get_gauge(self, name, **labels):
+        """Current value of one gauge series, or None"""
+        with self._lock:
+            return self._gauges.get((name, tuple(sorted(labels.items()))))
+
+    def get_histogram(self, name, **labels):
+        """{'count', 'sum', 'buckets'} for one histogram series, or None"""
+        with self._lock:
+            series = self._histograms.get((name, tuple(sorted(labels.items()))))
+            if series is None:
+                return None
+            series = list(series)
+        return {'count': sum(series[:-1]), 'sum': series[-1], 'buckets': dict(zip(self.buckets, series))}
+
+    def reset(self):
+        """Drop every recorded value"""
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            gauges = sorted(self._gauges.items())
+            histograms = sorted((key, list(series)) for key, series in self._histograms.items())
+
+        lines = []
+        described = set()
+
+        def describe(name, kind):
+            if name not in described:
+                described.add(name)
+                lines.append(f'# HELP {name} {METRICS.get(name, (kind, name))[1]}')
+                lines.append(f'# TYPE {name} {kind}')
+
+        for (name, labels), value in counters:
+            describe(name, 'counter')
+            lines.append(f'{name}{format_labels(labels)} {format_value(value)}')
+
+        for (name, labels), value in gauges:
+            describe(name, 'gauge')
+            lines.append(f'{name}{format_labels(labels)} {format_value(value)}')
+
+        for (name, labels), series in histograms:
+            describe(name, 'histogram')
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{name}_bucket{format_labels(labels, ("le", bound))} {cumulative}')
+            cumulative += series[len(self.buckets)]
+            lines.append(f'{name}_bucket{format_labels(labels, ("le", "+Inf"))} {cumulative}')
+            lines.append(f'{name}_sum{format_labels(labels)} {format_value(series[-1])}')
+            lines.append(f'{name}_count{format_labels(labels)} {cumulative}')
+        return '\n'.join(lines) + '\n'
+
+
+class CallTimer:
+    """Times one external call; see Metrics.timed"""
+
+    __slots__ = ('metrics', 'labels', 'span', 'start')
+
+    def __init__(self, metrics, service, operation):
+        self.metrics = metrics
+        self.labels = (('operation', operation), ('service', service))
+        self.span = None
+        self.start = None
+
+    def __enter__(self):
+        metrics = self.metrics
+        if metrics.enabled and metrics.sampled():
+            if metrics.tracer is not None:
+                operation, service = self.labels[0][1], self.labels[1][1]
+                self.span = metrics.tracer.start_as_current_span(
+                    f'{service} {operation}', attributes={'service': service, 'operation': operation}
+                )
+                self.span.__enter__()
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        metrics = self.metrics
+        if not metrics.enabled:
+            return False
+        if self.start is not None:
+            metrics.record(('external_call_seconds', self.labels), time.perf_counter() - self.start)
+        if exc_type is None:
+            outcome = 'ok'
+        elif issubclass(exc_type, Exception):
+            outcome = 'error'
+        else:
+            outcome = 'cancelled'  # e.g. a hedged model request that lost the race
+        operation, service = self.labels
+        metrics.add(('external_calls_total', (operation, ('outcome', outcome), service)))
+        if self.span is not None:
+            self.span.__exit__(exc_type, exc, tb)
+        return False
+
+
+class InstrumentedClient:
+    """Proxy that times every method called on the wrapped client (e.g. a gspread worksheet)"""
+
+    def __init__(self, target, service, metrics):
+        self._target = target
+        self._service = service
+        self._metrics = metrics
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+        metrics, service = self._metrics, self._service
+
+        def call(*args, **kwargs):
+            with metrics.timed(service, name):
+                return attr(*args, **kwargs)
+        return call
+
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    """Serves the Prometheus text output at /metrics"""
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = get_metrics().render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # scrapes every few seconds would flood the log
+
+
+def build_tracer():
+    """OpenTelemetry tracer when METRICS_OTEL is set and opentelemetry is installed"""
+    if os.getenv('METRICS_OTEL', 'false').lower() != 'true':
+        return None
+    if trace is None:
+        print("METRICS_OTEL is set but opentelemetry is not installed (pip install opentelemetry-sdk)")
+        return None
+    return trace.get_tracer('appointment-agent')
+
+
+_metrics = Metrics(
+    enabled=os.getenv('METRICS_ENABLED', 'true').lower() == 'true',
+    sample_rate=float(os.getenv('METRICS_SAMPLE_RATE', '1.0')),
+    tracer=build_tracer()
+)
+_server = None
+_server_lock = threading.Lock()
+
+
+def get_metrics():
+    """Return the process-wide metrics registry"""
+    return _metrics
+
+
+def start_http_server(port, host='0.0.0.0'):
+    """Serve /metrics from a background thread; later calls reuse the running server"""
+    global _server
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, port), MetricsRequestHandler)
+            threading.Thread(target=_server.serve_forever, daemon=True).start()
+        return _server
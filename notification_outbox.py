@@ -0,0 +1,239 @@
+import json
+import random
+import sqlite3
+import threading
+import time
+import uuid
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS notifications (
+    booking_id TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    user_sent INTEGER NOT NULL DEFAULT 0,
+    business_sent INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    last_error TEXT,
+    claimed_at REAL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_notifications_due ON notifications (status, next_attempt_at);
+"""
+
+
+class NotificationOutbox:
+    """Durable outbox of booking notifications delivered by background worker threads
+
+    Bookings are written to a local SQLite queue and acknowledged at once;
+    workers then send the customer confirmation and business notification,
+    retrying failures with exponential backoff. Each email is tracked
+    separately so a retry never resends one that already went out. Status
+    per booking is one of pending, sending, sent or failed.
+
+    A worker holds a sending row for lease_seconds from claiming it. Rows
+    whose lease ran out, left behind by a crashed process, are claimed
+    again by any process sharing the database; live sends are never taken.
+
+    One outbox and its workers serve every tenant: a booking queued with a
+    tenant id is sent by handler_for(tenant_id), that tenant's EmailHandler.
+    """
+
+    def __init__(self, email_handler, db_path='notification_outbox.db', workers=2, max_attempts=6,
+                 base_delay=2.0, max_delay=300.0, poll_interval=5.0, handler_for=None, lease_seconds=600.0):
+        self.email_handler = email_handler
+        self.handler_for = handler_for
+        self.db_path = db_path
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self._local = threading.local()
+        self._claim_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        columns = {row['name'] for row in conn.execute('PRAGMA table_info(notifications)')}
+        if 'claimed_at' not in columns:
+            # Outbox databases created before sends were leased
+            conn.execute('ALTER TABLE notifications ADD COLUMN claimed_at REAL')
+
+    def _connect(self):
+        """Return this thread's connection to the outbox database"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def start(self):
+        """Start the delivery workers"""
+        if self._threads:
+            return
+        self._stopping.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f'notification-outbox-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=10.0):
+        """Stop the delivery workers; undelivered notifications stay queued"""
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def enqueue(self, appointment_data, tenant_id=None):
+        """Queue notifications for a booking and return its booking ID"""
+        if tenant_id is not None:
+            appointment_data = dict(appointment_data, tenant=tenant_id)
+        booking_id = uuid.uuid4().hex[:12]
+        now = time.time()
+        self._connect().execute(
+            'INSERT INTO notifications (booking_id, payload, status, next_attempt_at, created_at, updated_at) '
+            "VALUES (?, ?, 'pending', ?, ?, ?)",
+            (booking_id, json.dumps(appointment_data), now, now, now)
+        )
+        self._wakeup.set()
+        return booking_id
+
+    def get_status(self, booking_id):
+        """Return the delivery status of a booking's notifications, or None if unknown"""
+        row = self._connect().execute(
+            'SELECT status, user_sent, business_sent, attempts, last_error, next_attempt_at '
+            'FROM notifications WHERE booking_id = ?',
+            (booking_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {
+            'status': row['status'],
+            'user_sent': bool(row['user_sent']),
+            'business_sent': bool(row['business_sent']),
+            'attempts': row['attempts'],
+            'last_error': row['last_error'],
+            'next_attempt_at': row['next_attempt_at'] if row['status'] == 'pending' else None
+        }
+
+    def _claim(self):
+        """Atomically take the next due notification, or one whose lease expired, and mark it as sending"""
+        conn = self._connect()
+        with self._claim_lock:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                now = time.time()
+                # Rows left sending before leases existed have no claimed_at; their last update stands in
+                row = conn.execute(
+                    "SELECT * FROM notifications WHERE (status = 'pending' AND next_attempt_at <= ?) "
+                    "OR (status = 'sending' AND COALESCE(claimed_at, updated_at) <= ?) "
+                    'ORDER BY next_attempt_at LIMIT 1',
+                    (now, now - self.lease_seconds)
+                ).fetchone()
+                if row is not None:
+                    conn.execute(
+                        "UPDATE notifications SET status = 'sending', claimed_at = ?, updated_at = ? "
+                        'WHERE booking_id = ?',
+                        (now, now, row['booking_id'])
+                    )
+                    row = dict(row, claimed_at=now)
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        return row
+
+    def _idle_wait(self):
+        """Seconds to sleep until the next retry is due, capped at the poll interval"""
+        try:
+            next_due = self._connect().execute(
+                "SELECT MIN(next_attempt_at) FROM notifications WHERE status = 'pending'"
+            ).fetchone()[0]
+        except Exception:
+            next_due = None
+        if next_due is None:
+            return self.poll_interval
+        return min(self.poll_interval, max(next_due - time.time(), 0.01))
+
+    def _deliver(self, row):
+        """Send whichever emails of a booking have not gone out yet"""
+        appointment_data = json.loads(row['payload'])
+        user_sent = bool(row['user_sent'])
+        business_sent = bool(row['business_sent'])
+        errors = []
+
+        email_handler = self.email_handler
+        tenant_id = appointment_data.pop('tenant', None)
+        if tenant_id is not None and self.handler_for is not None:
+            email_handler = self.handler_for(tenant_id)
+
+        if not email_handler.is_configured():
+            errors.append('Email credentials not configured')
+        else:
+            if not user_sent:
+                result = email_handler.send_user_confirmation(appointment_data)
+                user_sent = result['success']
+                if not user_sent:
+                    errors.append(f"User email: {result['error']}")
+            if not business_sent:
+                result = email_handler.send_business_notification(appointment_data)
+                business_sent = result['success']
+                if not business_sent:
+                    errors.append(f"Business email: {result['error']}")
+
+        attempts = row['attempts'] + 1
+        now = time.time()
+        if not errors:
+            status, next_attempt_at = 'sent', now
+        else:
+            status, next_attempt_at = self._retry_schedule(attempts, now)
+
+        self._connect().execute(
+            'UPDATE notifications SET status = ?, user_sent = ?, business_sent = ?, attempts = ?, '
+            'next_attempt_at = ?, last_error = ?, claimed_at = NULL, updated_at = ? '
+            'WHERE booking_id = ? AND claimed_at = ?',
+            (status, int(user_sent), int(business_sent), attempts, next_attempt_at,
+             '; '.join(errors) or None, now, row['booking_id'], row['claimed_at'])
+        )
+
+    def _retry_schedule(self, attempts, now):
+        """Status and next attempt time after a failed attempt"""
+        if attempts >= self.max_attempts:
+            return 'failed', now
+        # Exponential backoff with jitter so retries from many bookings spread out
+        delay = min(self.base_delay * 2 ** (attempts - 1), self.max_delay)
+        return 'pending', now + delay * random.uniform(0.8, 1.2)
+
+    def _run(self):
+        """Worker loop"""
+        while not self._stopping.is_set():
+            self._wakeup.clear()
+            try:
+                row = self._claim()
+            except Exception as e:
+                print(f"Error reading notification outbox: {str(e)}")
+                row = None
+            if row is None:
+                self._wakeup.wait(self._idle_wait())
+                continue
+            try:
+                self._deliver(row)
+            except Exception as e:
+                print(f"Error delivering notifications for booking {row['booking_id']}: {str(e)}")
+                # Counts as an attempt, so a payload that always fails still ends up failed
+                attempts = row['attempts'] + 1
+                now = time.time()
+                status, next_attempt_at = self._retry_schedule(attempts, now)
+                self._connect().execute(
+                    'UPDATE notifications SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ?, '
+                    'claimed_at = NULL, updated_at = ? WHERE booking_id = ? AND claimed_at = ?',
+                    (status, attempts, next_attempt_at, str(e), now, row['booking_id'], row['claimed_at'])
+                )
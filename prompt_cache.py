@@ -0,0 +1,93 @@
+import hashlib
+import threading
+import time
+from google.genai import types
+from metrics import get_metrics
+
+
+# Statuses the API answers with for a cached content it no longer has or won't serve
+STALE_CACHE_STATUSES = {400, 403, 404}
+
+
+def is_stale_cache_error(error):
+    """Whether a Gemini error says the referenced cachedContent is gone or unusable"""
+    return getattr(error, 'code', None) in STALE_CACHE_STATUSES and 'cachedcontent' in str(error).lower()
+
+
+class SystemInstructionCache:
+    """Keeps the static system instruction in a Gemini context cache
+
+    The instruction is uploaded once per model and prompt version with
+    client.caches.create and later turns reference it by name, so its tokens
+    are billed at the cached rate instead of being resent. If the model or
+    account doesn't support explicit caching (e.g. the prompt is under the
+    minimum cacheable size) the config falls back to a plain
+    system_instruction, which still benefits from implicit prefix caching.
+    """
+
+    def __init__(self, ttl_seconds=3600, retry_after=3600):
+        self.ttl_seconds = ttl_seconds
+        self.retry_after = retry_after
+        self._entries = {}  # (client id, model, prompt hash) -> (cache name, expires_at)
+        self._disabled_until = {}  # model -> monotonic time to retry cache creation
+        self._creating = set()  # keys whose cache is being uploaded right now
+        self._lock = threading.Lock()
+
+    def get_config(self, client, model, system_prompt, **config_kwargs):
+        """Build a GenerateContentConfig that carries the system instruction"""
+        cache_name = self.get_cache_name(client, model, system_prompt)
+        if cache_name:
+            return types.GenerateContentConfig(cached_content=cache_name, **config_kwargs)
+        return types.GenerateContentConfig(system_instruction=system_prompt, **config_kwargs)
+
+    def get_cache_name(self, client, model, system_prompt):
+        """Return the name of a live cached content for the prompt, creating it if needed"""
+        # Cached contents belong to one API project, so entries are per client
+        key = (id(client), model, hashlib.sha256(system_prompt.encode('utf-8')).hexdigest())
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            # Leave a margin so a request never references a cache about to expire
+            if entry and entry[1] - now > 60:
+                return entry[0]
+            if self._disabled_until.get(model, 0) > now or key in self._creating:
+                # Turns arriving while another thread uploads send the instruction inline
+                return None
+            self._creating.add(key)
+
+        # The upload is a network call; other turns shouldn't queue on the lock behind it
+        try:
+            with get_metrics().timed('gemini', 'caches.create'):
+                cached = client.caches.create(
+                    model=model,
+                    config=types.CreateCachedContentConfig(
+                        system_instruction=system_prompt,
+                        display_name='appointment-agent-system-prompt',
+                        ttl=f'{self.ttl_seconds}s'
+                    )
+                )
+        except Exception as e:
+            print(f"Context caching unavailable, sending system instruction directly: {str(e)}")
+            with self._lock:
+                self._creating.discard(key)
+                self._disabled_until[model] = now + self.retry_after
+            return None
+
+        with self._lock:
+            self._creating.discard(key)
+            self._entries[key] = (cached.name, now + self.ttl_seconds)
+        return cached.name
+
+    def invalidate(self, client, model, system_prompt):
+        """Forget a cached content that the API no longer recognizes"""
+        key = (id(client), model, hashlib.sha256(system_prompt.encode('utf-8')).hexdigest())
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+_instruction_cache = SystemInstructionCache()
+
+
+def get_instruction_cache():
+    """Return the process-wide system instruction cache"""
+    return _instruction_cache
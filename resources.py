@@ -0,0 +1,301 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import partial
+from chatbot_handler import ChatbotHandler
+from async_chatbot_handler import AsyncChatbotHandler
+from email_handler import EmailHandler
+from google_sheets_handler import GoogleSheetsHandler, open_spreadsheet
+from notification_outbox import NotificationOutbox
+from sqlite_store import SQLiteAppointmentStore
+from session_store import InMemorySessionStore, SQLiteSessionStore, RedisSessionStore
+from slot_reservations import SlotReservations, InMemoryReservationBackend, SQLiteReservationBackend
+from metrics import get_metrics, start_http_server
+from tenants import get_tenants
+
+
+class ResourceRegistry:
+    """Thread-safe registry of lazily created, process-wide service handlers
+
+    Each resource is built on first use and then shared by every session in
+    the process. Resources with a health check are re-checked at most once
+    per health_check_interval and rebuilt (re-authenticating) if the check
+    fails, e.g. after the service account credentials were revoked.
+
+    Resources registered per_tenant get one instance per tenant, built by
+    factory(tenant) (tenant is None in single-tenant mode). Only the
+    max_tenants most recently used tenants keep their instances; the least
+    recently used one's evictable resources are disposed of to make room
+    and rebuilt if it comes back.
+    """
+
+    def __init__(self, health_check_interval=300.0, max_tenants=500):
+        self.health_check_interval = health_check_interval
+        self.max_tenants = max_tenants
+        self._factories = {}  # name -> (factory, health_check, close, per_tenant, evictable)
+        self._instances = {}  # name, or name:tenant_id -> instance
+        self._checked_at = {}
+        self._locks = {}
+        self._tenants = OrderedDict()  # tenant id -> instance keys, least recently used first
+        self._lock = threading.Lock()
+
+    def register(self, name, factory, health_check=None, close=None, per_tenant=False, evictable=True):
+        """Register how to build, check and dispose of a named resource"""
+        with self._lock:
+            self._factories[name] = (factory, health_check, close, per_tenant, evictable)
+            self._locks.setdefault(name, threading.Lock())
+
+    def get(self, name, tenant=None):
+        """Return the shared instance of a resource, building or rebuilding it as needed"""
+        factory, health_check, close, per_tenant, _ = self._factories[name]
+        key = name
+        if per_tenant and tenant is not None:
+            key = f'{name}:{tenant.id}'
+            self._touch(tenant.id, key)
+        instance = self._instances.get(key)
+        if instance is not None and (
+            health_check is None
+            or time.monotonic() - self._checked_at[key] < self.health_check_interval
+        ):
+            return instance
+
+        with self._lock_for(key):
+            # Another thread may have built or checked it while we waited
+            instance = self._instances.get(key)
+            now = time.monotonic()
+            if instance is not None:
+                if health_check is None or now - self._checked_at[key] < self.health_check_interval:
+                    return instance
+                self._checked_at[key] = now
+                if health_check(instance):
+                    return instance
+                print(f"Health check failed for {key}, reinitializing")
+                self._dispose(key, instance, close)
+
+            instance = factory(tenant) if per_tenant else factory()
+            self._instances[key] = instance
+            self._checked_at[key] = time.monotonic()
+            return instance
+
+    def reset(self, key):
+        """Drop a resource (name, or name:tenant_id) so the next get() rebuilds it"""
+        with self._lock_for(key):
+            instance = self._instances.get(key)
+            if instance is not None:
+                self._dispose(key, instance, self._factories[key.split(':', 1)[0]][2])
+
+    def close_all(self):
+        """Dispose of every built resource, e.g. at process shutdown"""
+        for key in list(self._instances):
+            self.reset(key)
+
+    def tenant_count(self):
+        """Number of tenants currently holding resources"""
+        with self._lock:
+            return len(self._tenants)
+
+    def _lock_for(self, key):
+        lock = self._locks.get(key)
+        if lock is None:
+            with self._lock:
+                lock = self._locks.setdefault(key, threading.Lock())
+        return lock
+
+    def _touch(self, tenant_id, key):
+        """Mark a tenant most recently used, evicting the least recently used beyond max_tenants"""
+        with self._lock:
+            keys = self._tenants.get(tenant_id)
+            if keys is None:
+                keys = self._tenants[tenant_id] = set()
+            else:
+                self._tenants.move_to_end(tenant_id)
+            keys.add(key)
+            evicted = []
+            while len(self._tenants) > self.max_tenants:
+                evicted.append(self._tenants.popitem(last=False))
+        for _, old_keys in evicted:
+            for old_key in old_keys:
+                # Resources that aren't evictable (e.g. in-memory slot holds) are kept as they are
+                if self._factories[old_key.split(':', 1)[0]][4]:
+                    self.reset(old_key)
+
+    def _dispose(self, key, instance, close):
+        """Forget an instance and release what it holds"""
+        self._instances.pop(key, None)
+        if close:
+            try:
+                close(instance)
+            except Exception as e:
+                print(f"Error closing {key}: {str(e)}")
+
+
+def _build_outbox():
+    outbox = NotificationOutbox(
+        registry.get('email'),
+        db_path=os.getenv('NOTIFICATION_OUTBOX_PATH', 'notification_outbox.db'),
+        workers=int(os.getenv('NOTIFICATION_WORKERS', '2')),
+        handler_for=get_email_handler
+    )
+    outbox.start()
+    return outbox
+
+
+def _build_sheets(tenant):
+    return GoogleSheetsHandler(tenant=tenant)
+
+
+def _build_worksheet(tenant):
+    # Timed but not rate-limited or retried: bulk jobs pace their own requests (bulk_io.RequestPacer)
+    return get_metrics().instrument(open_spreadsheet(tenant).sheet1, 'sheets')
+
+
+def _build_sqlite_store(tenant):
+    mirror = None
+    if os.getenv('SHEETS_MIRROR', 'true').lower() == 'true':
+        try:
+            mirror = registry.get('sheets', tenant)
+        except Exception as e:
+            print(f"Google Sheets mirror disabled: {str(e)}")
+    db_path = os.getenv('SQLITE_PATH', 'appointments.db')
+    return SQLiteAppointmentStore(
+        db_path=tenant.path_for(db_path) if tenant else db_path,
+        mirror=mirror,
+        mirror_batch_size=int(os.getenv('SHEETS_MIRROR_BATCH_SIZE', '100')),
+        mirror_interval=float(os.getenv('SHEETS_MIRROR_SECONDS', '5')),
+        calendar=tenant.calendar if tenant else None
+    )
+
+
+def _build_reservations(tenant):
+    backend = os.getenv('RESERVATION_BACKEND', 'memory').lower()
+    if backend == 'sqlite':
+        db_path = os.getenv('RESERVATION_DB_PATH', 'reservations.db')
+        reservation_backend = SQLiteReservationBackend(tenant.path_for(db_path) if tenant else db_path)
+    elif backend == 'memory':
+        reservation_backend = InMemoryReservationBackend()
+    else:
+        raise ValueError(f"Unknown RESERVATION_BACKEND: {backend}")
+    return SlotReservations(reservation_backend, hold_seconds=float(os.getenv('SLOT_HOLD_SECONDS', '300')),
+                            capacity=tenant.calendar.capacity if tenant else 1,
+                            get_store=partial(get_store, tenant.id if tenant else None),
+                            cancel_grace=float(os.getenv('SLOT_CANCEL_GRACE_SECONDS', '900')),
+                            calendar=tenant.calendar if tenant else None)
+
+
+def _build_session_store():
+    backend = os.getenv('SESSION_BACKEND', 'memory').lower()
+    ttl = float(os.getenv('SESSION_TTL_SECONDS', '86400'))
+    max_messages = int(os.getenv('HISTORY_MAX_MESSAGES', '50'))
+    if backend == 'memory':
+        return InMemorySessionStore(ttl=ttl, max_messages=max_messages)
+    if backend == 'sqlite':
+        return SQLiteSessionStore(db_path=os.getenv('SESSION_DB_PATH', 'sessions.db'), ttl=ttl,
+                                  max_messages=max_messages)
+    if backend == 'redis':
+        return RedisSessionStore(url=os.getenv('REDIS_URL', 'redis://localhost:6379/0'), ttl=ttl,
+                                 max_messages=max_messages)
+    raise ValueError(f"Unknown SESSION_BACKEND: {backend}")
+
+
+def _build_email(tenant):
+    if tenant is None:
+        return EmailHandler()
+    return EmailHandler(business_email=tenant.business_email, business_name=tenant.name, locale=tenant.locale)
+
+
+def find_open_slots(service=None, after=None, n=3, tenant_id=None):
+    """Earliest slots that are neither booked in the store nor held by another session"""
+    reservations = get_reservations(tenant_id)
+    # Ask for a few extra in case some of the earliest are currently held
+    slots = get_store(tenant_id).find_next_available(service, after, n + 9)
+    return [slot for slot in slots if reservations.is_available(*slot)][:n]
+
+
+def _build_chatbot(tenant):
+    if tenant is None:
+        return ChatbotHandler(slot_finder=find_open_slots)
+    # Tenants share the Gemini client (and with it the connection pool and context caches)
+    return ChatbotHandler(client=registry.get('chatbot').client,
+                          slot_finder=partial(find_open_slots, tenant_id=tenant.id), tenant=tenant)
+
+
+def _build_async_chatbot(tenant):
+    if tenant is None:
+        return AsyncChatbotHandler(slot_finder=find_open_slots)
+    return AsyncChatbotHandler(client=registry.get('async_chatbot').client,
+                               slot_finder=partial(find_open_slots, tenant_id=tenant.id), tenant=tenant)
+
+
+registry = ResourceRegistry(
+    health_check_interval=float(os.getenv('RESOURCE_HEALTH_CHECK_SECONDS', '300')),
+    max_tenants=int(os.getenv('TENANT_CACHE_SIZE', '500'))
+)
+registry.register('sheets', _build_sheets, health_check=GoogleSheetsHandler.health_check,
+                  close=GoogleSheetsHandler.close, per_tenant=True)
+registry.register('worksheet', _build_worksheet, per_tenant=True)
+registry.register('sqlite_store', _build_sqlite_store, close=SQLiteAppointmentStore.close, per_tenant=True)
+# In-memory holds would be lost if evicted, so reservations stay for the life of the process
+registry.register('reservations', _build_reservations, per_tenant=True, evictable=False)
+registry.register('sessions', _build_session_store)
+registry.register('email', _build_email, per_tenant=True)
+registry.register('chatbot', _build_chatbot, per_tenant=True)
+registry.register('async_chatbot', _build_async_chatbot, per_tenant=True)
+registry.register('notification_outbox', _build_outbox, close=NotificationOutbox.stop)
+
+# Prometheus scrape endpoint for processes without their own HTTP API (e.g. Streamlit)
+if os.getenv('METRICS_PORT'):
+    try:
+        start_http_server(int(os.getenv('METRICS_PORT')))
+    except Exception as e:
+        print(f"Error starting metrics server: {str(e)}")
+
+
+def get_sheets_handler(tenant_id=None):
+    """Shared Google Sheets handler of a tenant (see tenants.py; None for the default)"""
+    return registry.get('sheets', get_tenants().get(tenant_id))
+
+
+def get_worksheet(tenant_id=None):
+    """A tenant's appointments worksheet on its own, for bulk jobs that pace requests themselves"""
+    return registry.get('worksheet', get_tenants().get(tenant_id))
+
+
+def get_store(tenant_id=None):
+    """Shared appointment store for the configured STORAGE_BACKEND"""
+    backend = os.getenv('STORAGE_BACKEND', 'sheets').lower()
+    if backend == 'sheets':
+        return get_sheets_handler(tenant_id)
+    if backend == 'sqlite':
+        return registry.get('sqlite_store', get_tenants().get(tenant_id))
+    raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
+
+
+def get_reservations(tenant_id=None):
+    """Shared slot reservations used to hold and book time slots"""
+    return registry.get('reservations', get_tenants().get(tenant_id))
+
+
+def get_session_store():
+    """Shared store holding every conversation's state between turns"""
+    return registry.get('sessions')
+
+
+def get_email_handler(tenant_id=None):
+    """Shared email handler"""
+    return registry.get('email', get_tenants().get(tenant_id))
+
+
+def get_chatbot(tenant_id=None):
+    """Shared chatbot handler"""
+    return registry.get('chatbot', get_tenants().get(tenant_id))
+
+
+def get_async_chatbot(tenant_id=None):
+    """Shared asyncio chatbot handler used by the HTTP API"""
+    return registry.get('async_chatbot', get_tenants().get(tenant_id))
+
+
+def get_notification_outbox():
+    """Shared notification outbox with its delivery workers running"""
+    return registry.get('notification_outbox')
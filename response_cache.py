@@ -0,0 +1,152 @@
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+
+def normalize_message(message):
+    """Lowercase, collapse whitespace and drop trailing punctuation"""
+    return re.sub(r'\s+', ' ', message.strip().lower()).rstrip('.!?')
+
+
+class ResponseCache:
+    """LRU cache of raw model responses with a TTL, a memory budget and optional SQLite backing
+
+    Entries are keyed on the conversation state, the set of fields already
+    collected (never their values) and the normalized user message, so
+    identical turns from different users share one entry without sharing
+    personal data.
+    """
+
+    def __init__(self, max_entries=1000, max_bytes=10 * 1024 * 1024, ttl=3600.0, path=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.path = path
+        self._entries = OrderedDict()  # key -> (value, stored_at, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.stats = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0}
+
+        if self.path:
+            self._connect().execute(
+                'CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL)'
+            )
+
+    @staticmethod
+    def make_key(current_state, appointment_data, message, scope=''):
+        """Build a cache key from the turn's state, filled fields and message; scope separates tenants"""
+        filled = sorted(field for field, value in appointment_data.items() if value)
+        # Replies can mention relative dates, so entries never outlive the day
+        today = datetime.now().strftime('%Y-%m-%d')
+        parts = [today, current_state, filled, normalize_message(message)]
+        if scope:
+            parts.append(scope)
+        raw = json.dumps(parts)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _connect(self):
+        """Return this thread's connection to the backing store"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        """Return the cached response text for a key, or None"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, stored_at, _ = entry
+                if now - stored_at < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.stats['hits'] += 1
+                    return value
+                self._remove(key)
+                self.stats['expirations'] += 1
+
+        if self.path:
+            try:
+                row = self._connect().execute(
+                    'SELECT value, stored_at FROM responses WHERE key = ? AND stored_at > ?',
+                    (key, now - self.ttl)
+                ).fetchone()
+            except sqlite3.Error as e:
+                print(f"Error reading response cache: {str(e)}")
+                row = None
+            if row is not None:
+                with self._lock:
+                    self._store(key, row[0], row[1])
+                    self.stats['disk_hits'] += 1
+                return row[0]
+
+        with self._lock:
+            self.stats['misses'] += 1
+        return None
+
+    def put(self, key, value):
+        """Cache a response text"""
+        now = time.time()
+        if len(value.encode('utf-8')) > self.max_bytes:
+            return
+        with self._lock:
+            self._store(key, value, now)
+
+        if self.path:
+            try:
+                conn = self._connect()
+                conn.execute('INSERT OR REPLACE INTO responses (key, value, stored_at) VALUES (?, ?, ?)',
+                             (key, value, now))
+                conn.execute('DELETE FROM responses WHERE stored_at <= ?', (now - self.ttl,))
+            except sqlite3.Error as e:
+                print(f"Error writing response cache: {str(e)}")
+
+    def get_stats(self):
+        """Hit, miss and eviction counters plus current memory usage"""
+        with self._lock:
+            lookups = self.stats['hits'] + self.stats['disk_hits'] + self.stats['misses']
+            return {
+                **self.stats,
+                'hit_rate': (self.stats['hits'] + self.stats['disk_hits']) / lookups if lookups else 0.0,
+                'entries': len(self._entries),
+                'bytes': self._bytes
+            }
+
+    def _store(self, key, value, stored_at):
+        """Insert into the LRU, evicting the oldest entries over the limits (lock held)"""
+        self._remove(key)
+        size = len(value.encode('utf-8'))
+        self._entries[key] = (value, stored_at, size)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.stats['evictions'] += 1
+
+    def _remove(self, key):
+        """Drop an entry from the LRU (lock held)"""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(path=None, **kwargs):
+    """Return the process-wide response cache for a backing path (None for memory only)"""
+    with _caches_lock:
+        cache = _caches.get(path)
+        if cache is None:
+            cache = ResponseCache(path=path, **kwargs)
+            _caches[path] = cache
+        return cache
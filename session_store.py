@@ -0,0 +1,293 @@
+import hashlib
+import hmac
+import json
+import sqlite3
+import threading
+import time
+import zlib
+
+try:
+    import redis
+except ImportError:
+    redis = None  # only needed for SESSION_BACKEND=redis
+
+FORMAT_JSON = b'j'
+FORMAT_ZLIB = b'z'
+COMPRESS_OVER_BYTES = 1024
+
+ROLES = {'user': 'u', 'assistant': 'a'}
+ROLE_NAMES = {code: role for role, code in ROLES.items()}
+
+
+def new_session(tenant_id=None):
+    """State of a conversation that hasn't started yet, optionally with one tenant"""
+    return {
+        'messages': [],
+        'conversation_state': 'greeting',
+        'appointment_data': {},
+        'booking_ids': [],
+        'held_slot': None,
+        'summary': None,
+        'tenant': tenant_id
+    }
+
+
+def trim_history(session, max_messages):
+    """Keep only the newest max_messages, folding older ones into the session summary
+
+    The summary records how many messages were dropped, how the
+    conversation started and the details collected by then, which stay
+    pinned even after a booking clears appointment_data.
+    """
+    overflow = len(session['messages']) - max_messages
+    if overflow <= 0:
+        return
+    dropped = session['messages'][:overflow]
+    del session['messages'][:overflow]
+
+    summary = session.get('summary') or {'hidden_messages': 0, 'opening_request': None}
+    summary['hidden_messages'] += overflow
+    details = summary.setdefault('details', {})
+    details.update((field, value) for field, value in session['appointment_data'].items() if value)
+    if summary['opening_request'] is None:
+        first = next((m['content'] for m in dropped if m['role'] == 'user'), None)
+        if first:
+            summary['opening_request'] = first[:200]
+    session['summary'] = summary
+
+
+def summary_text(session):
+    """One-line description of the messages no longer kept, or None"""
+    summary = session.get('summary')
+    if not summary:
+        return None
+    text = f"{summary['hidden_messages']} earlier messages are not shown."
+    if summary.get('opening_request'):
+        text += f" The conversation started with: \"{summary['opening_request']}\""
+    if summary.get('details'):
+        text += f" Details given: {', '.join(f'{field}: {value}' for field, value in summary['details'].items())}."
+    if session.get('booking_ids'):
+        text += f" Bookings made so far: {len(session['booking_ids'])}."
+    return text
+
+
+def session_token(session_id, secret=None):
+    """Opaque token carrying a session id, signed with secret when one is set
+
+    The signature stops a client from choosing the id of its session, e.g.
+    to plant a known one on someone else's browser.
+    """
+    if not secret:
+        return session_id
+    signature = hmac.new(secret.encode('utf-8'), session_id.encode('utf-8'), hashlib.sha256).hexdigest()[:32]
+    return f'{session_id}.{signature}'
+
+
+def session_id_from_token(token, secret=None):
+    """The session id in a token from session_token, or None if it is missing or forged"""
+    if not token:
+        return None
+    session_id = token.split('.', 1)[0]
+    if not session_id.isalnum() or not hmac.compare_digest(session_token(session_id, secret), token):
+        return None
+    return session_id
+
+
+def serialize_session(session):
+    """Encode a session as compact bytes
+
+    Messages become [role code, content] pairs and keys are shortened; the
+    JSON is zlib-compressed once it grows past COMPRESS_OVER_BYTES, which
+    long turn histories quickly do.
+    """
+    compact = {
+        'm': [[ROLES.get(m['role'], m['role']), m['content']] for m in session.get('messages', [])],
+        's': session.get('conversation_state', 'greeting'),
+        'd': session.get('appointment_data', {}),
+        'b': session.get('booking_ids', []),
+        'h': session.get('held_slot'),
+        'y': session.get('summary')
+    }
+    if session.get('tenant'):
+        compact['t'] = session['tenant']
+    payload = json.dumps(compact, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    if len(payload) > COMPRESS_OVER_BYTES:
+        return FORMAT_ZLIB + zlib.compress(payload, 6)
+    return FORMAT_JSON + payload
+
+
+def deserialize_session(blob):
+    """Decode bytes produced by serialize_session"""
+    kind, payload = blob[:1], blob[1:]
+    if kind == FORMAT_ZLIB:
+        payload = zlib.decompress(payload)
+    compact = json.loads(payload)
+    held_slot = compact.get('h')
+    return {
+        'messages': [{'role': ROLE_NAMES.get(role, role), 'content': content} for role, content in compact['m']],
+        'conversation_state': compact['s'],
+        'appointment_data': compact['d'],
+        'booking_ids': compact['b'],
+        'held_slot': tuple(held_slot) if held_slot else None,
+        'summary': compact.get('y'),
+        'tenant': compact.get('t')
+    }
+
+
+class SessionStore:
+    """Where conversation state lives between turns
+
+    Sessions expire ttl seconds after they were last saved. load() returns a
+    fresh session for unknown or expired ids, so callers never special-case
+    a first turn. save() caps the turn history at max_messages, summarizing
+    what it drops, so a session's size and load cost stay bounded however
+    long the conversation runs.
+    """
+
+    def __init__(self, ttl=86400, max_messages=50):
+        self.ttl = ttl
+        self.max_messages = max_messages
+
+    def load(self, session_id):
+        """Return the stored session, or a new one"""
+        session = self.get(session_id)
+        return session if session is not None else new_session()
+
+    def get(self, session_id):
+        """Return the stored session, or None if it is unknown or expired"""
+        blob = self.get_blob(session_id)
+        if blob is None:
+            return None
+        try:
+            return deserialize_session(blob)
+        except Exception as e:
+            print(f"Error loading session {session_id}: {str(e)}")
+            return None
+
+    def save(self, session_id, session):
+        """Store a session and restart its TTL"""
+        trim_history(session, self.max_messages)
+        self.put_blob(session_id, serialize_session(session))
+
+    def get_blob(self, session_id):
+        raise NotImplementedError
+
+    def put_blob(self, session_id, blob):
+        raise NotImplementedError
+
+    def delete(self, session_id):
+        """Forget a session"""
+        raise NotImplementedError
+
+
+class InMemorySessionStore(SessionStore):
+    """Sessions in this process only; state is lost on restart"""
+
+    def __init__(self, ttl=86400, sweep_interval=60, max_messages=50):
+        super().__init__(ttl, max_messages)
+        self.sweep_interval = sweep_interval
+        self._sessions = {}  # id -> (blob, expires_at)
+        self._swept_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def get_blob(self, session_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            if entry[1] <= now:
+                del self._sessions[session_id]
+                return None
+            return entry[0]
+
+    def put_blob(self, session_id, blob):
+        now = time.monotonic()
+        with self._lock:
+            self._sessions[session_id] = (blob, now + self.ttl)
+            if now - self._swept_at >= self.sweep_interval:
+                self._swept_at = now
+                for key in [key for key, (_, expires_at) in self._sessions.items() if expires_at <= now]:
+                    del self._sessions[key]
+
+    def delete(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+
+class SQLiteSessionStore(SessionStore):
+    """Sessions in a SQLite file shared by every replica on the host"""
+
+    def __init__(self, db_path='sessions.db', ttl=86400, sweep_interval=60, max_messages=50):
+        super().__init__(ttl, max_messages)
+        self.db_path = db_path
+        self.sweep_interval = sweep_interval
+        self._swept_at = 0.0
+        self._local = threading.local()
+        self._connect().executescript("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                data BLOB NOT NULL,
+                expires_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_sessions_expiry ON sessions (expires_at);
+        """)
+
+    def _connect(self):
+        """Return this thread's connection to the sessions database"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get_blob(self, session_id):
+        row = self._connect().execute(
+            'SELECT data FROM sessions WHERE session_id = ? AND expires_at > ?',
+            (session_id, time.time())
+        ).fetchone()
+        return bytes(row[0]) if row else None
+
+    def put_blob(self, session_id, blob):
+        now = time.time()
+        conn = self._connect()
+        conn.execute(
+            'INSERT OR REPLACE INTO sessions (session_id, data, expires_at) VALUES (?, ?, ?)',
+            (session_id, blob, now + self.ttl)
+        )
+        if now - self._swept_at >= self.sweep_interval:
+            self._swept_at = now
+            conn.execute('DELETE FROM sessions WHERE expires_at <= ?', (now,))
+
+    def delete(self, session_id):
+        self._connect().execute('DELETE FROM sessions WHERE session_id = ?', (session_id,))
+
+
+class RedisSessionStore(SessionStore):
+    """Sessions in Redis (or anything speaking its protocol), shared across hosts
+
+    Expiry is delegated to Redis with SET ... EX. Requires the optional
+    redis package.
+    """
+
+    def __init__(self, url='redis://localhost:6379/0', ttl=86400, client=None, key_prefix='session:',
+                 max_messages=50):
+        super().__init__(ttl, max_messages)
+        if client is None:
+            if redis is None:
+                raise ValueError("SESSION_BACKEND=redis requires the redis package (pip install redis)")
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.key_prefix = key_prefix
+
+    def get_blob(self, session_id):
+        return self.client.get(self.key_prefix + session_id)
+
+    def put_blob(self, session_id, blob):
+        self.client.set(self.key_prefix + session_id, blob, ex=max(int(self.ttl), 1))
+
+    def delete(self, session_id):
+        self.client.delete(self.key_prefix + session_id)
+
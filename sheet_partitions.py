@@ -0,0 +1,263 @@
+"""Date-partitioned layout for the appointments spreadsheet
+
+The first worksheet stays the hot partition the app reads and appends to,
+holding today's and future appointments. Past appointments live in one
+archive worksheet per month, titled "Archive YYYY-MM". A date-range query
+reads archive months inside the range whole; the hot worksheet and partly
+covered months are read by their Date column first and then only the
+matching rows, so it makes at most two values_batch_get calls. The slot
+index loads the hot worksheet the same way, from today on.
+
+    python sheet_partitions.py migrate --dry-run   # report what an existing sheet would move
+    python sheet_partitions.py migrate             # first split of an existing sheet, verified
+    python sheet_partitions.py archive             # daily job, e.g. from cron
+    python sheet_partitions.py stats
+
+Archiving copies rows into the archive first and only then deletes them
+from the hot worksheet, in one batch request. Rows already present in
+the archive are not copied again, so a run interrupted between the two
+steps can simply be repeated. Deleting rows moves the ones below up, so
+the job then writes a new generation (the time of the run) into the
+GENERATION_CELL beside the hot worksheet's headers; a slot index that
+sees it change on a delta sync reloads instead of reading from a row
+number that no longer lines up.
+"""
+import argparse
+import re
+import time
+from datetime import datetime
+
+from appointment_store import APPOINTMENT_COLUMNS
+
+ARCHIVE_PREFIX = 'Archive '
+DATE_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+
+def column_letter(index):
+    """A1 column letter of a zero-based column index within the appointment columns"""
+    return chr(ord('A') + index)
+
+
+LAST_COLUMN = column_letter(len(APPOINTMENT_COLUMNS) - 1)
+DATE_COLUMN = column_letter(APPOINTMENT_COLUMNS.index('Date'))
+# Header-row cell, right of the headers, changed whenever rows are deleted from the hot worksheet
+GENERATION_COLUMN = column_letter(len(APPOINTMENT_COLUMNS))
+GENERATION_CELL = f'{GENERATION_COLUMN}1'
+
+
+def quote_range(title, cells):
+    """A1 range on a named worksheet, e.g. 'Archive 2026-09'!A2:I"""
+    return "'{}'!{}".format(title.replace("'", "''"), cells)
+
+
+def archive_title(date):
+    """Archive worksheet for a YYYY-MM-DD date"""
+    return f'{ARCHIVE_PREFIX}{date[:7]}'
+
+
+def pad(row):
+    """A row padded or cut to the appointment columns"""
+    row = list(row[:len(APPOINTMENT_COLUMNS)])
+    return row + [''] * (len(APPOINTMENT_COLUMNS) - len(row))
+
+
+def row_runs(row_numbers):
+    """Contiguous (first, last) runs of sheet row numbers, bottom-most first"""
+    runs = []
+    for number in sorted(row_numbers, reverse=True):
+        if runs and runs[-1][0] == number + 1:
+            runs[-1][0] = number
+        else:
+            runs.append([number, number])
+    return [(first, last) for first, last in runs]
+
+
+def dated_runs(dates, start, end=None, max_gap=10):
+    """(first, last) sheet rows, top-down, holding the cells of a Date column read from row 2 dated start..end
+
+    Without end every date from start on matches. Runs fewer than max_gap
+    rows apart are merged to keep the follow-up read to a few ranges, so
+    they can include rows of other dates.
+    """
+    runs = []
+    for number, cell in enumerate(dates, 2):
+        date = cell[0] if cell else ''
+        if date and start <= date and (end is None or date <= end):
+            if runs and number - runs[-1][1] <= max_gap:
+                runs[-1][1] = number
+            else:
+                runs.append([number, number])
+    return [(first, last) for first, last in runs]
+
+
+class SheetPartitions:
+    """Hot worksheet of upcoming appointments plus one archive worksheet per past month"""
+
+    def __init__(self, spreadsheet, hot_sheet=None):
+        self.spreadsheet = spreadsheet
+        self.hot_sheet = hot_sheet or spreadsheet.sheet1
+
+    def archive_sheets(self):
+        """{'YYYY-MM': worksheet} for every archive worksheet"""
+        return {
+            sheet.title[len(ARCHIVE_PREFIX):]: sheet
+            for sheet in self.spreadsheet.worksheets() if sheet.title.startswith(ARCHIVE_PREFIX)
+        }
+
+    def read_range(self, start, end, archives=None):
+        """Appointment rows dated start..end (YYYY-MM-DD, inclusive), sorted by date and time
+
+        Archive months inside the range are read whole along with the Date
+        column of the hot worksheet and partly covered months; a second
+        values_batch_get then reads only the rows of those dated in range.
+        """
+        archives = self.archive_sheets() if archives is None else archives
+        months = [(month, sheet.title) for month, sheet in sorted(archives.items()) if start[:7] <= month <= end[:7]]
+        whole = [title for month, title in months if start <= f'{month}-01' and f'{month}-31' <= end]
+        partial = [self.hot_sheet.title] + [title for _, title in months if title not in whole]
+        response = self.spreadsheet.values_batch_get(
+            [quote_range(title, f'A2:{LAST_COLUMN}') for title in whole] +
+            [quote_range(title, f'{DATE_COLUMN}2:{DATE_COLUMN}') for title in partial]
+        )
+        value_ranges = response.get('valueRanges', [])
+        found = [value_range.get('values', []) for value_range in value_ranges[:len(whole)]]
+        ranges = [
+            quote_range(title, f'A{first}:{LAST_COLUMN}{last}')
+            for title, value_range in zip(partial, value_ranges[len(whole):])
+            for first, last in dated_runs(value_range.get('values', []), start, end)
+        ]
+        if ranges:
+            response = self.spreadsheet.values_batch_get(ranges)
+            found += [value_range.get('values', []) for value_range in response.get('valueRanges', [])]
+        rows = [pad(row) for values in found for row in values]
+        rows = [row for row in rows if start <= row[4] <= end]
+        rows.sort(key=lambda row: (row[4], row[5]))
+        return rows
+
+    def _existing_keys(self, months, archives):
+        """Rows already in the archive months about to receive rows, for idempotent reruns"""
+        titles = [archives[month].title for month in months if month in archives]
+        if not titles:
+            return set()
+        response = self.spreadsheet.values_batch_get([quote_range(title, f'A2:{LAST_COLUMN}') for title in titles])
+        return {tuple(pad(row)) for value_range in response.get('valueRanges', [])
+                for row in value_range.get('values', [])}
+
+    def archive(self, before=None, dry_run=False):
+        """Move rows dated before `before` (default today) into the monthly archive worksheets
+
+        Returns counts; rows without a YYYY-MM-DD date stay in the hot
+        worksheet.
+        """
+        before = before or datetime.now().strftime('%Y-%m-%d')
+        values = self.hot_sheet.get_all_values()
+        header = values[0] if values else []
+        date_col = header.index('Date') if 'Date' in header else 4
+
+        by_month = {}
+        row_numbers = []
+        for number, row in enumerate(values[1:], 2):
+            date = row[date_col] if len(row) > date_col else ''
+            if DATE_PATTERN.match(date) and date < before:
+                by_month.setdefault(date[:7], []).append(pad(row))
+                row_numbers.append(number)
+
+        stats = {
+            'hot_rows': len(values) - 1 if values else 0,
+            'archived': len(row_numbers),
+            'months': {month: len(rows) for month, rows in sorted(by_month.items())},
+            'already_archived': 0,
+        }
+        if dry_run or not row_numbers:
+            return stats
+
+        archives = self.archive_sheets()
+        existing = self._existing_keys(by_month, archives)
+        for month, rows in sorted(by_month.items()):
+            new_rows = [row for row in rows if tuple(row) not in existing]
+            stats['already_archived'] += len(rows) - len(new_rows)
+            sheet = archives.get(month)
+            if sheet is None:
+                sheet = self.spreadsheet.add_worksheet(archive_title(month), rows=len(rows) + 1,
+                                                       cols=len(APPOINTMENT_COLUMNS))
+                new_rows = [list(APPOINTMENT_COLUMNS)] + new_rows  # header goes in with the first write
+            if new_rows:
+                sheet.append_rows(new_rows)
+
+        # Bottom-up so earlier deletions don't shift the rows still to delete
+        self.spreadsheet.batch_update({'requests': [
+            {'deleteDimension': {'range': {
+                'sheetId': self.hot_sheet.id, 'dimension': 'ROWS', 'startIndex': first - 1, 'endIndex': last
+            }}}
+            for first, last in row_runs(row_numbers)
+        ]})
+        # Row numbers moved, so other processes' slot indexes must reload
+        self.hot_sheet.update([[datetime.now().isoformat()]], GENERATION_CELL)
+        return stats
+
+    def stats(self):
+        """Row count per partition"""
+        archives = self.archive_sheets()
+        titles = [self.hot_sheet.title] + [sheet.title for _, sheet in sorted(archives.items())]
+        response = self.spreadsheet.values_batch_get([quote_range(title, 'E2:E') for title in titles])
+        return {title: len(value_range.get('values', []))
+                for title, value_range in zip(titles, response.get('valueRanges', []))}
+
+
+def migrate(partitions, before=None, dry_run=False):
+    """Split an existing single-worksheet sheet; checks that no row was lost or duplicated"""
+    total_before = sum(partitions.stats().values())
+    stats = partitions.archive(before, dry_run)
+    if not dry_run:
+        total_after = sum(partitions.stats().values())
+        stats['verified'] = total_after == total_before
+        if not stats['verified']:
+            print(f"Row count changed from {total_before} to {total_after}; check the archive worksheets")
+    return stats
+
+
+def main(argv=None, spreadsheet=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    for name, help_text in (('migrate', 'split an existing sheet into hot and archive worksheets'),
+                            ('archive', 'move past appointments out of the hot worksheet')):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument('--before', help='archive rows dated before this day (default today)')
+        command.add_argument('--dry-run', action='store_true', help='only report what would move')
+    commands.add_parser('stats', help='rows per partition')
+    args = parser.parse_args(argv)
+
+    if spreadsheet is None:
+        from google_sheets_handler import GoogleSheetsHandler
+        spreadsheet = GoogleSheetsHandler().spreadsheet
+    partitions = SheetPartitions(spreadsheet)
+
+    if args.command == 'stats':
+        for title, count in partitions.stats().items():
+            print(f"{title}: {count} rows")
+        return
+
+    start = time.perf_counter()
+    if args.command == 'migrate':
+        stats = migrate(partitions, args.before, args.dry_run)
+    else:
+        stats = partitions.archive(args.before, args.dry_run)
+    action = 'Would move' if args.dry_run else 'Moved'
+    print(f"{action} {stats['archived']} of {stats['hot_rows']} rows into {len(stats['months'])} archive months "
+          f"in {time.perf_counter() - start:.1f}s")
+    for month, count in stats['months'].items():
+        print(f"  {archive_title(month)}: {count}")
+    if stats['already_archived']:
+        print(f"{stats['already_archived']} rows were already archived by an earlier run and were only removed")
+    if 'verified' in stats:
+        print('Row totals match' if stats['verified'] else 'Row totals DO NOT match')
+    return stats
+
+
+if __name__ == '__main__':
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass  # dotenv not available, using environment variables directly
+    main()
@@ -0,0 +1,240 @@
+import atexit
+import fcntl
+import glob
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+
+
+class SheetWriteBuffer:
+    """Write-behind queue that groups appointment rows into batched append_rows calls
+
+    Every submitted row is first appended to a local spool file and fsynced,
+    so queued bookings survive a crash and are replayed on the next start.
+    A background thread flushes the queue when it reaches max_batch_size rows
+    or when the oldest row has waited flush_interval seconds. Delivery is
+    at-least-once: a crash between a successful append and the spool rewrite
+    replays that batch.
+
+    Each process spools to its own file, spool_path with its pid inserted
+    (sheets_spool.1234.jsonl), and holds an flock on a .lock file beside it
+    while alive. At start the buffer takes over the spools whose lock it can
+    get, i.e. those of processes that have exited, so workers sharing a
+    spool_path never rewrite or replay each other's rows.
+    """
+
+    def __init__(self, sheet, spool_path, max_batch_size=50, flush_interval=2.0, max_retry_delay=60.0):
+        self.sheet = sheet
+        root, ext = os.path.splitext(spool_path)
+        self._spool_pattern = re.compile(re.escape(root) + r'\.\d+' + re.escape(ext) + '$')
+        self._spool_glob = f"{glob.escape(root)}.*{ext}"
+        self.spool_path = f"{root}.{os.getpid()}{ext}"
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self.max_retry_delay = max_retry_delay
+        self._pending = []  # [(entry_id, row, future, queued_at)]
+        self._cond = threading.Condition()
+        self._closed = False
+        self._flushing = False
+        self._force = False
+        self._retry_delay = 0.0
+        self.stats = {'rows_written': 0, 'batches': 0, 'failures': 0}
+
+        self._lock_file = self._lock_spool(self.spool_path)
+        self._recover_spool(spool_path)
+        self._thread = threading.Thread(target=self._run, name='sheet-write-buffer', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, row):
+        """Queue a row for writing and return a future resolved once it is in the sheet"""
+        entry_id = uuid.uuid4().hex
+        future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('Write buffer is closed')
+            with open(self.spool_path, 'a', encoding='utf-8') as spool:
+                spool.write(json.dumps({'id': entry_id, 'row': row}) + '\n')
+                spool.flush()
+                os.fsync(spool.fileno())
+            self._pending.append((entry_id, row, future, time.monotonic()))
+            self._cond.notify()
+        return future
+
+    def pending_count(self):
+        """Number of rows waiting to be written"""
+        with self._cond:
+            return len(self._pending)
+
+    def pending_rows(self):
+        """Rows queued here but not yet in the sheet"""
+        with self._cond:
+            return [row for _, row, _, _ in self._pending]
+
+    def flush(self, timeout=None):
+        """Write all queued rows now; return True if the queue drained within timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._force = True
+            self._retry_delay = 0.0
+            self._cond.notify_all()
+            try:
+                while self._pending or self._flushing:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+            finally:
+                self._force = False
+        return True
+
+    def close(self, timeout=10.0):
+        """Flush outstanding rows and stop the background thread"""
+        if self._closed:
+            return
+        self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        with self._cond:
+            if not self._pending and not self._flushing:
+                self._remove_spool(self.spool_path, self._lock_file)
+
+    def _lock_spool(self, path):
+        """Open and flock a spool's lock file; returns it, or None if a live process holds it"""
+        lock_file = open(f"{path}.lock", 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return None
+        return lock_file
+
+    def _remove_spool(self, path, lock_file):
+        """Delete a spool and its lock file, then drop the lock"""
+        for name in (path, f"{path}.lock"):
+            try:
+                os.remove(name)
+            except FileNotFoundError:
+                pass
+        lock_file.close()
+
+    def _read_spool(self, path):
+        """Entries in a spool file"""
+        entries = []
+        with open(path, encoding='utf-8') as spool:
+            for line in spool:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue  # torn write from a crash mid-append
+        return entries
+
+    def _recover_spool(self, shared_path):
+        """Requeue rows left in the spools of exited processes, including an earlier one with our pid"""
+        claimed = []
+        # A single shared spool written before spools were per process
+        if os.path.exists(shared_path):
+            legacy_path = f"{self.spool_path}.shared"
+            try:
+                os.rename(shared_path, legacy_path)
+                claimed.append((legacy_path, None))
+            except FileNotFoundError:
+                pass  # another process claimed it first
+        for path in sorted(glob.glob(self._spool_glob)):
+            if not self._spool_pattern.match(path):
+                continue
+            if path == self.spool_path:
+                claimed.append((path, None))
+                continue
+            lock_file = self._lock_spool(path)
+            if lock_file is not None:
+                if os.path.exists(path):
+                    claimed.append((path, lock_file))
+                else:
+                    lock_file.close()  # removed by the process that claimed it before us
+
+        seen = set()
+        for path, _ in claimed:
+            for entry in self._read_spool(path):
+                if entry['id'] not in seen:
+                    seen.add(entry['id'])
+                    self._pending.append((entry['id'], entry['row'], Future(), time.monotonic()))
+        if not claimed:
+            return
+        # Our own spool must hold the rows before the claimed files go
+        self._rewrite_spool()
+        for path, lock_file in claimed:
+            if lock_file is not None:
+                self._remove_spool(path, lock_file)
+            elif path != self.spool_path:
+                os.remove(path)
+        if self._pending:
+            print(f"Recovered {len(self._pending)} unsaved appointment rows into {self.spool_path}")
+
+    def _rewrite_spool(self):
+        """Replace the spool with the rows still pending"""
+        tmp_path = f"{self.spool_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as spool:
+            for entry_id, row, _, _ in self._pending:
+                spool.write(json.dumps({'id': entry_id, 'row': row}) + '\n')
+            spool.flush()
+            os.fsync(spool.fileno())
+        os.replace(tmp_path, self.spool_path)
+
+    def _next_batch(self):
+        """Wait until a batch is due and take it off the queue"""
+        with self._cond:
+            while True:
+                if self._closed:
+                    return None  # anything left stays in the spool for the next start
+                if self._retry_delay:
+                    self._cond.wait(self._retry_delay)
+                    self._retry_delay = 0.0
+                    continue
+                if not self._pending:
+                    self._cond.wait()
+                    continue
+                if self._force or len(self._pending) >= self.max_batch_size:
+                    break
+                wait = self._pending[0][3] + self.flush_interval - time.monotonic()
+                if wait <= 0:
+                    break
+                self._cond.wait(wait)
+            self._flushing = True
+            return self._pending[:self.max_batch_size]
+
+    def _run(self):
+        """Background flush loop"""
+        delay = 0.0
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            try:
+                self.sheet.append_rows([row for _, row, _, _ in batch])
+            except Exception as e:
+                print(f"Error flushing appointment rows to Google Sheets: {str(e)}")
+                delay = min(max(delay * 2, 1.0), self.max_retry_delay)
+                with self._cond:
+                    self.stats['failures'] += 1
+                    self._flushing = False
+                    self._retry_delay = delay
+                    self._cond.notify_all()
+                continue
+
+            delay = 0.0
+            with self._cond:
+                del self._pending[:len(batch)]
+                self._rewrite_spool()
+                self.stats['rows_written'] += len(batch)
+                self.stats['batches'] += 1
+                self._flushing = False
+                self._cond.notify_all()
+            for _, _, future, _ in batch:
+                future.set_result(True)
@@ -0,0 +1,233 @@
+import os
+import random
+import threading
+import time
+from metrics import get_metrics, InstrumentedClient
+
+# HTTP statuses worth retrying: rate limited, or a transient server error
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+# Calls that only read; they draw on the read quota and identical ones in flight are coalesced
+READ_METHODS = {
+    'row_values', 'col_values', 'get', 'get_values', 'get_all_values', 'get_all_records', 'batch_get',
+    'values_get', 'values_batch_get', 'worksheets', 'worksheet', 'fetch_sheet_metadata'
+}
+
+# Calls returning worksheets, which are wrapped too so they share the same limits
+WORKSHEET_METHODS = {'worksheet', 'worksheets', 'add_worksheet'}
+
+
+def status_code(error):
+    """HTTP status of a gspread APIError (or a similar error), or None"""
+    code = getattr(error, 'code', None)
+    if code is None:
+        code = getattr(getattr(error, 'response', None), 'status_code', None)
+    return code
+
+
+def is_retryable(error):
+    """Whether a Sheets API error is a rate limit or transient server error"""
+    return status_code(error) in RETRYABLE_STATUSES
+
+
+def unwrap(target):
+    """The raw gspread object behind any rate-limiting or metrics proxies"""
+    while isinstance(target, (RateLimitedClient, InstrumentedClient)):
+        target = target._target
+    return target
+
+
+class QuotaWaitExceeded(Exception):
+    """Raised instead of queueing a call longer than the client's max_wait"""
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled at a per-minute rate, holding at most `burst` tokens
+
+    Callers reserve a token and then sleep outside the lock until it is
+    due, so waiting callers are served in the order they arrived.
+    """
+
+    def __init__(self, per_minute, burst=10, clock=time.monotonic):
+        self.rate = per_minute / 60.0
+        self.burst = burst
+        self.clock = clock
+        self._tokens = float(burst)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self, max_wait=None):
+        """Take a token; returns how long to wait before using it"""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = self.clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            wait = 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+            if max_wait is not None and wait > max_wait:
+                raise QuotaWaitExceeded(f"Sheets quota is exhausted for the next {wait:.1f}s")
+            self._tokens -= 1
+            return wait
+
+    def drain(self):
+        """Drop saved-up tokens after the server rate-limited us, so other callers slow down too"""
+        with self._lock:
+            self._tokens = min(self._tokens, 0.0)
+
+
+class SingleFlight:
+    """Runs one call per key at a time; callers arriving meanwhile get the same result"""
+
+    def __init__(self):
+        self._calls = {}  # key -> [done event, result, error]
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """Return (result, shared); shared is True when another caller's call was reused"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = [threading.Event(), None, None]
+        if not leader:
+            call[0].wait()
+            if call[2] is not None:
+                raise call[2]
+            return call[1], True
+        try:
+            call[1] = fn()
+            return call[1], False
+        except Exception as e:
+            call[2] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call[0].set()
+
+
+class SheetsClient:
+    """Rate limiting, retries and read coalescing shared by every wrapped Sheets object
+
+    Google Sheets allows a service account 60 read and 60 write requests
+    per minute; the defaults (a burst of 10 plus 50 a minute) never send
+    more than that in any minute. Each call first takes a token from the
+    read or write bucket, waiting for one if needed (at most max_wait, then
+    QuotaWaitExceeded). Rate limit (429) errors and, for reads, transient
+    5xx errors are retried with jittered exponential backoff. Writes are
+    not retried on 5xx because the request may have been applied. While a
+    read is in flight, identical reads of the same object wait for and
+    share its result, so callers must not modify returned values.
+    """
+
+    def __init__(self, reads_per_minute=50, writes_per_minute=50, burst=10, max_retries=4, base_delay=1.0,
+                 max_delay=32.0, max_wait=20.0, coalesce_reads=True, sleep=time.sleep, clock=time.monotonic):
+        self.buckets = {
+            'read': TokenBucket(reads_per_minute, burst, clock),
+            'write': TokenBucket(writes_per_minute, burst, clock)
+        }
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_wait = max_wait
+        self.coalesce_reads = coalesce_reads
+        self.sleep = sleep
+        self.stats = {'requests': 0, 'retries': 0, 'coalesced': 0, 'queued_seconds': 0.0}
+        self._single_flight = SingleFlight()
+        self._lock = threading.Lock()
+        self._metrics = get_metrics()
+
+    def wrap(self, target):
+        """Proxy whose method calls go through this client"""
+        if target is None or isinstance(target, RateLimitedClient):
+            return target
+        return RateLimitedClient(target, self)
+
+    def call(self, operation, fn, args=(), kwargs=None, key=None):
+        """Make one API call under the quota, retrying; key, for reads, enables coalescing"""
+        kwargs = kwargs or {}
+        if key is not None and self.coalesce_reads:
+            result, shared = self._single_flight.do(key, lambda: self._call(operation, fn, args, kwargs))
+            if shared:
+                self._count('coalesced')
+                self._metrics.inc('sheets_coalesced_total', operation=operation)
+            return result
+        return self._call(operation, fn, args, kwargs)
+
+    def _call(self, operation, fn, args, kwargs):
+        kind = 'read' if operation in READ_METHODS else 'write'
+        bucket = self.buckets[kind]
+        for attempt in range(self.max_retries + 1):
+            wait = bucket.reserve(self.max_wait)
+            self._metrics.observe('sheets_queue_seconds', wait, kind=kind)
+            if wait:
+                self._count('queued_seconds', wait)
+                self.sleep(wait)
+            self._count('requests')
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                code = status_code(e)
+                if code == 429:
+                    bucket.drain()
+                retry = code == 429 or (kind == 'read' and code in RETRYABLE_STATUSES)
+                if attempt == self.max_retries or not retry:
+                    raise
+                delay = min(self.base_delay * 2 ** attempt, self.max_delay) * random.uniform(0.5, 1.5)
+                self._count('retries')
+                self._metrics.inc('sheets_retries_total', operation=operation, status=code)
+                print(f"Sheets {operation} failed with {code}, retrying in {delay:.1f}s")
+                self.sleep(delay)
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.stats[name] += amount
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats)
+
+
+class RateLimitedClient:
+    """Proxy that routes every method call on a gspread spreadsheet or worksheet through a SheetsClient"""
+
+    def __init__(self, target, client):
+        self._target = target
+        self._client = client
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+        client, target = self._client, self._target
+
+        def call(*args, **kwargs):
+            key = None
+            if name in READ_METHODS:
+                key = (id(target), name, repr(args), repr(sorted(kwargs.items())))
+            result = client.call(name, attr, args, kwargs, key)
+            if name in WORKSHEET_METHODS:
+                return [client.wrap(sheet) for sheet in result] if isinstance(result, list) else client.wrap(result)
+            return result
+        return call
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_sheets_client():
+    """Return the process-wide SheetsClient, configured from the environment on first use"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = SheetsClient(
+                reads_per_minute=float(os.getenv('SHEETS_READS_PER_MINUTE', '50')),
+                writes_per_minute=float(os.getenv('SHEETS_WRITES_PER_MINUTE', '50')),
+                burst=int(os.getenv('SHEETS_BURST', '10')),
+                max_retries=int(os.getenv('SHEETS_MAX_RETRIES', '4')),
+                max_wait=float(os.getenv('SHEETS_MAX_QUEUE_SECONDS', '20')),
+                coalesce_reads=os.getenv('SHEETS_COALESCE_READS', 'true').lower() == 'true'
+            )
+        return _client
@@ -0,0 +1,230 @@
+import threading
+import time
+from datetime import datetime
+from availability import AvailabilityMap
+from appointment_store import APPOINTMENT_COLUMNS
+from sheet_partitions import DATE_COLUMN, GENERATION_CELL, GENERATION_COLUMN, LAST_COLUMN, column_letter, dated_runs
+
+
+class SlotIndex:
+    """In-memory index of appointment slots keyed by (date, time)
+
+    The index is loaded once from the worksheet, updated locally on every
+    booking and kept current by cheap delta reads of newly appended rows,
+    with a full reload on a longer bounded interval to pick up edits made
+    directly in the sheet (e.g. a status changed to Cancelled). A load
+    reads the Date column and then only the rows dated today or later;
+    earlier dates, which can't be booked, are looked up in the sheet when
+    asked for. Each delta read also fetches the generation cell and
+    reloads if the archive job has deleted rows since.
+
+    With a capacity above 1 (several providers per slot) a slot is booked
+    once it holds that many confirmed appointments.
+    """
+
+    def __init__(self, sheet, refresh_interval=300, delta_interval=15, availability=None, capacity=1):
+        self.sheet = sheet
+        self.refresh_interval = refresh_interval
+        self.delta_interval = delta_interval
+        self._slots = {}  # date -> {time: status}
+        self._local = {}  # (date, time) -> status recorded here but not yet seen in the sheet
+        self.capacity = capacity
+        self._confirmed = {}  # (date, time) -> confirmed rows in the sheet, counted when capacity > 1
+        self._pending = {}  # (date, time) -> confirmed bookings made here but not yet seen in the sheet
+        self._columns = None
+        self._row_count = 0
+        self._generation = None
+        self._since = None  # first date the index holds
+        self._loaded_at = None
+        self._synced_at = None
+        self.availability = availability or AvailabilityMap()
+        self._lock = threading.RLock()
+
+    def ensure_fresh(self):
+        """Reload or delta-sync the index if its refresh interval has passed"""
+        now = time.monotonic()
+        with self._lock:
+            if self._loaded_at is None or now - self._loaded_at >= self.refresh_interval:
+                self.load()
+            elif now - self._synced_at >= self.delta_interval:
+                self.sync_delta()
+            if not self.availability.is_current():
+                # The bookable window moved on to a new day
+                self.availability.rebuild(self._booked_pairs())
+
+    def load(self):
+        """Rebuild the index from the rows dated today or later"""
+        since = datetime.now().strftime('%Y-%m-%d')
+        header, row_count, rows = self._read_dated(since)
+        with self._lock:
+            seen = {key: self._confirmed.get(key, 0) for key in self._pending}
+            self._slots = {}
+            self._confirmed = {}
+            self.availability.rebuild()
+            self._columns = self._header_columns(header)
+            self._apply_rows(rows)
+            self._row_count = row_count
+            self._generation = self._generation_of(header[len(APPOINTMENT_COLUMNS):])
+            self._since = since
+            self._settle_pending(seen)
+
+            # Re-apply local bookings the sheet doesn't reflect yet
+            for (date, time_slot), status in list(self._local.items()):
+                if self._slots.get(date, {}).get(time_slot) == status:
+                    del self._local[(date, time_slot)]
+                else:
+                    self._put(date, time_slot, status)
+
+            self._loaded_at = self._synced_at = time.monotonic()
+
+    def sync_delta(self):
+        """Apply only the rows appended since the last load or sync"""
+        with self._lock:
+            start = self._row_count + 1
+            marker, rows = self.sheet.batch_get([GENERATION_CELL, f'A{start}:{LAST_COLUMN}'])
+            if self._generation_of(marker[0] if marker else []) != self._generation:
+                # The archive job deleted rows, so start no longer points past the ones we have
+                self.load()
+                return
+            # gspread returns [[]] for an empty range; trailing empty rows must not advance the count.
+            # Sliced, not popped: coalesced reads hand the same list to every concurrent caller
+            end = len(rows)
+            while end and not any(rows[end - 1]):
+                end -= 1
+            rows = rows[:end]
+            seen = {key: self._confirmed.get(key, 0) for key in self._pending}
+            self._apply_rows(rows)
+            self._settle_pending(seen)
+            self._row_count += len(rows)
+            self._synced_at = time.monotonic()
+
+    def record(self, date, time_slot, status='Confirmed'):
+        """Record a booking made by this process"""
+        with self._lock:
+            if self.capacity > 1:
+                if status == 'Confirmed':
+                    self._pending[(date, time_slot)] = self._pending.get((date, time_slot), 0) + 1
+                self._store(date, time_slot, status)
+                return
+            self._put(date, time_slot, status)
+            self._local[(date, time_slot)] = status
+
+    def get_status(self, date, time_slot):
+        """Return the status of a slot, or None if it was never booked"""
+        return self._slots.get(date, {}).get(time_slot)
+
+    def booked_times(self, date):
+        """Return the set of fully booked times on a date"""
+        if self._since and date < self._since:
+            return self._past_booked_times(date)
+        return {t for t in self._slots.get(date, {}) if self._full(date, t)}
+
+    def _past_booked_times(self, date):
+        """Fully booked times on a date before the indexed ones, read from the sheet"""
+        _, _, rows = self._read_dated(date, date)
+        columns = self._columns or self._header_columns([])
+        confirmed = {}
+        for row in rows:
+            if len(row) > max(columns.values()) and row[columns['Date']] == date and row[columns['Status']] == 'Confirmed':
+                confirmed[row[columns['Time']]] = confirmed.get(row[columns['Time']], 0) + 1
+        return {t for t, count in confirmed.items() if count >= self.capacity}
+
+    def _read_dated(self, start, end=None):
+        """(header, sheet row count, rows) with the rows dated start..end, or from start on without end
+
+        Two reads: the header row and Date column, then the Date, Time and
+        Status cells of the matching rows only. Returned rows hold just
+        those cells (others are blank) and may include rows of other dates.
+        """
+        header, dates = self.sheet.batch_get([f'A1:{GENERATION_COLUMN}1', f'{DATE_COLUMN}2:{DATE_COLUMN}'])
+        header = header[0] if header else []
+        columns = self._header_columns(header[:len(APPOINTMENT_COLUMNS)])
+        if columns['Date'] != APPOINTMENT_COLUMNS.index('Date'):
+            # Columns moved around by hand: the Date column read above isn't it, so read everything
+            values = self.sheet.get_all_values()
+            return header, len(values), values[1:]
+
+        positions = [columns['Date'], columns['Time'], columns['Status']]
+        runs = dated_runs(dates, start, end)
+        rows = []
+        if runs:
+            cells = self.sheet.batch_get([f'{column_letter(pos)}{first}:{column_letter(pos)}{last}'
+                                          for first, last in runs for pos in positions])
+            for i, (first, last) in enumerate(runs):
+                columns_read = cells[i * len(positions):(i + 1) * len(positions)]
+                for offset in range(last - first + 1):
+                    row = [''] * (max(positions) + 1)
+                    for pos, values in zip(positions, columns_read):
+                        if offset < len(values) and values[offset]:
+                            row[pos] = values[offset][0]
+                    rows.append(row)
+        return header, len(dates) + 1, rows
+
+    def _generation_of(self, cells):
+        """Generation marker from the cells read at GENERATION_CELL"""
+        return cells[0] if cells else ''
+
+    def find_next_available(self, service=None, after=None, n=3):
+        """Earliest free (date, time) pairs across the bookable window"""
+        return self.availability.find_next_available(service, after, n)
+
+    def _booked_pairs(self):
+        """Every fully booked (date, time) in the index"""
+        return [(date, t) for date, times in self._slots.items() for t in times if self._full(date, t)]
+
+    def _full(self, date, time_slot):
+        """Whether a slot can take no more bookings"""
+        if self.capacity == 1:
+            return self._slots.get(date, {}).get(time_slot) == 'Confirmed'
+        key = (date, time_slot)
+        return self._confirmed.get(key, 0) + self._pending.get(key, 0) >= self.capacity
+
+    def _put(self, date, time_slot, status):
+        """Store a slot status and mirror it into the availability bitmap"""
+        self._slots.setdefault(date, {})[time_slot] = status
+        self.availability.mark(date, time_slot, self._full(date, time_slot))
+
+    def _settle_pending(self, seen):
+        """Stop counting local bookings separately once the sheet shows their rows
+
+        seen holds each pending slot's confirmed count from before the rows
+        were applied; every new confirmed row accounts for one pending booking.
+        """
+        for key, pending in list(self._pending.items()):
+            arrived = self._confirmed.get(key, 0) - seen.get(key, 0)
+            if arrived >= pending:
+                del self._pending[key]
+            elif arrived > 0:
+                self._pending[key] = pending - arrived
+            self.availability.mark(key[0], key[1], self._full(*key))
+
+    def _header_columns(self, header):
+        """Map the Date, Time and Status headers to column positions"""
+        defaults = {'Date': 4, 'Time': 5, 'Status': 8}
+        return {name: header.index(name) if name in header else pos for name, pos in defaults.items()}
+
+    def _apply_rows(self, rows):
+        """Fold raw sheet rows into the index"""
+        if self._columns is None:
+            self._columns = self._header_columns([])
+        date_col = self._columns['Date']
+        time_col = self._columns['Time']
+        status_col = self._columns['Status']
+        for row in rows:
+            if len(row) <= max(date_col, time_col):
+                continue
+            status = row[status_col] if len(row) > status_col else ''
+            self._set(row[date_col], row[time_col], status)
+
+    def _set(self, date, time_slot, status):
+        """Store a slot status from the sheet, letting a confirmed row win over others"""
+        if self.capacity > 1 and status == 'Confirmed':
+            self._confirmed[(date, time_slot)] = self._confirmed.get((date, time_slot), 0) + 1
+        self._store(date, time_slot, status)
+
+    def _store(self, date, time_slot, status):
+        """Keep a slot's strongest status and refresh its availability bit"""
+        if self._slots.get(date, {}).get(time_slot) != 'Confirmed':
+            self._put(date, time_slot, status)
+        elif self.capacity > 1:
+            self.availability.mark(date, time_slot, self._full(date, time_slot))
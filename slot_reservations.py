@@ -0,0 +1,352 @@
+import sqlite3
+import threading
+import time
+import zlib
+from datetime import datetime
+
+HELD = 'held'
+BOOKED = 'booked'
+
+RESERVATION_SCHEMA = """
+CREATE TABLE IF NOT EXISTS slot_reservations (
+    date TEXT NOT NULL,
+    time TEXT NOT NULL,
+    owner TEXT NOT NULL,
+    state TEXT NOT NULL,
+    expires_at REAL,
+    PRIMARY KEY (date, time)
+);
+CREATE INDEX IF NOT EXISTS idx_slot_reservations_expiry ON slot_reservations (state, expires_at);
+"""
+
+
+class InMemoryReservationBackend:
+    """Slot reservations for a single process
+
+    Slots are spread over a fixed set of lock stripes, so bookers contend
+    only with others whose slots hash to the same stripe instead of on one
+    global lock.
+    """
+
+    def __init__(self, stripes=64):
+        self._stripes = [threading.Lock() for _ in range(stripes)]
+        self._entries = {}  # (date, time) -> (owner, state, expires_at, or booked_at for a booking)
+
+    def _lock_for(self, key):
+        return self._stripes[zlib.crc32(f'{key[0]} {key[1]}'.encode('utf-8')) % len(self._stripes)]
+
+    def try_hold(self, key, owner, expires_at, now):
+        """Take or renew a hold; fails if another owner holds or has booked the slot"""
+        with self._lock_for(key):
+            entry = self._entries.get(key)
+            if entry is not None:
+                held_by, state, current_expiry = entry
+                if state == BOOKED or (held_by != owner and current_expiry > now):
+                    return False
+            self._entries[key] = (owner, HELD, expires_at)
+            return True
+
+    def commit(self, key, owner, now):
+        """Compare-and-set a live hold by owner to booked"""
+        with self._lock_for(key):
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != owner or entry[1] != HELD or entry[2] <= now:
+                return False
+            self._entries[key] = (owner, BOOKED, now)
+            return True
+
+    def release(self, key, owner, include_booked=False):
+        """Drop owner's hold (or booking, if include_booked) on a slot"""
+        with self._lock_for(key):
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != owner or (entry[1] == BOOKED and not include_booked):
+                return False
+            del self._entries[key]
+            return True
+
+    def release_booked(self, key, booked_before):
+        """Drop a booking made before booked_before, whoever made it"""
+        with self._lock_for(key):
+            entry = self._entries.get(key)
+            if entry is None or entry[1] != BOOKED or (entry[2] or 0) > booked_before:
+                return False
+            del self._entries[key]
+            return True
+
+    def get(self, key, now):
+        """Return (owner, state, expiry or booked_at) for a live hold or booking, else None"""
+        entry = self._entries.get(key)
+        if entry is None or (entry[1] == HELD and entry[2] <= now):
+            return None
+        return entry
+
+    def purge(self, now, before_date):
+        """Forget expired holds and anything dated before before_date"""
+        removed = 0
+        for key in list(self._entries):
+            with self._lock_for(key):
+                entry = self._entries.get(key)
+                if entry and ((entry[1] == HELD and entry[2] <= now) or key[0] < before_date):
+                    del self._entries[key]
+                    removed += 1
+        return removed
+
+
+class SQLiteReservationBackend:
+    """Slot reservations shared by every process that opens the same database file
+
+    Each operation is a single conditional statement, so SQLite's write lock
+    provides the compare-and-set without holding a transaction open.
+    """
+
+    def __init__(self, db_path='reservations.db'):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._connect().executescript(RESERVATION_SCHEMA)
+
+    def _connect(self):
+        """Return this thread's connection to the reservations database"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def try_hold(self, key, owner, expires_at, now):
+        """Take or renew a hold; fails if another owner holds or has booked the slot"""
+        cursor = self._connect().execute(
+            'INSERT INTO slot_reservations (date, time, owner, state, expires_at) VALUES (?, ?, ?, ?, ?) '
+            'ON CONFLICT (date, time) DO UPDATE SET owner = excluded.owner, state = excluded.state, '
+            'expires_at = excluded.expires_at '
+            'WHERE slot_reservations.state = ? AND '
+            '(slot_reservations.owner = excluded.owner OR slot_reservations.expires_at <= ?)',
+            (key[0], key[1], owner, HELD, expires_at, HELD, now)
+        )
+        return cursor.rowcount == 1
+
+    def commit(self, key, owner, now):
+        """Compare-and-set a live hold by owner to booked"""
+        # A booking keeps the time it was made in expires_at
+        cursor = self._connect().execute(
+            'UPDATE slot_reservations SET state = ?, expires_at = ? '
+            'WHERE date = ? AND time = ? AND owner = ? AND state = ? AND expires_at > ?',
+            (BOOKED, now, key[0], key[1], owner, HELD, now)
+        )
+        return cursor.rowcount == 1
+
+    def release(self, key, owner, include_booked=False):
+        """Drop owner's hold (or booking, if include_booked) on a slot"""
+        sql = 'DELETE FROM slot_reservations WHERE date = ? AND time = ? AND owner = ?'
+        params = [key[0], key[1], owner]
+        if not include_booked:
+            sql += ' AND state = ?'
+            params.append(HELD)
+        return self._connect().execute(sql, params).rowcount == 1
+
+    def release_booked(self, key, booked_before):
+        """Drop a booking made before booked_before, whoever made it"""
+        # Bookings committed before their time was kept have none; they are old enough
+        return self._connect().execute(
+            'DELETE FROM slot_reservations WHERE date = ? AND time = ? AND state = ? AND COALESCE(expires_at, 0) <= ?',
+            (key[0], key[1], BOOKED, booked_before)
+        ).rowcount == 1
+
+    def get(self, key, now):
+        """Return (owner, state, expiry or booked_at) for a live hold or booking, else None"""
+        row = self._connect().execute(
+            'SELECT owner, state, expires_at FROM slot_reservations WHERE date = ? AND time = ? '
+            'AND (state = ? OR expires_at > ?)',
+            (key[0], key[1], BOOKED, now)
+        ).fetchone()
+        return tuple(row) if row else None
+
+    def purge(self, now, before_date):
+        """Forget expired holds and anything dated before before_date"""
+        return self._connect().execute(
+            'DELETE FROM slot_reservations WHERE (state = ? AND expires_at <= ?) OR date < ?',
+            (HELD, now, before_date)
+        ).rowcount
+
+
+class SlotReservations:
+    """Short-lived holds on time slots with compare-and-set booking
+
+    A session holds a slot as soon as the customer picks it, which keeps
+    every other session off it for hold_seconds. Confirming converts the
+    hold to a booking with a compare-and-set, so of any number of
+    concurrent bookers exactly one wins a slot. Abandoned holds simply
+    expire. The backend decides the scope: InMemoryReservationBackend for
+    one process, SQLiteReservationBackend (or anything with the same
+    methods) when several processes book against the same calendar.
+
+    A slot taking several appointments at once (capacity, e.g. one per
+    provider) has that many seats, each reserved like a slot of its own;
+    a session holds at most one seat of a slot.
+
+    Bookings stay reserved after they are saved, but an appointment can be
+    cancelled in the store (e.g. its status edited in the sheet). When a hold
+    or booking finds every seat of a slot taken, the store's confirmed count
+    is read fresh (store.confirmed_count, bypassing any index) and, if it is
+    below the booked seats, one booking older than cancel_grace is released.
+    Younger bookings may not have reached the store yet, e.g. while queued
+    in another process's write buffer. Availability checks never release
+    anything.
+    """
+
+    def __init__(self, backend=None, hold_seconds=300, purge_interval=60, capacity=1, get_store=None,
+                 cancel_grace=900, calendar=None):
+        self.backend = backend or InMemoryReservationBackend()
+        self.hold_seconds = hold_seconds
+        self.purge_interval = purge_interval
+        self.capacity = capacity
+        self.cancel_grace = cancel_grace
+        # Calendar whose service_slots limit what book() accepts (see tenants.py)
+        self.calendar = calendar
+        # Callable() -> the appointment store these seats are booked in
+        self.get_store = get_store
+        self._purged_at = 0.0
+
+    def _seats(self, date, time_slot):
+        """Backend keys of a slot's seats; the first is the plain (date, time) key"""
+        return [(date, time_slot)] + [(date, f'{time_slot}#{seat}') for seat in range(1, self.capacity)]
+
+    def _owned_seat(self, date, time_slot, owner, now):
+        """Key of the seat owner holds or has booked in a slot, or None"""
+        for key in self._seats(date, time_slot):
+            entry = self.backend.get(key, now)
+            if entry is not None and entry[0] == owner:
+                return key
+        return None
+
+    def _hold_seat(self, date, time_slot, owner, now, store=None):
+        """Take or renew a hold on one of the slot's seats; returns its key, or None when all are taken"""
+        expires_at = now + self.hold_seconds
+        if self.capacity == 1:
+            key = (date, time_slot)
+            if self.backend.try_hold(key, owner, expires_at, now):
+                return key
+            freed = self._release_cancelled(date, time_slot, now, store)
+            return key if freed and self.backend.try_hold(key, owner, expires_at, now) else None
+        owned = self._owned_seat(date, time_slot, owner, now)
+        seats = [owned] if owned else self._seats(date, time_slot)
+        for key in seats:
+            if self.backend.try_hold(key, owner, expires_at, now):
+                return key
+        if owned is None:
+            freed = self._release_cancelled(date, time_slot, now, store)
+            if freed and self.backend.try_hold(freed, owner, expires_at, now):
+                return freed
+        return None
+
+    def _release_cancelled(self, date, time_slot, now, store=None):
+        """Free one booked seat whose appointment the store no longer has; returns its key, or None"""
+        if store is None:
+            if self.get_store is None:
+                return None
+            store = self.get_store()
+        booked = []
+        for key in self._seats(date, time_slot):
+            entry = self.backend.get(key, now)
+            if entry is not None and entry[1] == BOOKED:
+                booked.append((key, entry[2] or 0))
+        if not booked:
+            return None
+        try:
+            confirmed = store.confirmed_count(date, time_slot)
+        except NotImplementedError:
+            return None
+        except Exception as e:
+            print(f"Error checking the store for cancelled bookings: {str(e)}")
+            return None
+        if confirmed >= len(booked):
+            return None
+        # Only the first old enough seat, so processes releasing at once all go for the same one
+        cutoff = now - self.cancel_grace
+        key = next((key for key, booked_at in booked if booked_at <= cutoff), None)
+        if key is not None and self.backend.release_booked(key, cutoff):
+            return key
+        return None
+
+    def hold(self, date, time_slot, owner):
+        """Hold a slot for owner, or renew owner's existing hold"""
+        now = time.time()
+        self._maybe_purge(now)
+        if self._hold_seat(date, time_slot, owner, now) is None:
+            return {
+                'success': False,
+                'error': f'The {time_slot} slot on {date} has just been taken'
+            }
+        return {'success': True, 'expires_at': now + self.hold_seconds}
+
+    def release(self, date, time_slot, owner):
+        """Give up owner's hold on a slot"""
+        if self.capacity == 1:
+            return self.backend.release((date, time_slot), owner)
+        key = self._owned_seat(date, time_slot, owner, time.time())
+        return key is not None and self.backend.release(key, owner)
+
+    def is_available(self, date, time_slot, owner=None):
+        """True if a seat is free or held by owner, i.e. nobody else holds or has booked the whole slot
+
+        Callers pass slots the store lists as open, so a full slot with a
+        booking older than cancel_grace is reported available too: its
+        appointment was likely cancelled, and hold/book confirm that with a
+        fresh store read. Nothing is released here.
+        """
+        now = time.time()
+        cutoff = now - self.cancel_grace
+        reclaimable = False
+        for key in self._seats(date, time_slot):
+            entry = self.backend.get(key, now)
+            if entry is None or (entry[0] == owner and entry[1] == HELD):
+                return True
+            reclaimable = reclaimable or (entry[1] == BOOKED and (entry[2] or 0) <= cutoff)
+        return reclaimable
+
+    def filter_available(self, date, slots, owner=None):
+        """Drop slots held or booked by someone other than owner"""
+        return [slot for slot in slots if self.is_available(date, slot, owner)]
+
+    def book(self, store, appointment_data, owner):
+        """Atomically claim the appointment's slot for owner and save it to store
+
+        Returns the store's result dict, or a failure if the slot was taken
+        or the calendar doesn't offer the service at that time.
+        """
+        date = appointment_data.get('date', '')
+        time_slot = appointment_data.get('time', '')
+        allowed = self.calendar.service_times(appointment_data.get('service')) if self.calendar else None
+        if allowed is not None and time_slot not in allowed:
+            return {'success': False,
+                    'error': f"{appointment_data.get('service')} is only available at {', '.join(allowed)}"}
+
+        now = time.time()
+        self._maybe_purge(now)
+        key = self._hold_seat(date, time_slot, owner, now, store)
+        if key is None:
+            return {'success': False, 'error': f'The {time_slot} slot on {date} has just been taken'}
+        # Bookings made before reservations existed, or by other tools, live only in the store
+        if not store.is_slot_available(date, time_slot):
+            self.backend.release(key, owner)
+            return {'success': False, 'error': f'The {time_slot} slot on {date} is already booked'}
+        if not self.backend.commit(key, owner, time.time()):
+            return {'success': False, 'error': f'Your hold on the {time_slot} slot on {date} has expired'}
+
+        try:
+            result = store.add_appointment(appointment_data)
+        except Exception as e:
+            result = {'success': False, 'error': f'Failed to save appointment: {str(e)}'}
+        if not result['success']:
+            self.backend.release(key, owner, include_booked=True)
+        return result
+
+    def _maybe_purge(self, now):
+        """Drop expired holds and past days every purge_interval seconds"""
+        if now - self._purged_at < self.purge_interval:
+            return
+        self._purged_at = now
+        try:
+            self.backend.purge(now, datetime.now().strftime('%Y-%m-%d'))
+        except Exception as e:
+            print(f"Error purging slot reservations: {str(e)}")
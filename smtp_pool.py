@@ -0,0 +1,165 @@
+import smtplib
+import threading
+import time
+from contextlib import contextmanager
+from metrics import get_metrics
+
+
+def is_connection_error(error):
+    """Whether an error means the connection itself is unusable and should be replaced"""
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    # SMTPException subclasses OSError, so exclude protocol-level replies
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+
+class SMTPConnectionPool:
+    """Pool of authenticated SMTP connections reused across messages
+
+    Connections are handed out LIFO so the most recently used (and most
+    likely still open) one is picked first. Connections idle longer than
+    health_check_interval are probed with NOOP before reuse, and connections
+    idle longer than idle_timeout are closed instead of reused.
+    """
+
+    def __init__(self, host, port, username, password, max_size=4, idle_timeout=60.0,
+                 health_check_interval=10.0, use_tls=True, timeout=30.0):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self.use_tls = use_tls
+        self.timeout = timeout
+        self._idle = []  # [(server, last_used)]
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self.stats = {'connects': 0, 'reuses': 0, 'health_check_failures': 0, 'reconnects': 0}
+
+    def _connect(self):
+        """Open, secure and authenticate a new SMTP connection"""
+        metrics = get_metrics()
+        with metrics.timed('smtp', 'connect'):
+            server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.use_tls:
+                with metrics.timed('smtp', 'starttls'):
+                    server.starttls()  # Enable TLS encryption
+            with metrics.timed('smtp', 'login'):
+                server.login(self.username, self.password)
+        except Exception:
+            self._close(server)
+            raise
+        with self._lock:
+            self.stats['connects'] += 1
+        return server
+
+    def _close(self, server):
+        """Close a connection, ignoring errors from an already dead socket"""
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+
+    def _is_healthy(self, server):
+        """Probe a connection with NOOP"""
+        try:
+            return server.noop()[0] == 250
+        except OSError:
+            return False
+
+    def _acquire(self):
+        """Take a live idle connection or open a new one"""
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                server, last_used = self._idle.pop()
+
+            idle_for = time.monotonic() - last_used
+            if idle_for >= self.idle_timeout:
+                self._close(server)
+                continue
+            if idle_for >= self.health_check_interval and not self._is_healthy(server):
+                with self._lock:
+                    self.stats['health_check_failures'] += 1
+                self._close(server)
+                continue
+
+            with self._lock:
+                self.stats['reuses'] += 1
+            return server
+        return self._connect()
+
+    def _release(self, server):
+        """Return a connection to the idle list"""
+        with self._lock:
+            self._idle.append((server, time.monotonic()))
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; it is discarded if the caller hits a connection error"""
+        self._slots.acquire()
+        try:
+            server = self._acquire()
+            try:
+                yield server
+            except Exception as e:
+                if is_connection_error(e) or not isinstance(e, smtplib.SMTPException):
+                    self._close(server)
+                    raise
+                # Reset the rejected transaction so the connection can be reused
+                try:
+                    server.rset()
+                except Exception:
+                    self._close(server)
+                    raise
+                self._release(server)
+                raise
+            else:
+                self._release(server)
+        finally:
+            self._slots.release()
+
+    def sendmail(self, from_addr, to_addrs, msg):
+        """Send a message, reconnecting once if the pooled connection was dropped"""
+        metrics = get_metrics()
+        try:
+            with self.connection() as server, metrics.timed('smtp', 'sendmail'):
+                return server.sendmail(from_addr, to_addrs, msg)
+        except Exception as e:
+            if not is_connection_error(e):
+                raise
+            with self._lock:
+                self.stats['reconnects'] += 1
+            with self.connection() as server, metrics.timed('smtp', 'sendmail'):
+                return server.sendmail(from_addr, to_addrs, msg)
+
+    def close_all(self):
+        """Close every idle connection"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for server, _ in idle:
+            self._close(server)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(host, port, username, password, **kwargs):
+    """Return the process-wide pool for an SMTP server and account"""
+    key = (host, port, username)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None or pool.password != password:
+            if pool is not None:
+                pool.close_all()
+            pool = SMTPConnectionPool(host, port, username, password, **kwargs)
+            _pools[key] = pool
+        return pool
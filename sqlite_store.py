@@ -0,0 +1,270 @@
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from availability import AvailabilityMap
+from appointment_store import AppointmentStore, TIME_SLOTS, appointment_row
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS appointments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at TEXT NOT NULL,
+    name TEXT NOT NULL,
+    email TEXT NOT NULL,
+    phone TEXT NOT NULL,
+    date TEXT NOT NULL,
+    time TEXT NOT NULL,
+    service TEXT NOT NULL,
+    notes TEXT NOT NULL DEFAULT '',
+    status TEXT NOT NULL,
+    mirrored INTEGER NOT NULL DEFAULT 0,
+    mirror_claimed_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_appointments_slot ON appointments (date, time, status);
+CREATE INDEX IF NOT EXISTS idx_appointments_email ON appointments (email);
+CREATE INDEX IF NOT EXISTS idx_appointments_unmirrored ON appointments (mirrored) WHERE mirrored = 0;
+CREATE INDEX IF NOT EXISTS idx_appointments_mirroring ON appointments (mirror_claimed_at) WHERE mirrored = 2;
+"""
+
+
+class SQLiteAppointmentStore(AppointmentStore):
+    """Appointment storage in a local SQLite database
+
+    Bookings and availability lookups are indexed queries on the local file,
+    so they don't depend on Sheets API latency or quota. When a mirror (a
+    GoogleSheetsHandler) is given, a background thread copies new bookings to
+    the spreadsheet in batches; rows are only marked mirrored after the
+    append succeeds, so the copy catches up after a crash or Sheets outage.
+    Every process sharing the database may run a mirror: each claims its
+    batch first (mirrored = 2), so no row is appended twice, and a claim
+    left by a crashed process is taken over after mirror_lease seconds. The
+    claim is renewed while its append is still running, e.g. retrying.
+    A tenant calendar sets the slots offered each day and how many
+    appointments a slot takes.
+    """
+
+    def __init__(self, db_path='appointments.db', mirror=None, mirror_batch_size=100, mirror_interval=5.0,
+                 availability_refresh=15.0, calendar=None, mirror_lease=300.0):
+        self.db_path = db_path
+        self.calendar = calendar
+        self.capacity = calendar.capacity if calendar else 1
+        self.mirror = mirror
+        self.mirror_batch_size = mirror_batch_size
+        self.mirror_interval = mirror_interval
+        self.mirror_lease = mirror_lease
+        self._local = threading.local()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._mirror_thread = None
+        self.availability = AvailabilityMap(calendar=calendar)
+        self.availability_refresh = availability_refresh
+        self._availability_loaded_at = None
+        self._availability_lock = threading.Lock()
+
+        conn = self._connect()
+        columns = {row['name'] for row in conn.execute('PRAGMA table_info(appointments)')}
+        if columns and 'mirror_claimed_at' not in columns:
+            # Databases created before mirror batches were claimed
+            conn.execute('ALTER TABLE appointments ADD COLUMN mirror_claimed_at REAL')
+        conn.executescript(SCHEMA)
+
+        if self.mirror:
+            self._mirror_thread = threading.Thread(target=self._run_mirror, name='sheets-mirror', daemon=True)
+            self._mirror_thread.start()
+
+    def _connect(self):
+        """Return this thread's connection to the appointments database"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def add_appointment(self, appointment_data):
+        """Insert a confirmed appointment"""
+        try:
+            row = appointment_row(appointment_data)
+            cursor = self._connect().execute(
+                'INSERT INTO appointments (created_at, name, email, phone, date, time, service, notes, status) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                row
+            )
+            booked = row[8] == 'Confirmed'
+            if booked and self.capacity > 1:
+                booked = self.confirmed_count(row[4], row[5]) >= self.capacity
+            self.availability.mark(row[4], row[5], booked)
+            if self.mirror:
+                self._wakeup.set()
+            return {
+                'success': True,
+                'message': 'Appointment added successfully',
+                'appointment_id': cursor.lastrowid
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'error': f'Failed to save appointment: {str(e)}'
+            }
+
+    def get_available_slots(self, date):
+        """Get available time slots for a given date"""
+        try:
+            rows = self._connect().execute(
+                "SELECT time FROM appointments WHERE date = ? AND status = 'Confirmed' "
+                "GROUP BY time HAVING COUNT(*) >= ?",
+                (date, self.capacity)
+            ).fetchall()
+            booked_slots = {row['time'] for row in rows}
+            slots = self.calendar.slots_on(date) if self.calendar else TIME_SLOTS
+            return [slot for slot in slots if slot not in booked_slots]
+        except Exception as e:
+            print(f"Error getting available slots: {str(e)}")
+            return []
+
+    def find_next_available(self, service=None, after=None, n=3):
+        """Find the earliest open slots across the bookable window"""
+        try:
+            self._refresh_availability()
+            return self.availability.find_next_available(service, after, n)
+        except Exception as e:
+            print(f"Error searching available slots: {str(e)}")
+            return []
+
+    def _refresh_availability(self):
+        """Reload the availability bitmap when it is stale or the window has moved"""
+        now = time.monotonic()
+        if (self._availability_loaded_at is not None and self.availability.is_current()
+                and now - self._availability_loaded_at < self.availability_refresh):
+            return
+        with self._availability_lock:
+            if (self._availability_loaded_at is not None and self.availability.is_current()
+                    and time.monotonic() - self._availability_loaded_at < self.availability_refresh):
+                return
+            today = datetime.now().date()
+            rows = self._connect().execute(
+                "SELECT date, time FROM appointments WHERE status = 'Confirmed' AND date > ? AND date <= ? "
+                "GROUP BY date, time HAVING COUNT(*) >= ?",
+                (today.strftime('%Y-%m-%d'), (today + timedelta(days=self.availability.days)).strftime('%Y-%m-%d'),
+                 self.capacity)
+            ).fetchall()
+            self.availability.rebuild((row['date'], row['time']) for row in rows)
+            self._availability_loaded_at = time.monotonic()
+
+    def confirmed_count(self, date, time_slot):
+        """Confirmed appointments in one slot"""
+        return self._connect().execute(
+            "SELECT COUNT(*) FROM appointments WHERE date = ? AND time = ? AND status = 'Confirmed'",
+            (date, time_slot)
+        ).fetchone()[0]
+
+    def get_appointments_by_email(self, email):
+        """Return a customer's appointments, newest first"""
+        rows = self._connect().execute(
+            'SELECT * FROM appointments WHERE email = ? ORDER BY date DESC, time DESC',
+            (email,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def unmirrored_count(self):
+        """Number of bookings not yet copied to Google Sheets"""
+        return self._connect().execute('SELECT COUNT(*) FROM appointments WHERE mirrored IN (0, 2)').fetchone()[0]
+
+    def mirror_pending(self):
+        """Copy one batch of unmirrored bookings to Google Sheets; returns how many were copied"""
+        conn = self._connect()
+        claimed_at = time.time()
+        # Claim the batch so mirrors in other processes skip it
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute(
+                'UPDATE appointments SET mirrored = 0 WHERE mirrored = 2 AND mirror_claimed_at <= ?',
+                (claimed_at - self.mirror_lease,)
+            )
+            rows = conn.execute(
+                'SELECT id, created_at, name, email, phone, date, time, service, notes, status '
+                'FROM appointments WHERE mirrored = 0 ORDER BY id LIMIT ?',
+                (self.mirror_batch_size,)
+            ).fetchall()
+            ids = [row['id'] for row in rows]
+            if ids:
+                conn.execute(
+                    "UPDATE appointments SET mirrored = 2, mirror_claimed_at = ? "
+                    f"WHERE id IN ({','.join('?' * len(ids))})",
+                    [claimed_at] + ids
+                )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        if not rows:
+            return 0
+
+        placeholders = ','.join('?' * len(ids))
+        # The append may outlast the lease while it retries through Sheets backoff, so keep the claim fresh
+        claim = [claimed_at]
+        appended = threading.Event()
+        renewer = threading.Thread(target=self._renew_claim, args=(ids, claim, appended), name='sheets-mirror-lease',
+                                   daemon=True)
+        renewer.start()
+        mirrored = 0  # Hand the batch back for the next pass if the append fails
+        try:
+            self.mirror.add_rows([list(row)[1:] for row in rows])
+            mirrored = 1
+        finally:
+            appended.set()
+            renewer.join()
+            conn.execute(
+                f'UPDATE appointments SET mirrored = ? WHERE mirror_claimed_at = ? AND id IN ({placeholders})',
+                [mirrored, claim[0]] + ids
+            )
+        return len(rows)
+
+    def _renew_claim(self, ids, claim, appended):
+        """Move a claimed batch's mirror_claimed_at forward every third of the lease until its append is done"""
+        conn = self._connect()
+        placeholders = ','.join('?' * len(ids))
+        while not appended.wait(self.mirror_lease / 3):
+            renewed_at = time.time()
+            try:
+                cursor = conn.execute(
+                    'UPDATE appointments SET mirror_claimed_at = ? '
+                    f'WHERE mirrored = 2 AND mirror_claimed_at = ? AND id IN ({placeholders})',
+                    [renewed_at, claim[0]] + ids
+                )
+            except Exception as e:
+                print(f"Error renewing mirror claim: {str(e)}")
+                continue
+            if not cursor.rowcount:
+                return  # Taken over already; marking it below changes nothing
+            claim[0] = renewed_at
+
+    def _run_mirror(self):
+        """Background loop that keeps the spreadsheet copy up to date"""
+        retry_delay = self.mirror_interval
+        while not self._stopping.is_set():
+            self._wakeup.wait(retry_delay)
+            self._wakeup.clear()
+            try:
+                while self.mirror_pending() == self.mirror_batch_size and not self._stopping.is_set():
+                    pass
+                retry_delay = self.mirror_interval
+            except Exception as e:
+                print(f"Error mirroring appointments to Google Sheets: {str(e)}")
+                retry_delay = min(retry_delay * 2, 300.0)
+
+    def close(self):
+        """Stop the mirror thread after a final catch-up pass"""
+        if not self._mirror_thread:
+            return
+        self._stopping.set()
+        self._wakeup.set()
+        self._mirror_thread.join(10)
+        self._mirror_thread = None
+        try:
+            while self.mirror_pending():
+                pass
+        except Exception as e:
+            print(f"Error mirroring appointments to Google Sheets: {str(e)}")
@@ -0,0 +1,95 @@
+import json
+import re
+
+MESSAGE_KEY_PATTERN = re.compile(r'"message"\s*:\s*"')
+
+ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+
+class MessageFieldParser:
+    """Incrementally decodes the "message" string from a JSON object arriving in chunks
+
+    feed() returns whatever part of the message value became decodable with
+    the new chunk, so reply text can be shown while the rest of the object
+    (data, state, needs) is still streaming. Escape sequences split across
+    chunks are held back until complete.
+    """
+
+    def __init__(self):
+        self.buffer = ''
+        self.position = None  # index of the next undecoded character of the value
+        self.done = False
+
+    def feed(self, chunk):
+        """Add a chunk of raw model output and return newly decoded message text"""
+        self.buffer += chunk
+        if self.done:
+            return ''
+        if self.position is None:
+            match = MESSAGE_KEY_PATTERN.search(self.buffer)
+            if not match:
+                return ''
+            self.position = match.end()
+
+        out = []
+        buffer = self.buffer
+        i = self.position
+        while i < len(buffer):
+            char = buffer[i]
+            if char == '"':
+                self.done = True
+                i += 1
+                break
+            if char != '\\':
+                out.append(char)
+                i += 1
+                continue
+            if i + 1 >= len(buffer):
+                break  # wait for the rest of the escape sequence
+            code = buffer[i + 1]
+            if code != 'u':
+                out.append(ESCAPES.get(code, code))
+                i += 2
+                continue
+            decoded, consumed = self._decode_unicode_escape(buffer, i)
+            if consumed == 0:
+                break
+            out.append(decoded)
+            i += consumed
+        self.position = i
+        return ''.join(out)
+
+    def _decode_unicode_escape(self, buffer, i):
+        """Decode a \\uXXXX escape (or surrogate pair) at i; consumed is 0 if incomplete"""
+        if i + 6 > len(buffer):
+            return '', 0
+        high = int(buffer[i + 2:i + 6], 16)
+        if 0xD800 <= high <= 0xDBFF:
+            if i + 12 > len(buffer):
+                return '', 0
+            if buffer[i + 6:i + 8] == '\\u' and 0xDC00 <= int(buffer[i + 8:i + 12], 16) <= 0xDFFF:
+                return json.loads(f'"{buffer[i:i + 12]}"'), 12
+        return chr(high), 6
+
+
+class StreamedTurn:
+    """Iterable of reply text chunks for one turn
+
+    Iterate it (e.g. with st.write_stream) to receive the assistant's message
+    as it is generated; once exhausted, result holds the validated response
+    dict with the same shape process_message returns.
+    """
+
+    def __init__(self, chunks=None):
+        self.chunks = chunks
+        self.result = None
+        self.first_chunk_seconds = None
+
+    def __iter__(self):
+        return self.chunks
+
+    def consume(self):
+        """Drain the stream and return the final response"""
+        for _ in self:
+            pass
+        return self.result
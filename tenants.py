@@ -0,0 +1,228 @@
+import json
+import os
+import re
+import threading
+from datetime import datetime
+from availability import to_date
+
+WEEKDAYS = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+WEEKDAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+# Tenant ids end up in file names, cache keys and resource names
+TENANT_ID_PATTERN = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_-]{0,63}$')
+
+# "9", "9:30", "14.00", "9am", "9:30 PM"
+CLOCK_PATTERN = re.compile(r'^(\d{1,2})(?::(\d{2}))?\s*([AP])?\.?\s*(?:M\.?)?$')
+
+
+def to_minutes(value):
+    """'HH:MM' -> minutes since midnight"""
+    hours, minutes = value.split(':')
+    return int(hours) * 60 + int(minutes)
+
+
+def format_minutes(minutes):
+    return f'{minutes // 60:02d}:{minutes % 60:02d}'
+
+
+class UnknownTenantError(LookupError):
+    """Raised for a tenant id that isn't in the registry"""
+
+
+class Calendar:
+    """Bookable slots of one location: opening hours per weekday, slot length and capacity
+
+    hours maps weekday keys (mon..sun) to [open, close] 'HH:MM' pairs, or
+    to null for a closed day; days not listed use default_hours. Slots start
+    every slot_minutes from opening and end by closing time. capacity is how
+    many appointments one slot takes and defaults to the number of
+    providers, or 1. service_slots optionally limits services to some of
+    the slots, e.g. {"X-Ray": ["09:00", "10:00"]}; other services can take
+    any slot. The defaults reproduce the app's original calendar: hourly
+    slots from 09:00 to 17:00 every day.
+    """
+
+    def __init__(self, hours=None, slot_minutes=60, capacity=None, providers=None, default_hours=('09:00', '18:00'),
+                 service_slots=None):
+        self.slot_minutes = int(slot_minutes)
+        if self.slot_minutes <= 0:
+            raise ValueError('slot_minutes must be positive')
+        self.providers = list(providers or [])
+        self.capacity = int(capacity or len(self.providers) or 1)
+        self.hours = {}
+        hours = hours or {}
+        for day in hours:
+            if day not in WEEKDAYS:
+                raise ValueError(f"Unknown weekday {day!r}; use one of {', '.join(WEEKDAYS)}")
+        for day in WEEKDAYS:
+            span = hours.get(day, default_hours)
+            self.hours[day] = tuple(span) if span else None
+        self._day_slots = [self._build_slots(self.hours[day]) for day in WEEKDAYS]
+        self.slots = sorted({slot for day_slots in self._day_slots for slot in day_slots})
+        self._slot_set = set(self.slots)
+        self.service_slots = {}
+        for service, slots in (service_slots or {}).items():
+            unknown = [slot for slot in slots if slot not in self._slot_set]
+            if unknown:
+                raise ValueError(f"Service {service!r} lists times that aren't slots: {', '.join(unknown)}")
+            self.service_slots[service] = list(slots)
+        self._service_slots = {service.strip().lower(): slots for service, slots in self.service_slots.items()}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            hours=data.get('hours'),
+            slot_minutes=data.get('slot_minutes', 60),
+            capacity=data.get('capacity'),
+            providers=data.get('providers'),
+            default_hours=data.get('default_hours', ('09:00', '18:00')),
+            service_slots=data.get('service_slots')
+        )
+
+    def _build_slots(self, span):
+        if not span:
+            return []
+        opens, closes = to_minutes(span[0]), to_minutes(span[1])
+        return [format_minutes(start) for start in range(opens, closes - self.slot_minutes + 1, self.slot_minutes)]
+
+    def slots_on(self, date):
+        """Slot start times open on a date (a date, datetime or 'YYYY-MM-DD')"""
+        try:
+            return self._day_slots[to_date(date).weekday()]
+        except (TypeError, ValueError):
+            return []
+
+    def service_times(self, service):
+        """Slot times a service is limited to (matched ignoring case), or None if it can take any slot"""
+        return self._service_slots.get(str(service or '').strip().lower())
+
+    def match_time(self, value):
+        """Normalize a time like '9:30', '14.00' or '2pm' to one of the calendar's slots, or None"""
+        match = CLOCK_PATTERN.match(str(value).strip().upper().replace('.', ':', 1))
+        if not match:
+            return None
+        hour, minutes, meridiem = int(match.group(1)), int(match.group(2) or 0), match.group(3)
+        if meridiem:
+            if not 1 <= hour <= 12:
+                return None
+            hour = hour % 12 + (12 if meridiem == 'P' else 0)
+        if hour > 23 or minutes > 59:
+            return None
+        slot = f'{hour:02d}:{minutes:02d}'
+        return slot if slot in self._slot_set else None
+
+    def describe(self):
+        """Opening hours and slot length in words, e.g. for the assistant's instructions"""
+        groups = []  # [first day, last day, span]
+        for index, day in enumerate(WEEKDAYS):
+            span = self.hours[day]
+            if groups and groups[-1][2] == span and groups[-1][1] == index - 1:
+                groups[-1][1] = index
+            else:
+                groups.append([index, index, span])
+        parts = []
+        for first, last, span in groups:
+            days = WEEKDAY_NAMES[first]
+            if last > first:
+                days += f" {'and' if last == first + 1 else 'to'} {WEEKDAY_NAMES[last]}"
+            if len(groups) == 1:
+                days = 'every day'
+            parts.append(f'{days} {span[0]}-{span[1]}' if span else f'closed {days}')
+        text = f"{self.slot_minutes}-minute slots, {'; '.join(parts)}"
+        if self.capacity > 1:
+            text += f", up to {self.capacity} appointments per slot"
+        for service, slots in self.service_slots.items():
+            text += f"; {service} only at {', '.join(slots)}"
+        return text
+
+
+class Tenant:
+    """One clinic or location: its business details, spreadsheet, services and calendar"""
+
+    def __init__(self, tenant_id, name=None, business_email=None, spreadsheet_id=None, services=None,
+                 calendar=None, locale=None):
+        if not TENANT_ID_PATTERN.match(str(tenant_id)):
+            raise ValueError(f"Invalid tenant id {tenant_id!r}: use letters, digits, '-' and '_'")
+        self.id = tenant_id
+        self.name = name or tenant_id
+        self.business_email = business_email
+        self.spreadsheet_id = spreadsheet_id
+        self.services = list(services) if services else None
+        self.calendar = calendar or Calendar()
+        self.locale = locale
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data['id'],
+            name=data.get('name'),
+            business_email=data.get('business_email'),
+            spreadsheet_id=data.get('spreadsheet_id'),
+            services=data.get('services'),
+            calendar=Calendar.from_dict(data.get('calendar') or {}),
+            locale=data.get('locale')
+        )
+
+    def path_for(self, path):
+        """A per-tenant variant of a local file path, e.g. appointments.db -> appointments-clinic-a.db"""
+        root, ext = os.path.splitext(path)
+        return f'{root}-{self.id}{ext}'
+
+
+class TenantRegistry:
+    """Tenant configurations by id
+
+    Without any tenants the app runs single-tenant from environment
+    variables: get() with no id returns None and every component keeps
+    its built-in defaults.
+    """
+
+    def __init__(self, tenants=(), default_id=None):
+        self._tenants = {}
+        for tenant in tenants:
+            if tenant.id in self._tenants:
+                raise ValueError(f"Duplicate tenant id {tenant.id!r}")
+            self._tenants[tenant.id] = tenant
+        if default_id is not None and default_id not in self._tenants:
+            raise ValueError(f"Default tenant {default_id!r} is not configured")
+        self.default_id = default_id
+
+    @classmethod
+    def load(cls, path):
+        """Read {"default": id, "tenants": [{"id": ..., "calendar": {...}}, ...]} from a JSON file"""
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        return cls([Tenant.from_dict(item) for item in data.get('tenants', [])], data.get('default'))
+
+    def get(self, tenant_id=None):
+        """The tenant with this id, the default tenant for None (which may be None), or UnknownTenantError"""
+        if tenant_id is None:
+            tenant_id = self.default_id
+            if tenant_id is None:
+                return None
+        tenant = self._tenants.get(tenant_id)
+        if tenant is None:
+            raise UnknownTenantError(f"Unknown tenant: {tenant_id}")
+        return tenant
+
+    def ids(self):
+        return list(self._tenants)
+
+    def __len__(self):
+        return len(self._tenants)
+
+
+_tenants = None
+_tenants_lock = threading.Lock()
+
+
+def get_tenants():
+    """Return the process-wide tenant registry, loaded from TENANTS_FILE on first use"""
+    global _tenants
+    with _tenants_lock:
+        if _tenants is None:
+            path = os.getenv('TENANTS_FILE')
+            _tenants = TenantRegistry.load(path) if path else TenantRegistry()
+            if path:
+                print(f"Loaded {len(_tenants)} tenants from {path} at {datetime.now():%Y-%m-%d %H:%M:%S}")
+        return _tenants